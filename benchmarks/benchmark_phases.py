@@ -0,0 +1,238 @@
+'''
+
+Phase-level benchmark of the graphlet miner.
+
+Generates a synthetic corpus of controlled size, vocabulary and Zipf skew (or
+loads an NLTK corpus), runs extract_graphlets on it and records the phases it
+reports to observers (see gminer.instrumentation):
+
+tokenize, word_frequencies, graph_construction (with seeding), search, with
+expansion, counting and pruning once per search iteration (and checkpoint
+when enabled), and output.
+
+Every search parameter is passed to extract_graphlets as it is, so phase
+timings are those of the configured search (strategy, counting, support,
+graph store, checkpoints and workers).
+
+Parameter sets can be compared in one run by giving several values to a
+search parameter, e.g. --param PRUNED_STACK_SIZE=1000,10000. Results are
+written as JSON for regression tracking across versions.
+
+usage: python benchmarks/benchmark_phases.py --docs 1000 --zipf 1.2 --output results.json
+
+'''
+
+import argparse
+import ast
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from gminer.algorithms import extract_graphlets
+from gminer.instrumentation import SearchObserver
+
+FUNCTION_WORDS = ['the', 'of', 'and', 'to', 'a', 'in', 'is', 'for', 'on', 'with', 'as', 'by', 'at', 'from', 'that', 'it']
+
+DEFAULT_PARAMS = {
+    'MAX_ORBIT_CAPACITY': 10,
+    'GRAPHLET_TYPE': 'PRUNED',
+    'PATTERN_FREQ_THRESHOLD_BY_STACK': {0:5,1:4,2:3,3:2,4:2,5:2,6:2,7:2,8:2,9:2,10:2},
+    'MAX_SEARCH_ITERATIONS': 5,
+    'PRUNED_STACK_SIZE': 100000,
+    'MIN_WORD_FREQ': 20,
+    'WORD_SELECTION_RATIO': 0.5,
+    'CONTENT_WORD_REGEX_PATTERN': '^[A-z0-9]{3,}.*$',
+    'STOPWORD_LIST': FUNCTION_WORDS + ['.', ',', ';', ':', '-', '"'],
+    'RANDOM_SEED': 0,
+    'VERBOSE': False,
+}
+
+def generate_synthetic_corpus(n_docs, doc_length, vocabulary_size, zipf_exponent, function_word_ratio, seed=0):
+    ''' generates documents whose content words follow a Zipf distribution
+
+    parameters
+    ----------
+    n_docs : int
+        number of documents
+    doc_length : int
+        average number of tokens per document
+    vocabulary_size : int
+        number of distinct content words
+    zipf_exponent : float
+        skew of the content word distribution: the word of rank r has a weight of 1 / r^zipf_exponent
+    function_word_ratio : float
+        share of tokens drawn uniformly from a small list of function words
+    seed : int
+        random seed
+
+    returns
+    -------
+    dict, a map from document id to text
+    '''
+    rng = random.Random(seed)
+    content_words = [ 'w%06d' % rank for rank in range(1, vocabulary_size + 1) ]
+    cum_weights = list(itertools.accumulate([ 1.0 / rank ** zipf_exponent for rank in range(1, vocabulary_size + 1) ]))
+    doc_collection = {}
+    for d in range(n_docs):
+        n_tokens = max(1, int(rng.gauss(doc_length, doc_length / 4.0)))
+        sentences = []
+        while n_tokens > 0:
+            sentence_length = min(n_tokens, rng.randint(5, 20))
+            n_function_words = sum(1 for _ in range(sentence_length) if rng.random() < function_word_ratio)
+            words = rng.choices(content_words, cum_weights=cum_weights, k=sentence_length - n_function_words) + [ rng.choice(FUNCTION_WORDS) for _ in range(n_function_words) ]
+            rng.shuffle(words)
+            sentences.append(' '.join(words) + ' .')
+            n_tokens -= sentence_length
+        doc_collection['doc%07d' % d] = ' '.join(sentences)
+    return doc_collection
+
+def load_nltk_corpus(name, max_docs=None):
+    ''' loads a corpus bundled with NLTK, e.g. movie_reviews or reuters '''
+    import nltk.corpus
+    corpus_reader = getattr(nltk.corpus, name)
+    fileids = corpus_reader.fileids()[:max_docs]
+    return dict([ (fileid, corpus_reader.raw(fileid)) for fileid in fileids ])
+
+class PhaseRecorder(SearchObserver):
+    ''' Records the phases and search iterations reported by extract_graphlets
+    and, optionally, the peak memory traced by tracemalloc during each phase.
+    Phases can be nested (e.g. expansion within search), so the peak of every
+    open phase is updated before the peak of tracemalloc is reset.
+    '''
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.phases = []
+        self.iterations = []
+        self.open_phases = []
+
+    def _update_peaks(self):
+        (current_bytes, peak_bytes) = tracemalloc.get_traced_memory()
+        for open_phase in self.open_phases:
+            open_phase['peak_bytes'] = max(open_phase['peak_bytes'], peak_bytes)
+        return current_bytes
+
+    def on_phase_start(self, phase):
+        if self.trace_memory:
+            current_bytes = self._update_peaks()
+            tracemalloc.reset_peak()
+            self.open_phases.append({'start_bytes': current_bytes, 'peak_bytes': current_bytes})
+
+    def on_phase_end(self, phase, metrics):
+        record = dict(metrics, phase=phase)
+        if self.trace_memory:
+            current_bytes = self._update_peaks()
+            open_phase = self.open_phases.pop()
+            record['peak_bytes'] = open_phase['peak_bytes'] - open_phase['start_bytes']
+            record['retained_bytes'] = current_bytes - open_phase['start_bytes']
+        self.phases.append(record)
+
+    def on_iteration_end(self, metrics):
+        self.iterations.append(metrics)
+
+def run_phases(doc_collection, params, workers=1, trace_memory=True):
+    ''' runs extract_graphlets and records its phases
+
+    parameters
+    ----------
+    doc_collection : dict
+        a map from document id to text
+    params : dict
+        search parameters, see algorithms.extract_graphlets
+    workers : int
+        number of worker processes, see algorithms.extract_graphlets
+    trace_memory : bool
+        records the peak memory allocated by each phase with tracemalloc, which slows phases down. 
+        Only the memory of the calling process is traced, not that of worker processes
+
+    returns
+    -------
+    dict, phase records, search iteration metrics and summary counts
+    '''
+    recorder = PhaseRecorder(trace_memory)
+    if trace_memory:
+        tracemalloc.start()
+    start_time = time.perf_counter()
+    try:
+        word_patterns = extract_graphlets(doc_collection, params, workers, observers=[recorder])
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return {
+        'phases': recorder.phases,
+        'iterations': recorder.iterations,
+        'total_seconds': time.perf_counter() - start_time,
+        'patterns': len(word_patterns),
+        'occurrences': sum(len(occurrences) for occurrences in word_patterns.values()),
+    }
+
+def get_git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_param_sweeps(param_args):
+    ''' turns KEY=VALUE[,VALUE...] arguments into a list of parameter overrides, one per combination '''
+    sweeps = []
+    for param_arg in param_args:
+        (key, values) = param_arg.split('=', 1)
+        sweeps.append([ (key, ast.literal_eval(value)) for value in values.split(',') ])
+    return [ dict(combination) for combination in itertools.product(*sweeps) ]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Phase-level benchmark of the graphlet miner')
+    parser.add_argument('--corpus', default='synthetic', help="'synthetic' or the name of an NLTK corpus, e.g. movie_reviews")
+    parser.add_argument('--docs', type=int, default=500, help='number of documents')
+    parser.add_argument('--doc-length', type=int, default=200, help='average number of tokens per synthetic document')
+    parser.add_argument('--vocabulary', type=int, default=5000, help='number of distinct synthetic content words')
+    parser.add_argument('--zipf', type=float, default=1.1, help='Zipf exponent of synthetic content words')
+    parser.add_argument('--function-word-ratio', type=float, default=0.3, help='share of function words in synthetic documents')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic corpus')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--param', action='append', default=[], help='search parameter override KEY=VALUE, several comma separated values are compared')
+    parser.add_argument('--no-memory', action='store_true', help='do not trace memory, which makes timings more accurate')
+    parser.add_argument('--output', default='benchmark_results.json', help='path of the JSON results file')
+    args = parser.parse_args(argv)
+
+    if args.corpus == 'synthetic':
+        corpus_spec = {'name': 'synthetic', 'docs': args.docs, 'doc_length': args.doc_length, 'vocabulary': args.vocabulary, 'zipf': args.zipf, 'function_word_ratio': args.function_word_ratio, 'seed': args.seed}
+        doc_collection = generate_synthetic_corpus(args.docs, args.doc_length, args.vocabulary, args.zipf, args.function_word_ratio, args.seed)
+    else:
+        corpus_spec = {'name': args.corpus, 'docs': args.docs}
+        doc_collection = load_nltk_corpus(args.corpus, args.docs)
+    corpus_spec['tokens'] = sum(len(text.split()) for text in doc_collection.values())
+
+    runs = []
+    for overrides in parse_param_sweeps(args.param):
+        params = dict(DEFAULT_PARAMS, **overrides)
+        print('Running {0} on {1} documents...'.format(overrides or 'default parameters', len(doc_collection)))
+        result = run_phases(doc_collection, params, args.workers, not args.no_memory)
+        print('  {0:.2f}s, {1} patterns'.format(result['total_seconds'], result['patterns']))
+        runs.append(dict(result, params=overrides))
+
+    results = {
+        'benchmark': 'phases',
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_revision': get_git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'memory_traced': not args.no_memory,
+        'workers': args.workers,
+        'corpus': corpus_spec,
+        'default_params': dict((key, value) for (key, value) in DEFAULT_PARAMS.items() if key != 'STOPWORD_LIST'),
+        'runs': runs,
+    }
+    with open(args.output, 'w') as file_handler:
+        json.dump(results, file_handler, indent=2, default=str)
+    print('Results written to ' + args.output)
+
+if __name__ == '__main__':
+    main()
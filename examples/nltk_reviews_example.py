@@ -17,6 +17,7 @@ from nltk.tokenize import sent_tokenize
 from nltk import bigrams, word_tokenize, pos_tag 
 from nltk.corpus import stopwords
 from gminer.algorithms import extract_graphlets
+from gminer.preprocessing import pos_tag_collection
 
 # settings and constants 
 USE_POS_TAGGING = True # False
@@ -35,40 +36,28 @@ search_space_params = {
     'STOPWORD_LIST':stopwordlist
 }
 
-# loading corpus
-#doc_collection = dict([ (id,movie_reviews.raw(id)) for id in movie_reviews.fileids() ] )
-doc_collection = dict([ (id,reuters.raw(id)) for id in reuters.fileids() ] )
-
-if USE_POS_TAGGING:
-    print("Processing text docs for part of speech tagging...")
-    docids = list(doc_collection.keys())
-    for i in tqdm(range(len(docids))):
-    #for (id,text) in doc_collection.items():
-        id = docids[i]
-        text = doc_collection[docids[i]]
-        # sent tokenize is used to avoid having bigrams between words in two differnt lines
-        line_seq = sent_tokenize(text.replace('_','-'))
-        pos_tagged_lines_seq = []
-        for line in line_seq:
-            token_seq = word_tokenize(line)
-            tag_seq = pos_tag(token_seq)
-            # in the word graph, same word with two different pos tags will be represented by two distinct nodes
-            # for example, a word with a past tense verb lexical representation can mean 1) verb and 2) adjective, thus two nodes will be required here
-            word_tag = [a.lower() + "_" + b for (a,b) in tag_seq]
-            pos_tagged_lines_seq.append(' '.join(word_tag))
-        doc_collection[id] = '\n'.join(pos_tagged_lines_seq)
-print("Done.")
-# pattern extraction
-
-word_patterns = extract_graphlets(doc_collection, search_space_params)
-
-for g in word_patterns.keys():
-    if len(g.split('|')) >= 2 and len(word_patterns[g]) >= 2:
-        print(g + "==>" + str(list(set(word_patterns[g]))))
-
-# persisting patterns to storage
-with open('reuters_word_patterns.tsv', 'w',  encoding='utf-8') as filew:
-    filew.write("OrbitPattern\tCenterWord\tWordDocIncidence\n")
-    for graphlet_pattern in word_patterns.keys():
-        if len(word_patterns[graphlet_pattern]) > 1:
-            filew.write(graphlet_pattern + "\t" + str(list(set(list(word_patterns[graphlet_pattern])))) + '\n' )
+if __name__ == '__main__':
+    # worker processes import this module, so the script only runs in the main process
+    # loading corpus
+    #doc_collection = dict([ (id,movie_reviews.raw(id)) for id in movie_reviews.fileids() ] )
+    doc_collection = dict([ (id,reuters.raw(id)) for id in reuters.fileids() ] )
+
+    if USE_POS_TAGGING:
+        print("Processing text docs for part of speech tagging...")
+        # documents are tagged in parallel; tagged documents are cached, so later runs skip tagging
+        doc_collection = pos_tag_collection(doc_collection, workers=4, cache_dir='pos_tag_cache')
+        print("Done.")
+    # pattern extraction
+
+    word_patterns = extract_graphlets(doc_collection, search_space_params)
+
+    for g in word_patterns.keys():
+        if len(g.split('|')) >= 2 and len(word_patterns[g]) >= 2:
+            print(g + "==>" + str(word_patterns[g]))
+
+    # persisting patterns to storage
+    with open('reuters_word_patterns.tsv', 'w',  encoding='utf-8') as filew:
+        filew.write("OrbitPattern\tCenterWord\tWordDocIncidence\n")
+        for graphlet_pattern in word_patterns.keys():
+            if len(word_patterns[graphlet_pattern]) > 1:
+                filew.write(graphlet_pattern + "\t" + str(word_patterns[graphlet_pattern]) + '\n' )
@@ -36,4 +36,4 @@ with open('reuters_gpatterns.tsv', 'w',  encoding='utf-8') as filew:
     filew.write("OrbitPattern\tCenterWord\tWordDocIncidence\n")
     for graphlet_pattern in word_patterns.keys():
         if len(word_patterns[graphlet_pattern]) > 1:
-            filew.write(graphlet_pattern + "\t" + str(list(set(list(word_patterns[graphlet_pattern])))) + '\n' )
\ No newline at end of file
+            filew.write(graphlet_pattern + "\t" + str(word_patterns[graphlet_pattern]) + '\n' )
\ No newline at end of file
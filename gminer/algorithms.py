@@ -10,127 +10,385 @@ Supported graph models:
 
 import os
 import sys
+import heapq
 import operator
 import random
+import time
 
-from itertools import combinations 
+from array import array
+from collections import Counter
+from hashlib import blake2b
+from itertools import chain, combinations 
 from networkx.algorithms.shortest_paths.generic import all_shortest_paths as path_finder
-from networkx.algorithms.shortest_paths.unweighted import single_source_shortest_path as single_source_path_finder
-from gminer.graphs import DocumentWordGraph, Graphlet
+from gminer.graphs import DocumentWordGraph, Graphlet, Vocabulary, WordFrequencyArray
 import gminer.text_processing as text_utils
+from gminer.parallel import map_documents, iter_chunks, ShardPool
+from gminer.dedup import ExploredHypothesisSet
+from gminer.corpus import iter_documents
+from gminer.storage import DiskGraphStore, DocumentSpool, SearchCheckpoint
+from gminer.counting import CountMinSketch, DocumentSupportCounter
 from nltk.corpus import reuters
 from nltk.corpus import stopwords
-from tqdm import tqdm
+from gminer.instrumentation import Instrumentation, get_rss_bytes
+from gminer.occurrences import OccurrenceStore
 from os.path import isfile, join
 from os import listdir 
 
 stopwordlist = list(set(stopwords.words('english')))
 stopwordlist.extend(['.',',',';',':','-','"'])
 
-def extract_graph_paths(graph, source_nodes, method='simple', max_depth=5):
+def get_distances_within_depth(graph, source_node, max_hops):
+    ''' runs a breadth first search from a node that stops after max_hops hops
+
+    parameters
+    ----------
+    graph : DocumentWordGraph
+        a word graph
+    source_node : int
+        id of the node the search starts from
+    max_hops : int
+        maximum number of hops explored
+
+    returns
+    -------
+    dict, a map from every node within max_hops hops (including the source) to its number of hops
+    '''
+    distances = {source_node: 0}
+    frontier = [source_node]
+    for hops in range(1, max_hops + 1):
+        next_frontier = []
+        for node in frontier:
+            for neighbor in graph.neighbors(node):
+                if neighbor not in distances:
+                    distances[neighbor] = hops
+                    next_frontier.append(neighbor)
+        if len(next_frontier) == 0:
+            break
+        frontier = next_frontier
+    return distances
+
+def get_pairwise_distances_within_depth(graph, source_nodes, max_hops, target_nodes=None):
+    ''' computes the hop distances between all pairs of source nodes at most 
+    max_hops apart in a single batched pass. Every node holds a bitmask of the 
+    sources that reached it; one pass over the edges of the frontier per hop 
+    is the boolean sparse matrix product A x reach, computed with integer bitsets.
+
+    parameters
+    ----------
+    graph : DocumentWordGraph
+        a word graph
+    source_nodes : list
+        ids of the source nodes, without duplicates
+    max_hops : int
+        maximum number of hops explored
+    target_nodes : set
+        ids of the target nodes. Defaults to the source nodes
+
+    returns
+    -------
+    list, (source index, target node, hops) tuples for every pair of source and target nodes, in increasing hops
+    '''
+    target_nodes = set(source_nodes) if target_nodes is None else target_nodes
+    reach = dict([ (node, 1 << i) for (i, node) in enumerate(source_nodes) ])
+    frontier = dict(reach)
+    pairs = [ (i, node, 0) for (i, node) in enumerate(source_nodes) if node in target_nodes ]
+    for hops in range(1, max_hops + 1):
+        propagated = {}
+        for (node, bits) in frontier.items():
+            for neighbor in graph.neighbors(node):
+                propagated[neighbor] = propagated.get(neighbor, 0) | bits
+        frontier = {}
+        for (node, bits) in propagated.items():
+            new_bits = bits & ~reach.get(node, 0)
+            if new_bits:
+                reach[node] = reach.get(node, 0) | new_bits
+                frontier[node] = new_bits
+                if node in target_nodes:
+                    while new_bits:
+                        lowest_bit = new_bits & -new_bits
+                        pairs.append((lowest_bit.bit_length() - 1, node, hops))
+                        new_bits ^= lowest_bit
+        if len(frontier) == 0:
+            break
+    return pairs
+
+def extract_graph_paths(graph, source_nodes, method='simple', max_depth=5, target_nodes=None):
+    ''' finds the pairs of source and target nodes connected by a shortest path 
+    of less than max_depth nodes. Searches stop at that depth, so only the neighborhood 
+    of each source is visited, and nodes of other connected components are never reached.
+
+    parameters
+    ----------
+    graph : DocumentWordGraph
+        a word graph
+    source_nodes : list
+        ids of the nodes paths start and end at, typically content words
+    method : str
+        'simple' runs a depth bounded search from each source node, 'batched' 
+        computes all pairs in one pass (see get_pairwise_distances_within_depth), 
+        which is faster when there are many source nodes
+    max_depth : int
+        paths have less than max_depth nodes
+    target_nodes : list
+        ids of the nodes paths end at. Defaults to the source nodes
+
+    returns
+    -------
+    list
+        (source node, target node, distance) tuples where distance is the number of nodes on the path 
+        (a source is paired with itself at distance 1), ordered by source node and then by distance and target
+    '''
+    source_nodes = [ node for node in dict.fromkeys(source_nodes) if node in graph ]
+    target_node_set = set(source_nodes) if target_nodes is None else set(target_nodes)
+    max_hops = max_depth - 2
+    if max_hops < 0:
+        return []
     graph_paths = []
-    for source_node in source_nodes:
-        paths = single_source_path_finder(graph, source_node)
-        for target in paths.keys():
-            if target in source_nodes:
-                distance = len(paths[target])
-                if distance < max_depth:
-                    graph_paths.append((source_node, target, distance))
+    if method == 'batched':
+        pairs = sorted(get_pairwise_distances_within_depth(graph, source_nodes, max_hops, target_node_set), key=lambda pair: (pair[0], pair[2], pair[1]))
+        for (i, target, hops) in pairs:
+            graph_paths.append((source_nodes[i], target, hops + 1))
+    elif method == 'simple':
+        for source_node in source_nodes:
+            distances = get_distances_within_depth(graph, source_node, max_hops)
+            for (target, hops) in sorted(distances.items(), key=lambda item: (item[1], item[0])):
+                if target in target_node_set:
+                    graph_paths.append((source_node, target, hops + 1))
+    else:
+        raise ValueError('unknown path extraction method: ' + method)
     return graph_paths
 
-def extract_max_graphlets_within_single_graph(doc_graph, max_orbits):
-    '''
-    TODO: extract paths witin connected components only. networkx throws exception if either ends of a path are not within the same component
-    '''
-    # identify all simple paths in a graph
-    
-    source_nodes = doc_graph.find_nonstopword_JNV_tagged_nodes() # DocumentWordGraph.find_nonstopword_JNV_tagged_nodes(doc_graph)
-    doc_simple_paths = extract_graph_paths(doc_graph, source_nodes, method='simple', max_depth=max_orbits)
-    
-    # processing paths
-    graphlet_db = {}
-    for (center, peripheral, distance) in doc_simple_paths:
-        if center not in graphlet_db.keys() and center not in stopwordlist:
-            graphlet_db[center] = Graphlet(center)
-        # two-way paths
-        if peripheral not in graphlet_db.keys() and peripheral not in stopwordlist:
-            graphlet_db[peripheral] = Graphlet(peripheral)
-        if center not in stopwordlist:
-            graphlet_db[center].put_node_on_orbit(peripheral,distance-1)
-        if peripheral not in stopwordlist:
-            graphlet_db[peripheral].put_node_on_orbit(center,distance-1)
-            
-    return graphlet_db.values()
-
-def select_candidate_source_orbit(n_orbits):
+def extract_max_graphlets_within_single_graph(doc_graph, max_orbits, center_nodes=None, method='simple'):
+    ''' builds the max graphlets of a document: every center word gets all the 
+    content words reachable within max_orbits - 1 hops, each on the orbit of its 
+    distance. Searches are depth bounded, so words of different connected 
+    components are never paired.
+
+    parameters
+    ----------
+    doc_graph : DocumentWordGraph
+        a word graph
+    max_orbits : int
+        maximum number of orbits of a graphlet, including the center
+    center_nodes : list
+        ids of the center words. Defaults to all content words of the graph
+    method : str
+        path extraction method, see extract_graph_paths
+
+    returns
+    -------
+    list
+        an array of graphlets, one for each center word with at least one content word around it
+    '''
+    content_word_nodes = doc_graph.get_content_word_nodes()
+    if center_nodes is None:
+        center_nodes = content_word_nodes
+    orbit_nodes_by_center = {}
+    for (center, peripheral, distance) in extract_graph_paths(doc_graph, center_nodes, method, max_depth=max_orbits + 1, target_nodes=content_word_nodes):
+        if center != peripheral:
+            orbit_nodes_by_center.setdefault(center, {}).setdefault(distance - 1, []).append(peripheral)
+    graphlets = []
+    for (center, orbit_nodes) in orbit_nodes_by_center.items():
+        graphlet = Graphlet(center)
+        for (orbit_id, nodes) in sorted(orbit_nodes.items()):
+            graphlet.put_nodelist_on_orbit(nodes, orbit_id)
+        graphlets.append(graphlet)
+    return graphlets
+
+def extract_max_graphlets_from_document(doc_item, context):
+    ''' builds the word graph of a single document and extracts the max 
+    graphlets centered on its frequent content words. This is the unit of 
+    work of the max graphlet extraction and may run in a worker process.
+
+    parameters
+    ----------
+    doc_item : tuple
+        (docid, TokenStream) of a document
+    context : dict
+        shared read-only data: the seeding data of build_graph_and_seeds, 
+        plus 'max_orbits' and 'path_method' (see extract_max_graphlets_within_single_graph)
+
+    returns
+    -------
+    tuple
+        (docid, list of (graphlet pattern key, center word id) tuples)
+    '''
+    (word_graph, seed_words) = build_graph_and_seeds(doc_item, context)
+    graphlets = extract_max_graphlets_within_single_graph(word_graph, context['max_orbits'], seed_words, context['path_method'])
+    return (word_graph.get_id(), [ (graphlet.get_pattern_key(), graphlet.get_center_node()) for graphlet in graphlets ])
+
+def select_candidate_source_orbit(n_orbits, rng=random):
     ''' picks a random orbit number.
     parameters
     ----------
     n_orbits : int
         number of orbits.
+    rng : random.Random
+        random number generator, defaults to the global one of the random module
     returns
     -------
     int
         a randomly selected number that designate an orbit.
     '''
-    return random.choice(list(range(0,n_orbits))) 
+    return rng.choice(list(range(0,n_orbits))) 
 
-def get_candidate_neigbors_on_next_orbit(orbit_source_nodes, all_graphlet_nodes, content_word_set, doc_graph):
+def get_candidate_neigbors_on_next_orbit(orbit_source_nodes, all_graphlet_nodes, doc_graph):
     ''' explores neighbors of source nodes of a givne orbit in a graphlet. The search process exploits the graph data structure of the document.
+    Neighbors are read from the content/function word partitions stored by the graph (see DocumentWordGraph.get_neighbor_partition),
+    and are only filtered one by one when they overlap the graphlet.
 
     parameters
     ----------
     orbit_source_nodes : list
-        a list of word nodes that serves as a starting point of the search.
-    all_graphlet_nodes : list
-        all nodes in a graphlet object. This helps avoid generating candidates that are already in the graphlet pattern.
-    content_word_set: list
-        in a graph, this contains only words of meaning or content.
+        a list of word node ids that serves as a starting point of the search.
+    all_graphlet_nodes : set
+        all node ids in a graphlet object. This helps avoid generating candidates that are already in the graphlet pattern.
     doc_graph: DocumentWordGraph
         a graph data structure that allows for navigation through nodes 
     returns
     -------
     list
-        an array of candidate words.
+        [content word neighbor ids, function word neighbor ids], in order of source node and of neighbor id
     '''
+    if not isinstance(all_graphlet_nodes, (set, frozenset)):
+        all_graphlet_nodes = set(all_graphlet_nodes)
     content_word_neighbors = []
     functional_word_neighbors = []
     for x in orbit_source_nodes:
-        for y in doc_graph.neighbors(x):
-            if y not in all_graphlet_nodes:
-                if y in content_word_set: # not visited before
-                    content_word_neighbors.append(y)
-                else:
-                    functional_word_neighbors.append(y)
+        (content_neighbors, function_neighbors) = doc_graph.get_neighbor_partition(x)
+        if all_graphlet_nodes.isdisjoint(content_neighbors):
+            content_word_neighbors.extend(content_neighbors)
+        else:
+            content_word_neighbors.extend([ y for y in content_neighbors if y not in all_graphlet_nodes ])
+        if all_graphlet_nodes.isdisjoint(function_neighbors):
+            functional_word_neighbors.extend(function_neighbors)
+        else:
+            functional_word_neighbors.extend([ y for y in function_neighbors if y not in all_graphlet_nodes ])
     return [content_word_neighbors,functional_word_neighbors]
 
-def filter_candidate_neighbors_by_word_freq(concept_neighbor_words_set, word_freq):
-    ''' takes a set of candidate words and filters them down to only the most frequent ones
+def filter_candidate_neighbors_by_word_freq(concept_neighbor_words_set, word_freq, max_candidates=5):
+    ''' takes a set of candidate words and filters them down to only the most frequent ones. Distinct words are ranked
+    by decreasing frequency, and words of equal frequency by increasing id. The top words are found by partial 
+    selection, without sorting the candidates
     parameters
     ----------
     concept_neighbor_words_set : list
-        an array of content words (non-stop/non-functional words)
+        an array of content word ids (non-stop/non-functional words)
+    word_freq : dict
+        a map from word ids to frequency values
+    max_candidates : int
+        number of words kept
+
+    returns
+    -------
+    list
+        filtered list of words based on word frequency map, most frequent first
+    '''
+    get_freq = word_freq.get
+    return heapq.nsmallest(max_candidates, set(concept_neighbor_words_set), key=lambda w: (-get_freq(w, 0), w))
+
+def select_ranked_candidate_neighbors(ranked_neighbor_lists, all_graphlet_nodes, word_freq, max_candidates=5):
+    ''' selects the most frequent content words from neighbor lists that are
+    already ranked by decreasing frequency (see DocumentWordGraph.get_neighbor_partition). 
+    The lists are merged lazily and the first distinct words that are not in the graphlet are 
+    kept, so only the words before the selected ones are read. The selection is the same as
+    filter_candidate_neighbors_by_word_freq
+
+    parameters
+    ----------
+    ranked_neighbor_lists : list
+        content word neighbor ids of each source node, ranked by decreasing freq and then increasing id
+    all_graphlet_nodes : set
+        all node ids in the graphlet, which are not candidates
+    word_freq : dict
+        the map from word ids to frequency values the lists are ranked by
+    max_candidates : int
+        number of words kept
+
+    returns
+    -------
+    list
+        the selected word ids, most frequent first
+    '''
+    if len(ranked_neighbor_lists) == 1:
+        ranked_neighbors = ranked_neighbor_lists[0]
+    else:
+        get_freq = word_freq.get
+        ranked_neighbors = heapq.merge(*ranked_neighbor_lists, key=lambda w: (-get_freq(w, 0), w))
+    candidates = []
+    if max_candidates <= 0:
+        return candidates
+    for word in ranked_neighbors:
+        # a word shared by several source nodes comes out of the merge repeatedly, in a row
+        if word not in all_graphlet_nodes and (len(candidates) == 0 or candidates[-1] != word):
+            candidates.append(word)
+            if len(candidates) == max_candidates:
+                break
+    return candidates
+
+def get_orbit_expansion_candidates(graphlet, orbit_id, word_graph, word_freq, max_candidates=1):
+    ''' lists the words that can be added on the orbit next to a given orbit
+
+    parameters
+    ----------
+    graphlet : Graphlet
+        the graphlet pattern to expand
+    orbit_id : int
+        the source orbit
+    word_graph : DocumentWordGraph
+        the word graph of the document of the graphlet
     word_freq : dict
-        a map from words to frequency values
+        a map from word id to freq
+    max_candidates : int
+        number of content word candidates kept
 
     returns
     -------
     list
-        filtered list of words based on word frequency map
-    '''
-    concept_neighbor_word_freq = {}
-    for w in concept_neighbor_words_set:
-        if w not in concept_neighbor_word_freq.keys():
-            concept_neighbor_word_freq[w] = 0
-        if w in word_freq.keys():
-            concept_neighbor_word_freq[w] = word_freq[w]
-    concept_neighbor_word_freq = dict(list(reversed(sorted(concept_neighbor_word_freq.items(), key=lambda kv: kv[1])))[:5])
-    return list(concept_neighbor_word_freq.keys())
-
-def expand_graphlet_candidates(graphlet, word_graph, word_freq):
+        [the max_candidates most frequent content word ids (see filter_candidate_neighbors_by_word_freq), function word ids]
+    '''
+    source_nodes = graphlet.get_nodes_on_orbit(orbit_id)
+    all_graphlet_nodes = graphlet.get_all_nodes()
+    if not word_graph.ranked_by_frequency:
+        concept_neighbor_words_set, functional_neighbor_words_set = get_candidate_neigbors_on_next_orbit(source_nodes, all_graphlet_nodes, word_graph)
+        concept_neighbor_words_set = filter_candidate_neighbors_by_word_freq(concept_neighbor_words_set, word_freq, max_candidates)
+        return [concept_neighbor_words_set, functional_neighbor_words_set]
+    # content neighbors are ranked by the graph, the best candidates are the first ones outside the graphlet
+    partitions = [ word_graph.get_neighbor_partition(x) for x in source_nodes ]
+    concept_neighbor_words_set = select_ranked_candidate_neighbors([ content_neighbors for (content_neighbors, _) in partitions ], all_graphlet_nodes, word_freq, max_candidates)
+    functional_neighbor_words_set = [ y for (_, function_neighbors) in partitions for y in function_neighbors if y not in all_graphlet_nodes ]
+    return [concept_neighbor_words_set, functional_neighbor_words_set]
+
+def select_random_orbit(graphlet, orbit_candidates, word_freq, rng, beam_width):
+    ''' RANDOM expansion strategy: picks one source orbit at random '''
+    return [select_candidate_source_orbit(graphlet.get_number_of_orbits(), rng)]
+
+def select_all_orbits(graphlet, orbit_candidates, word_freq, rng, beam_width):
+    ''' EXHAUSTIVE expansion strategy: every orbit is a source orbit '''
+    return list(range(graphlet.get_number_of_orbits()))
+
+def select_best_orbits(graphlet, orbit_candidates, word_freq, rng, beam_width):
+    ''' BEAM expansion strategy: picks the beam_width orbits whose best content
+    word candidate is the most frequent, inner orbits first on ties '''
+    orbit_scores = []
+    for orbit_id in range(graphlet.get_number_of_orbits()):
+        (concept_neighbor_words_set, functional_neighbor_words_set) = orbit_candidates(orbit_id)
+        if len(concept_neighbor_words_set) > 0:
+            orbit_scores.append((word_freq.get(concept_neighbor_words_set[0], 0), orbit_id))
+        elif len(functional_neighbor_words_set) > 0:
+            orbit_scores.append((-1, orbit_id))
+    return [ orbit_id for (_, orbit_id) in heapq.nlargest(beam_width, orbit_scores, key=operator.itemgetter(0)) ]
+
+EXPANSION_STRATEGIES = {
+    'RANDOM': select_random_orbit,
+    'EXHAUSTIVE': select_all_orbits,
+    'BEAM': select_best_orbits,
+}
+
+def expand_graphlet_candidates(graphlet, word_graph, word_freq, rng=random, strategy='RANDOM', beam_width=2, candidates_per_expansion=1):
     ''' expands text graphlet object by putting more nodes on orbits. 
-    The choice of orbits is done randomly. 
-    The choice of nodes is based on bigram models (words appear next to any node on the randomly selected orbit)
+    The choice of source orbits is made by an expansion strategy, randomly by default. 
+    The choice of nodes is based on bigram models (words appear next to any node on the selected orbit)
     Candidate nodes are furhter filtered by word frequencies estimated from unigrams
 
     parameters
@@ -140,146 +398,1001 @@ def expand_graphlet_candidates(graphlet, word_graph, word_freq):
     word_graph : DocumentWordGraph(networkx.Graph)
         a graph data object constructed from bigrams of text document 
     word_freq : dict
-        a map from word to freq
+        a map from word id to freq
+    rng : random.Random
+        random number generator used to pick the source orbit
+    strategy : str or function
+        'RANDOM' expands one orbit picked with rng, 'EXHAUSTIVE' expands every orbit and 'BEAM' expands 
+        the beam_width best scoring orbits (see EXPANSION_STRATEGIES). A function with the signature of 
+        select_random_orbit can also be given
+    beam_width : int
+        number of orbits expanded by the 'BEAM' strategy
+    candidates_per_expansion : int
+        number of new graphlets per expanded orbit, each with one of the most frequent content word candidates
 
     returns
     -------
     list
         an array of graphlets generated by adding extra nodes (and occasionally orbits) to input source graphlet
     '''
+    select_source_orbits = EXPANSION_STRATEGIES[strategy.upper()] if isinstance(strategy, str) else strategy
+    candidates_by_orbit = {}
+    def orbit_candidates(orbit_id):
+        if orbit_id not in candidates_by_orbit:
+            candidates_by_orbit[orbit_id] = get_orbit_expansion_candidates(graphlet, orbit_id, word_graph, word_freq, candidates_per_expansion)
+        return candidates_by_orbit[orbit_id]
     graphlet_next_gen = []
-    source_orbit_random = select_candidate_source_orbit(graphlet.get_number_of_orbits())
-    source_nodes = graphlet.get_nodes_on_orbit(source_orbit_random)
-    concept_neighbor_words_set, functional_neighbor_words_set = get_candidate_neigbors_on_next_orbit(source_nodes, graphlet.get_all_nodes(), word_graph.get_content_word_nodes(), word_graph)
-    # filter neigbors by freq
-    concept_neighbor_words_set = filter_candidate_neighbors_by_word_freq(concept_neighbor_words_set,word_freq)
-    if len(concept_neighbor_words_set) == 0 and len(functional_neighbor_words_set) == 0:
-        return graphlet_next_gen
-    ### grow one content word at a time
-    if len(concept_neighbor_words_set) > 0:
-        concept_neighbor_words_set = concept_neighbor_words_set[:1]
-    ###
-    for candidate_node in concept_neighbor_words_set:
-        new_graphlet = graphlet.clone()
-        if source_orbit_random == new_graphlet.get_number_of_orbits() - 1:
-            new_graphlet.add_orbit()
-
-        new_graphlet.put_nodelist_on_orbit(functional_neighbor_words_set, source_orbit_random + 1)
-        new_graphlet.put_node_on_orbit(candidate_node, source_orbit_random + 1)
-        graphlet_next_gen.append(new_graphlet)
+    for source_orbit in select_source_orbits(graphlet, orbit_candidates, word_freq, rng, beam_width):
+        concept_neighbor_words_set, functional_neighbor_words_set = orbit_candidates(source_orbit)
+        if len(concept_neighbor_words_set) == 0 and len(functional_neighbor_words_set) == 0:
+            continue
+        ### grow one content word at a time
+        for candidate_node in concept_neighbor_words_set:
+            new_graphlet = graphlet.clone()
+            if source_orbit == new_graphlet.get_number_of_orbits() - 1:
+                new_graphlet.add_orbit()
+
+            new_graphlet.put_nodelist_on_orbit(functional_neighbor_words_set, source_orbit + 1, masked=True)
+            new_graphlet.put_node_on_orbit(candidate_node, source_orbit + 1)
+            graphlet_next_gen.append(new_graphlet)
     return graphlet_next_gen
 
-def get_top_scoring_graphlets(hypotheses, pattern_freq, search_iter_min_freq, max_pruning_threshold):
-    return [(graphlet_pattern, graphlet, graph_id) \
-            for (graphlet_pattern, graphlet, graph_id) in hypotheses \
-                if graphlet_pattern == '' or graphlet_pattern in pattern_freq.keys() \
-                and  pattern_freq[graphlet_pattern] > search_iter_min_freq \
-        ][:max_pruning_threshold]
+def get_hypothesis_seed(random_seed, search_iteration, hypothesis_index):
+    ''' derives the seed of the random number generator used to expand one 
+    hypothesis. Seeds depend only on the run seed and on the position of the
+    hypothesis in the search stack, so the random choices made for a 
+    hypothesis do not depend on which worker process expands it.
+
+    parameters
+    ----------
+    random_seed : int
+        seed of the search run
+    search_iteration : int
+        index of the search stack
+    hypothesis_index : int
+        position of the hypothesis in the search stack
 
-def extract_graphlets(doc_collection, params):
+    returns
+    -------
+    int, seed
     '''
-    Extracts text graphlet patterns within a collection of teext documents.
-    The method first maps text document collection to a list of DocumentWordGraph objects. Then, graphlet patterns are extracted within Graph collections.
+    return (random_seed * 1000003 + search_iteration) * 1000003 + hypothesis_index
+
+def expand_hypotheses(indexed_hypotheses, graph_db, word_freq, explored_hypothesis, search_iteration, random_seed=None, count_patterns=True, expansion_strategy='RANDOM', beam_width=2, statistics=None, candidates_per_expansion=1, pattern_sketch=None):
+    ''' expands hypotheses of a search stack into candidates for the next 
+    stack. This is the unit of work of one search iteration and is run either
+    on the whole stack or on a shard of documents in a worker process.
 
     parameters
     ----------
-    doc_collection : list
-        a list of string, each element represent string text of a document in the corpus/collection.
+    indexed_hypotheses : iterable
+        (hypothesis index, (graphlet pattern key, graphlet, graph id)) tuples, in stack order
+    graph_db : dict
+        a map from graph id to DocumentWordGraph. It must contain the graphs of all given hypotheses
     word_freq : dict
-        a map from word to freq
-    min_freq: int
-        minimum frequency of a word node (node degree) before it can be included as a center/neuclus node within th graphlet pattern.
-    max_orbits: int
-        maximum number of orbits a given graphlet pattern can have
-    graphlet_type: str
-        belongs to two types: "pruned" and "max". "pruned" type contains selected number of nodes on each orbit and also the number of orbits can vary.
-        On the otherhand, "max" graphlets can include maximum reachable nodes and orbits.
+        a map from word id to freq
+    explored_hypothesis : ExploredHypothesisSet
+        graphlets explored so far within their graphs. New graphlets are added to it
+    search_iteration : int
+        index of the search stack being expanded
+    random_seed : int
+        if given, each hypothesis is expanded with its own random number generator (see get_hypothesis_seed). 
+        Otherwise the global random module is used
+    count_patterns : bool
+        if False, pattern counts are left to the caller (e.g. to a sketch) and an empty map is returned
+    expansion_strategy : str or function
+        orbit selection strategy, see expand_graphlet_candidates
+    beam_width : int
+        number of orbits expanded by the 'BEAM' strategy
+    statistics : dict
+        if given, its 'candidates' and 'dedup_hits' counts are increased by the number of candidate graphlets 
+        and of candidates skipped as already explored
+    candidates_per_expansion : int
+        number of content word candidates per expanded orbit, see expand_graphlet_candidates
+    pattern_sketch : CountMinSketch
+        if given, the pattern key of every expansion is added to it as the expansion is found, see count_frequent_patterns
 
     returns
     -------
-    list
-        an array of graphlets patterns.
-    '''    
+    tuple
+        (expansions, pattern_counts) where expansions is a list of (hypothesis index, graphlet pattern key, graphlet, graph id) 
+        tuples in hypothesis order and pattern_counts maps each graphlet pattern key to the number of expansions with that key
+    '''
+    expansions = []
+    pattern_counts = {}
+    number_of_candidates = 0
+    for (h, (graphlet_pattern_key, graphlet, graph_id)) in indexed_hypotheses:
+        # retrieve graph record from db to start search             
+        graph_obj = graph_db[graph_id]     
+        rng = random if random_seed is None else random.Random(get_hypothesis_seed(random_seed, search_iteration, h))
+        # expand graphlet by searching for neighboring nodes via graph_obj 
+        expanded_graphlet = expand_graphlet_candidates(graphlet, graph_obj, word_freq, rng, expansion_strategy, beam_width, candidates_per_expansion)
+        number_of_candidates += len(expanded_graphlet)
+        for graphlet_item in expanded_graphlet:
+            if not explored_hypothesis.add(graph_id, graphlet_item.get_canonical_key()):
+                continue
+            graphlet_pattern_key = graphlet_item.get_pattern_key()
+            if count_patterns:
+                pattern_counts[graphlet_pattern_key] = pattern_counts.get(graphlet_pattern_key,0) + 1
+            if pattern_sketch is not None:
+                pattern_sketch.add(graphlet_pattern_key)
+            expansions.append((h, graphlet_pattern_key, graphlet_item, graph_id))
+    if statistics is not None:
+        statistics['candidates'] = statistics.get('candidates', 0) + number_of_candidates
+        statistics['dedup_hits'] = statistics.get('dedup_hits', 0) + number_of_candidates - len(expansions)
+    return (expansions, pattern_counts)
+
+def expand_hypotheses_shard(shard, message):
+    ''' expands the hypotheses of a search stack that belong to the documents
+    of one shard. Runs in a ShardPool worker process, which keeps the shard's
+    graphs and explored hypotheses between search iterations.
+
+    parameters
+    ----------
+    shard : dict
+        shard state: 'graph_db', 'word_freq', 'explored_hypothesis', 'expansion_strategy', 'beam_width' and 'candidates_per_expansion'
+    message : tuple
+        ('expand', indexed hypotheses, search iteration, random seed, count patterns, sketch size) to expand hypotheses, 
+        where sketch size is None or the (width, depth) of a CountMinSketch of the expansions' patterns filled by the shard, or 
+        ('dedup_statistics',) to get the statistics of the shard's explored hypotheses, or
+        ('take_explored_journal',) to get the fingerprints of the hypotheses explored since the last call and 
+        ('set_explored_hypotheses', ExploredHypothesisSet) to restore them
+
+    returns
+    -------
+    tuple
+        (expansions, pattern_counts, statistics, pattern sketch or None) for 'expand', see expand_hypotheses, 
+        a statistics dict or an array of fingerprints, see ExploredHypothesisSet.take_journal
+    '''
+    command = message[0]
+    if command == 'expand':
+        (_, indexed_hypotheses, search_iteration, random_seed, count_patterns, sketch_size) = message
+        statistics = {'candidates': 0, 'dedup_hits': 0}
+        pattern_sketch = None if sketch_size is None else CountMinSketch(*sketch_size)
+        (expansions, pattern_counts) = expand_hypotheses(indexed_hypotheses, shard['graph_db'], shard['word_freq'], shard['explored_hypothesis'], search_iteration, random_seed, count_patterns, shard['expansion_strategy'], shard['beam_width'], statistics, shard['candidates_per_expansion'], pattern_sketch)
+        return (expansions, pattern_counts, statistics, pattern_sketch)
+    if command == 'dedup_statistics':
+        return shard['explored_hypothesis'].get_statistics()
+    if command == 'take_explored_journal':
+        return shard['explored_hypothesis'].take_journal()
+    if command == 'set_explored_hypotheses':
+        shard['explored_hypothesis'] = message[1]
+        return None
+    raise ValueError('unknown shard command: ' + str(command))
+
+def merge_shard_expansions(shard_results, statistics=None):
+    ''' reduces the partial results of shards into a single result. Partial 
+    pattern counts are summed and expansions are merged by hypothesis index, 
+    giving the same result as expanding the whole stack serially.
+
+    parameters
+    ----------
+    shard_results : list
+        (expansions, pattern_counts, statistics) tuples, one per shard (see expand_hypotheses_shard)
+    statistics : dict
+        if given, the shard statistics are added to it
+
+    returns
+    -------
+    tuple
+        (expansions, pattern_counts), see expand_hypotheses
+    '''
+    pattern_counts = {}
+    for shard_result in shard_results:
+        for (graphlet_pattern_key, count) in shard_result[1].items():
+            pattern_counts[graphlet_pattern_key] = pattern_counts.get(graphlet_pattern_key,0) + count
+        if statistics is not None:
+            for (name, value) in shard_result[2].items():
+                statistics[name] = statistics.get(name, 0) + value
+    expansions = list(heapq.merge(*[shard_result[0] for shard_result in shard_results], key=operator.itemgetter(0)))
+    return (expansions, pattern_counts)
+
+def merge_dedup_statistics(shard_statistics):
+    ''' sums the explored hypotheses statistics of several shards
+
+    parameters
+    ----------
+    shard_statistics : list
+        statistics dicts returned by ExploredHypothesisSet.get_statistics
+
+    returns
+    -------
+    dict, statistics of all shards
+    '''
+    statistics = {}
+    for shard_statistic in shard_statistics:
+        for (name, value) in shard_statistic.items():
+            statistics[name] = statistics.get(name, 0) + value
+    return statistics
+
+def count_frequent_patterns(expansions, pattern_sketch, min_freq):
+    ''' counts the patterns of a search iteration's expansions with memory 
+    bounded by the sketch plus the frequent patterns. The sketch is filled 
+    while the expansions are found (see expand_hypotheses), and only the 
+    patterns whose estimate passes the threshold are then counted exactly. 
+    Since estimates never under-count, every pattern with more than min_freq
+    expansions is found.
+
+    parameters
+    ----------
+    expansions : list
+        (hypothesis index, graphlet pattern key, graphlet, graph id) tuples, see expand_hypotheses
+    pattern_sketch : CountMinSketch
+        a sketch that holds the pattern keys of the expansions
+    min_freq : int
+        patterns must have more than min_freq expansions
+
+    returns
+    -------
+    dict, exact counts of the patterns with more than min_freq expansions
+    '''
+    pattern_counts = {}
+    for (_, graphlet_pattern_key, _, _) in expansions:
+        if graphlet_pattern_key in pattern_counts:
+            pattern_counts[graphlet_pattern_key] += 1
+        elif pattern_sketch.estimate(graphlet_pattern_key) > min_freq:
+            pattern_counts[graphlet_pattern_key] = 1
+    return dict([ (graphlet_pattern_key, count) for (graphlet_pattern_key, count) in pattern_counts.items() if count > min_freq ])
+
+def count_document_support(expansions, pattern_keys=None):
+    ''' counts the support of the patterns of a search iteration's expansions:
+    the number of documents with an expansion of the pattern, which, unlike 
+    the number of occurrences, cannot be larger than the support of the 
+    pattern it was expanded from. Every expansion adds one content word, so 
+    a pattern key is only found at one search iteration, and documents are
+    disjoint across shards and document batches: supports of separate 
+    shards or batches add up. Expansions are grouped by document, as a
+    DocumentSupportCounter takes the occurrences of one document at a time.
+
+    parameters
+    ----------
+    expansions : list
+        (hypothesis index, graphlet pattern key, graphlet, graph id) tuples, see expand_hypotheses
+    pattern_keys : set or dict
+        if given, only these patterns are counted
+
+    returns
+    -------
+    dict, a map from graphlet pattern key to support
+    '''
+    pattern_keys_by_document = {}
+    for expansion in expansions:
+        if pattern_keys is None or expansion[1] in pattern_keys:
+            pattern_keys_by_document.setdefault(expansion[3], []).append(expansion[1])
+    support_counter = DocumentSupportCounter()
+    for (graph_id, graphlet_pattern_keys) in pattern_keys_by_document.items():
+        for graphlet_pattern_key in graphlet_pattern_keys:
+            support_counter.add(graphlet_pattern_key, graph_id)
+    return support_counter.get_counts()
+
+def get_top_scoring_graphlets(hypotheses, pattern_freq, search_iter_min_freq, max_pruning_threshold, tie_break='ORDER', rng=random):
+    ''' prunes a search stack to the max_pruning_threshold hypotheses with the
+    most frequent patterns, among those with a frequency above search_iter_min_freq.
+    Selection uses a heap bounded by max_pruning_threshold entries.
+
+    parameters
+    ----------
+    hypotheses : list
+        (graphlet pattern key, graphlet, graph id) tuples of a search stack
+    pattern_freq : dict
+        a map from graphlet pattern key to freq. Seeds (empty patterns) always rank first
+    search_iter_min_freq : int
+        hypotheses must have a pattern frequency above this threshold
+    max_pruning_threshold : int
+        maximum number of hypotheses kept
+    tie_break : str
+        order of hypotheses with equally frequent patterns: 'ORDER' keeps the earliest in the stack, 
+        'SIZE' prefers larger graphlets (then the earliest), 'RANDOM' picks at random using rng
+    rng : random.Random
+        random number generator used by the 'RANDOM' tie break
+
+    returns
+    -------
+    list, the kept hypotheses, in stack order
+    '''
+    tie_break = tie_break.upper()
+    if tie_break not in ('ORDER', 'SIZE', 'RANDOM'):
+        raise ValueError('unknown tie break: ' + tie_break)
+    def iter_ranked_hypotheses():
+        for (h, (graphlet_pattern, graphlet, graph_id)) in enumerate(hypotheses):
+            freq = float('inf') if len(graphlet_pattern) == 0 else pattern_freq.get(graphlet_pattern, 0)
+            if freq <= search_iter_min_freq:
+                continue
+            if tie_break == 'SIZE':
+                yield ((freq, graphlet.get_size()), h)
+            elif tie_break == 'RANDOM':
+                yield ((freq, rng.random()), h)
+            else:
+                yield ((freq,), h)
+    # nlargest is stable, so the remaining ties go to the earliest hypotheses
+    top_ranked = heapq.nlargest(max_pruning_threshold, iter_ranked_hypotheses(), key=operator.itemgetter(0))
+    return [ hypotheses[h] for h in sorted([ h for (_, h) in top_ranked ]) ]
 
-    ''' Method level constants '''
-    
-    max_orbits = params['MAX_ORBIT_CAPACITY']
-    graphlet_type = params['GRAPHLET_TYPE']
+def get_params_fingerprint(params):
+    ''' identifies the parameters that determine the results of a search run, 
+    ignoring storage locations and reporting options
+
+    parameters
+    ----------
+    params : dict
+        graphlet search parameters, see extract_graphlets
+
+    returns
+    -------
+    str, hex digest
+    '''
+    ignored_keys = set(['CHECKPOINT_DIR', 'GRAPH_STORE_DIR', 'GRAPH_CACHE_SIZE', 'METRICS_FILE', 'VERBOSE'])
+    search_params = sorted([ (key, repr(value)) for (key, value) in params.items() if key not in ignored_keys ])
+    return blake2b(repr(search_params).encode('utf-8'), digest_size=16).hexdigest()
+
+def get_vocabulary_fingerprint(vocabulary):
+    ''' identifies a vocabulary, including the ids of its words
+
+    parameters
+    ----------
+    vocabulary : Vocabulary
+        a vocabulary
+
+    returns
+    -------
+    str, hex digest
+    '''
+    digest = blake2b(digest_size=16)
+    for word_id in range(len(vocabulary)):
+        digest.update(vocabulary.get_word(word_id).encode('utf-8') + b'\x1f')
+    return digest.hexdigest()
+
+def build_graph_and_seeds(doc_item, context):
+    ''' builds the word graph of a single document and lists its seed words.
+    This is the unit of work of the seeding phase and may run in a worker 
+    process.
+
+    parameters
+    ----------
+    doc_item : tuple
+        (docid, TokenStream) of a document
+    context : dict
+        shared read-only seeding data: 'vocabulary' (a complete Vocabulary of
+        the corpus), 'word_freq' (a map from word id to freq), 'min_word_freq',
+        'stopwords' and 'content_word_pattern'
+
+    returns
+    -------
+    tuple
+        (DocumentWordGraph, array of word ids that seed graphlets)
+    '''
+    (docid, token_stream) = doc_item
+    word_freq = context['word_freq']
+    min_word_freq = context['min_word_freq']
+    word_graph = DocumentWordGraph(docid, token_stream, source_type='tokens', stopwords=context['stopwords'], content_word_pattern=context['content_word_pattern'], vocabulary=context['vocabulary'], word_freq=word_freq)
+    seed_words = array('i', [word for word in word_graph.get_content_word_nodes() if word_freq.get(word, 0) > min_word_freq])
+    return (word_graph, seed_words)
+
+def extract_max_graphlet_patterns(token_streams, seeding_context, params, workers=1, word_patterns=None, instrumentation=None):
+    ''' extracts the max graphlets of documents in one pass (see extract_max_graphlets_from_document). 
+    The word graphs are discarded as soon as their graphlets are built.
+
+    parameters
+    ----------
+    token_streams : iterable
+        (docid, TokenStream) tuples
+    seeding_context : dict
+        shared read-only seeding data, see build_graph_and_seeds
+    params : dict
+        search parameters, see extract_graphlets
+    workers : int
+        number of worker processes
+    word_patterns : OccurrenceStore
+        the occurrences of each graphlet pattern key, updated with the occurrences found
+    instrumentation : Instrumentation
+        receives progress and phase timings, see instrumentation.Instrumentation
+
+    returns
+    -------
+    OccurrenceStore, word_patterns
+    '''
+    word_patterns = OccurrenceStore() if word_patterns is None else word_patterns
+    instrumentation = Instrumentation() if instrumentation is None else instrumentation
+    max_graphlet_context = dict(seeding_context, max_orbits=params['MAX_ORBIT_CAPACITY'], path_method=params.get('MAX_GRAPHLET_PATH_METHOD', 'simple'))
+    with instrumentation.phase('max_graphlets') as phase:
+        number_of_documents = 0
+        for (graph_id, center_patterns) in instrumentation.progress(map_documents(extract_max_graphlets_from_document, token_streams, workers, max_graphlet_context), total=len(token_streams) if hasattr(token_streams, '__len__') else None):
+            number_of_documents += 1
+            for (graphlet_pattern_key, center_node) in center_patterns:
+                word_patterns.add(graphlet_pattern_key, center_node, graph_id)
+        phase.metrics['documents'] = number_of_documents
+        phase.metrics['distinct_patterns'] = len(word_patterns)
+    return word_patterns
+
+def build_search_context(graph_db, docids, word_freq, params, workers=1):
+    ''' prepares the expansion state of a graphlet search. With several 
+    workers, documents are sharded across worker processes that own their 
+    graphs and explored hypotheses, and each search iteration is a map/reduce
+    over the shards.
+
+    parameters
+    ----------
+    graph_db : dict or DiskGraphStore
+        a map from graph id to the DocumentWordGraph of each document to search. With several workers, 
+        in-memory graphs are moved to the shard processes and graph_db is emptied
+    docids : list
+        ids of the documents to search, in corpus order
+    word_freq : dict
+        a map from word id to freq
+    params : dict
+        search parameters, see extract_graphlets
+    workers : int
+        number of shard worker processes
+
+    returns
+    -------
+    dict
+        search context: the shard state of a serial search (see expand_hypotheses_shard) plus 'random_seed', 
+        'dedup_memory' (the memory limit of each explored hypotheses set), 'shard_pool' (a ShardPool, or None 
+        for a serial search) and 'shard_by_graph_id'
+    '''
+    DEDUP_MAX_MEMORY_BYTES = params.get('DEDUP_MAX_MEMORY_BYTES', None)
+    journal = params.get('CHECKPOINT_DIR', None) is not None
+    search_context = {'graph_db': graph_db, 'word_freq': word_freq, 'expansion_strategy': params.get('EXPANSION_STRATEGY', 'RANDOM'), 
+        'beam_width': params.get('BEAM_WIDTH', 2), 'candidates_per_expansion': params.get('CANDIDATES_PER_EXPANSION', 1), 
+        'random_seed': params.get('RANDOM_SEED', None), 'dedup_memory': DEDUP_MAX_MEMORY_BYTES, 'shard_pool': None, 'shard_by_graph_id': None}
+    if workers <= 1:
+        search_context['explored_hypothesis'] = ExploredHypothesisSet(DEDUP_MAX_MEMORY_BYTES)
+        if journal:
+            search_context['explored_hypothesis'].start_journal()
+        return search_context
+    search_context['dedup_memory'] = None if DEDUP_MAX_MEMORY_BYTES is None else DEDUP_MAX_MEMORY_BYTES // workers
+    # an on-disk graph store is shared by all shards, each of which pages in only the graphs of its own documents
+    shard_states = [ {'graph_db': {} if isinstance(graph_db, dict) else graph_db, 'word_freq': word_freq, 'explored_hypothesis': ExploredHypothesisSet(search_context['dedup_memory']), 
+        'expansion_strategy': search_context['expansion_strategy'], 'beam_width': search_context['beam_width'], 'candidates_per_expansion': search_context['candidates_per_expansion']} for _ in range(workers) ]
+    if journal:
+        for shard_state in shard_states:
+            shard_state['explored_hypothesis'].start_journal()
+    shard_by_graph_id = {}
+    for (i, docid) in enumerate(docids):
+        shard_by_graph_id[docid] = i % workers
+        if isinstance(graph_db, dict):
+            shard_states[i % workers]['graph_db'][docid] = graph_db[docid]
+    search_context['shard_pool'] = ShardPool(shard_states, expand_hypotheses_shard)
+    search_context['shard_by_graph_id'] = shard_by_graph_id
+    del shard_states
+    if isinstance(graph_db, dict):
+        graph_db.clear()
+    return search_context
+
+def map_search_shards(search_context, message):
+    ''' sends the same command to every shard of a search, see expand_hypotheses_shard
+
+    parameters
+    ----------
+    search_context : dict
+        search context, see build_search_context
+    message : tuple
+        a shard command
+
+    returns
+    -------
+    list, the result of each shard. A serial search has a single shard
+    '''
+    if search_context['shard_pool'] is None:
+        return [expand_hypotheses_shard(search_context, message)]
+    shard_pool = search_context['shard_pool']
+    return shard_pool.map([ message ] * shard_pool.get_number_of_shards())
+
+def expand_search_stack(indexed_hypotheses, search_iteration, search_context, count_patterns=True, pattern_sketch=None, statistics=None, instrumentation=None):
+    ''' expands the hypotheses of a search stack, serially or across the 
+    shards of the search (see expand_hypotheses).
+
+    parameters
+    ----------
+    indexed_hypotheses : list
+        (hypothesis index, (graphlet pattern key, graphlet, graph id)) tuples, in stack order
+    search_iteration : int
+        index of the search stack being expanded
+    search_context : dict
+        search context, see build_search_context
+    count_patterns : bool
+        if False, pattern counts are left to the caller and an empty map is returned
+    pattern_sketch : CountMinSketch
+        if given, receives the pattern key of every expansion
+    statistics : dict
+        if given, receives the expansion statistics, see expand_hypotheses
+    instrumentation : Instrumentation
+        receives the progress of a serial search
+
+    returns
+    -------
+    tuple
+        (expansions, pattern_counts), see expand_hypotheses
+    '''
+    shard_pool = search_context['shard_pool']
+    if shard_pool is None:
+        if instrumentation is not None:
+            indexed_hypotheses = instrumentation.progress(indexed_hypotheses)
+        return expand_hypotheses(indexed_hypotheses, search_context['graph_db'], search_context['word_freq'], search_context['explored_hypothesis'], search_iteration, search_context['random_seed'], count_patterns, 
+            search_context['expansion_strategy'], search_context['beam_width'], statistics, search_context['candidates_per_expansion'], pattern_sketch)
+    shard_by_graph_id = search_context['shard_by_graph_id']
+    shard_hypotheses = [ [] for _ in range(shard_pool.get_number_of_shards()) ]
+    for (h, hypothesis) in indexed_hypotheses:
+        shard_hypotheses[shard_by_graph_id[hypothesis[2]]].append((h, hypothesis))
+    sketch_size = None if pattern_sketch is None else (pattern_sketch.width, pattern_sketch.depth)
+    shard_results = shard_pool.map([ ('expand', shard_indexed_hypotheses, search_iteration, search_context['random_seed'], count_patterns, sketch_size) for shard_indexed_hypotheses in shard_hypotheses ])
+    if pattern_sketch is not None:
+        for shard_result in shard_results:
+            pattern_sketch.merge(shard_result[3])
+    return merge_shard_expansions(shard_results, statistics)
+
+def count_search_patterns(expansions, pattern_counts, min_freq, pattern_sketch=None, document_support=False):
+    ''' counts the patterns of a search iteration's expansions. With a 
+    sketch, only the patterns that pass the threshold are counted (see 
+    count_frequent_patterns); with document support, patterns are counted 
+    by document rather than by occurrence (see count_document_support).
+
+    parameters
+    ----------
+    expansions : list
+        (hypothesis index, graphlet pattern key, graphlet, graph id) tuples, see expand_hypotheses
+    pattern_counts : dict
+        occurrence counts of all patterns, as returned by expand_hypotheses. Unused with a sketch
+    min_freq : int
+        the pruning threshold of the search iteration
+    pattern_sketch : CountMinSketch
+        if given, the sketch filled with the pattern keys of the expansions
+    document_support : bool
+        if True, patterns are counted by document
+
+    returns
+    -------
+    dict, a map from graphlet pattern key to count. With a sketch, only the patterns with a count above min_freq are kept
+    '''
+    if pattern_sketch is not None:
+        pattern_counts = count_frequent_patterns(expansions, pattern_sketch, min_freq)
+    if not document_support:
+        return pattern_counts
+    if pattern_sketch is None:
+        return count_document_support(expansions)
+    pattern_counts = count_document_support(expansions, pattern_counts)
+    return dict([ (graphlet_pattern_key, count) for (graphlet_pattern_key, count) in pattern_counts.items() if count > min_freq ])
+
+def restore_search_checkpoint(checkpoint, vocabulary_fingerprint, search_context, pattern_freq, word_patterns, pattern_counts_by_iteration=None):
+    ''' restores the state of the last iteration saved in a checkpoint, if 
+    any: results are replayed from the checkpoint log, and the explored 
+    hypotheses of the search are rebuilt from the fingerprints logged by each
+    iteration (see save_search_checkpoint).
+
+    parameters
+    ----------
+    checkpoint : SearchCheckpoint
+        checkpoint of the search
+    vocabulary_fingerprint : str
+        fingerprint of the vocabulary of the search, see get_vocabulary_fingerprint
+    search_context : dict
+        search context, see build_search_context. Its explored hypotheses are replaced
+    pattern_freq : dict
+        a map from graphlet pattern key to freq, updated with the saved pattern counts
+    word_patterns : OccurrenceStore
+        updated with the saved occurrences
+    pattern_counts_by_iteration : dict
+        if given, receives the saved pattern counts of each search iteration
+
+    returns
+    -------
+    tuple
+        (index of the last saved search iteration, the saved next search stack), or None if there is no checkpoint
+    '''
+    saved_checkpoint = checkpoint.load()
+    if saved_checkpoint is None:
+        return None
+    (header, log_records, state_records) = saved_checkpoint
+    if header['vocabulary_fingerprint'] != vocabulary_fingerprint:
+        raise ValueError('checkpoint in ' + checkpoint.checkpoint_dir + ' was saved for another corpus')
+    # the vocabulary fingerprint guarantees that the logged word ids are those of this vocabulary
+    saved_journals = []
+    for (search_iteration, pattern_counts, occurrences, explored_journals) in log_records:
+        for (graphlet_pattern_key, count) in pattern_counts.items():
+            pattern_freq[graphlet_pattern_key] = pattern_freq.get(graphlet_pattern_key,0) + count
+        if pattern_counts_by_iteration is not None:
+            pattern_counts_by_iteration[search_iteration] = pattern_counts
+        for (graphlet_pattern_key, center_node, graph_id) in occurrences:
+            word_patterns.add(graphlet_pattern_key, center_node, graph_id)
+        saved_journals.append(explored_journals)
+    del log_records
+    graphlet_search_stack = list(chain.from_iterable(state_records))
+    shard_pool = search_context['shard_pool']
+    number_of_shards = 1 if shard_pool is None else shard_pool.get_number_of_shards()
+    if all([ len(explored_journals) == number_of_shards for explored_journals in saved_journals ]):
+        explored_hypotheses = [ ExploredHypothesisSet(search_context['dedup_memory']) for _ in range(number_of_shards) ]
+        for explored_journals in saved_journals:
+            for (explored_hypothesis, journal) in zip(explored_hypotheses, explored_journals):
+                explored_hypothesis.add_fingerprints(journal)
+    else:
+        # shards own disjoint documents, so the union of their fingerprints is valid for any sharding
+        explored_hypothesis = ExploredHypothesisSet(search_context['dedup_memory'])
+        for explored_journals in saved_journals:
+            for journal in explored_journals:
+                explored_hypothesis.add_fingerprints(journal)
+        explored_hypotheses = [explored_hypothesis] * number_of_shards
+    del saved_journals
+    for explored_hypothesis in explored_hypotheses:
+        explored_hypothesis.start_journal()
+    if shard_pool is None:
+        search_context['explored_hypothesis'] = explored_hypotheses[0]
+    else:
+        shard_pool.map([ ('set_explored_hypotheses', explored_hypothesis) for explored_hypothesis in explored_hypotheses ])
+    return (header['search_iteration'], graphlet_search_stack)
+
+def save_search_checkpoint(checkpoint, vocabulary_fingerprint, search_context, search_iteration, pattern_counts, occurrences, graphlet_search_stack):
+    ''' saves a completed search iteration: its results and the hypotheses it
+    explored are appended to the checkpoint log, and the next search stack 
+    replaces the saved state
+
+    parameters
+    ----------
+    checkpoint : SearchCheckpoint
+        checkpoint of the search
+    vocabulary_fingerprint : str
+        fingerprint of the vocabulary of the search, see get_vocabulary_fingerprint
+    search_context : dict
+        search context, see build_search_context
+    search_iteration : int
+        index of the completed search iteration
+    pattern_counts : dict
+        the pattern counts added by the iteration
+    occurrences : list
+        (graphlet pattern key, center node, graph id) tuples of the occurrences recorded by the iteration
+    graphlet_search_stack : list
+        the pruned next search stack
+
+    returns
+    -------
+
+    '''
+    explored_journals = map_search_shards(search_context, ('take_explored_journal',))
+    checkpoint.append_log((search_iteration, pattern_counts, occurrences, explored_journals))
+    checkpoint.save_state({'search_iteration': search_iteration, 'vocabulary_fingerprint': vocabulary_fingerprint}, iter_chunks(graphlet_search_stack, 4096))
+
+def search_graphlet_patterns(graphlet_seeds, graph_db, docids, word_freq, vocabulary, params, workers=1, pattern_freq=None, word_patterns=None, pattern_counts_by_iteration=None, instrumentation=None):
+    ''' runs the stack-based graphlet search from seed graphlets, see extract_graphlets.
+
+    parameters
+    ----------
+    graphlet_seeds : list
+        (empty pattern key (), Graphlet, graph id) tuples of the first search stack
+    graph_db : dict or DiskGraphStore
+        a map from graph id to the DocumentWordGraph of each document to search. With several workers, 
+        in-memory graphs are moved to the shard processes and graph_db is emptied
+    docids : list
+        ids of the documents to search, in corpus order
+    word_freq : dict
+        a map from word id to freq
+    vocabulary : Vocabulary
+        the vocabulary of the word graphs
+    params : dict
+        search parameters, see extract_graphlets
+    workers : int
+        number of shard worker processes
+    pattern_freq : dict
+        a map from graphlet pattern key to freq, updated with the patterns found. Existing counts take part in pruning
+    word_patterns : OccurrenceStore
+        the occurrences of each graphlet pattern key, updated with the occurrences found
+    pattern_counts_by_iteration : dict
+        if given, receives the pattern counts added at each search iteration
+    instrumentation : Instrumentation
+        receives progress, phase timings and the metrics of each search iteration ('iteration', 'hypotheses', 
+        'skipped', 'candidates', 'expansions', 'dedup_hits', 'distinct_patterns', 'total_patterns', 'pruned', 'stack_size', 
+        'seconds' and 'rss_bytes'), see instrumentation.Instrumentation
+
+    returns
+    -------
+    OccurrenceStore, word_patterns
+    '''
     pattern_freq_threshold_by_stack = params['PATTERN_FREQ_THRESHOLD_BY_STACK']
     MAX_SEARCH_ITERATIONS = params['MAX_SEARCH_ITERATIONS']
     pruned_stack_size = params['PRUNED_STACK_SIZE'] 
+    RANDOM_SEED = params.get('RANDOM_SEED', None)
+    PRUNING_TIE_BREAK = params.get('PRUNING_TIE_BREAK', 'ORDER')
+    EXPANSION_STRATEGY = params.get('EXPANSION_STRATEGY', 'RANDOM')
+    PATTERN_COUNTING = params.get('PATTERN_COUNTING', 'EXACT').upper()
+    SKETCH_EPSILON = params.get('SKETCH_EPSILON', 0.0001)
+    SKETCH_DELTA = params.get('SKETCH_DELTA', 0.01)
+    SKETCH_MAX_BYTES = params.get('SKETCH_MAX_BYTES', None)
+    CHECKPOINT_DIR = params.get('CHECKPOINT_DIR', None)
+    PATTERN_SUPPORT = params.get('PATTERN_SUPPORT', 'OCCURRENCES').upper()
+    if PATTERN_SUPPORT not in ('OCCURRENCES', 'DOCUMENTS'):
+        raise ValueError('unknown pattern support: ' + PATTERN_SUPPORT)
+    document_support = PATTERN_SUPPORT == 'DOCUMENTS'
+    count_patterns = PATTERN_COUNTING != 'SKETCH'
+    # support is only anti-monotone over the patterns found when every orbit is expanded, and skipping
+    # hypotheses only leaves the output unchanged when patterns below the threshold are not recorded
+    apriori_pruning = document_support and params.get('APRIORI_PRUNING', True) and EXPANSION_STRATEGY == 'EXHAUSTIVE' and not count_patterns
+
+    pattern_freq = {} if pattern_freq is None else pattern_freq
+    word_patterns = OccurrenceStore() if word_patterns is None else word_patterns
+    instrumentation = Instrumentation() if instrumentation is None else instrumentation
+    graphlet_search_stack = {0: graphlet_seeds}
+    ''' Performing graphlet search here ... '''
+    ''' A search stack indexed by iterations. In each iteration, graphlets are expanded into next iteration stack    '''
+    search_context = build_search_context(graph_db, docids, word_freq, params, workers)
+    instrumentation.message("Starting Stack-based search for graphlet patterns...")
+    try:
+        start_iteration = 0
+        checkpoint = None
+        if CHECKPOINT_DIR is not None:
+            checkpoint = SearchCheckpoint(CHECKPOINT_DIR, get_params_fingerprint(params))
+            vocabulary_fingerprint = get_vocabulary_fingerprint(vocabulary)
+            with instrumentation.phase('checkpoint_restore'):
+                restored_search = restore_search_checkpoint(checkpoint, vocabulary_fingerprint, search_context, pattern_freq, word_patterns, pattern_counts_by_iteration)
+            if restored_search is not None:
+                start_iteration = restored_search[0] + 1
+                graphlet_search_stack[start_iteration] = restored_search[1]
+                del restored_search
+                instrumentation.message("Resuming after search iter # {0}".format(start_iteration - 1))
+        for search_iteration in range(start_iteration, MAX_SEARCH_ITERATIONS):
+            instrumentation.message("Starting search iter # {0}".format(search_iteration))
+            iteration_start_time = time.perf_counter()
+            # expansion statistics are only gathered for observers
+            expansion_statistics = {'candidates': 0, 'dedup_hits': 0} if instrumentation.enabled else None
+            graphlet_search_stack[search_iteration+1] = []
+            hypotheses = graphlet_search_stack[search_iteration]
+            freq_pruning_threshold = pattern_freq_threshold_by_stack.get(search_iteration,5)
+            if apriori_pruning:
+                ''' Apriori pruning: document support is anti-monotone, so hypotheses whose pattern support does not pass this stack's threshold cannot have frequent extensions and are not expanded '''
+                indexed_hypotheses = [ (h, hypothesis) for (h, hypothesis) in enumerate(hypotheses) if len(hypothesis[0]) == 0 or pattern_freq.get(hypothesis[0],0) > freq_pruning_threshold ]
+            else:
+                indexed_hypotheses = list(enumerate(hypotheses))
+            number_of_skipped = len(hypotheses) - len(indexed_hypotheses)
+            # in sketch mode, patterns are added to the sketch as expansions are found
+            pattern_sketch = None if count_patterns else CountMinSketch.from_error_bounds(SKETCH_EPSILON, SKETCH_DELTA, SKETCH_MAX_BYTES)
+            with instrumentation.phase('expansion') as phase:
+                (expansions, pattern_counts) = expand_search_stack(indexed_hypotheses, search_iteration, search_context, count_patterns, pattern_sketch, expansion_statistics, instrumentation)
+                phase.metrics['iteration'] = search_iteration
+            del indexed_hypotheses
+            with instrumentation.phase('counting') as phase:
+                pattern_counts = count_search_patterns(expansions, pattern_counts, freq_pruning_threshold, pattern_sketch, document_support)
+                phase.metrics['iteration'] = search_iteration
+            if pattern_sketch is not None:
+                instrumentation.message("Pattern sketch: {0} bytes, estimates within +{1:.1f} of exact counts with probability {2}".format(pattern_sketch.get_memory_usage(), pattern_sketch.get_error_bound(), 1 - SKETCH_DELTA))
+                del pattern_sketch
+            for (graphlet_pattern_key, count) in pattern_counts.items():
+                pattern_freq[graphlet_pattern_key] = pattern_freq.get(graphlet_pattern_key,0) + count
+            if pattern_counts_by_iteration is not None:
+                pattern_counts_by_iteration[search_iteration] = pattern_counts
+            occurrences = []
+            for (_, graphlet_pattern_key, graphlet_item, graph_id) in expansions:
+                if not count_patterns and graphlet_pattern_key not in pattern_counts:
+                    continue
+                center_node = graphlet_item.get_center_node()
+                word_patterns.add(graphlet_pattern_key, center_node, graph_id)
+                graphlet_search_stack[search_iteration+1].append((graphlet_pattern_key, graphlet_item, graph_id))
+                if checkpoint is not None:
+                    occurrences.append((graphlet_pattern_key, center_node, graph_id))
+            del expansions
+
+            ''' Pruning search space by removing low scoring graphlets from next stack search iteration...'''
+            number_of_candidates = len(graphlet_search_stack[search_iteration+1])
+            with instrumentation.phase('pruning') as phase:
+                pruning_rng = random if RANDOM_SEED is None else random.Random(get_hypothesis_seed(RANDOM_SEED, search_iteration, -1))
+                graphlet_search_stack[search_iteration+1] = get_top_scoring_graphlets(graphlet_search_stack[search_iteration+1], pattern_freq, freq_pruning_threshold, pruned_stack_size, PRUNING_TIE_BREAK, pruning_rng)
+                phase.metrics['iteration'] = search_iteration
+            if checkpoint is not None:
+                with instrumentation.phase('checkpoint') as phase:
+                    save_search_checkpoint(checkpoint, vocabulary_fingerprint, search_context, search_iteration, pattern_counts, occurrences, graphlet_search_stack[search_iteration+1])
+                    phase.metrics['iteration'] = search_iteration
+            del occurrences
+            if instrumentation.enabled:
+                stack_size = len(graphlet_search_stack[search_iteration+1])
+                instrumentation.iteration_end({'iteration': search_iteration, 'hypotheses': len(hypotheses), 'skipped': number_of_skipped, 
+                    'candidates': expansion_statistics['candidates'], 'expansions': expansion_statistics['candidates'] - expansion_statistics['dedup_hits'], 'dedup_hits': expansion_statistics['dedup_hits'], 'distinct_patterns': len(pattern_counts), 
+                    'total_patterns': len(pattern_freq), 'pruned': number_of_candidates - stack_size, 'stack_size': stack_size, 
+                    'seconds': time.perf_counter() - iteration_start_time, 'rss_bytes': get_rss_bytes()})
+        dedup_statistics = merge_dedup_statistics(map_search_shards(search_context, ('dedup_statistics',)))
+        instrumentation.message("Explored hypotheses: {entries} stored, {hits} duplicates skipped, {evictions} evicted, ~{memory_bytes} bytes, {expected_collisions:.2e} expected fingerprint collisions".format(**dedup_statistics))
+    finally:
+        if search_context['shard_pool'] is not None:
+            search_context['shard_pool'].close()
+    return word_patterns
+
+def extract_graphlets(doc_collection, params, workers=1, observers=[]):
+    '''
+    Extracts text graphlet patterns within a collection of teext documents.
+    The method first maps text document collection to a list of DocumentWordGraph objects. Then, graphlet patterns are extracted within Graph collections.
+
+    parameters
+    ----------
+    doc_collection : dict, iterable, str or CorpusReader
+        a map from document id to either the string text of a document in the corpus/collection, or its TokenStream 
+        (see text_processing.tokenize_collection). Raw text is tokenized exactly once, by the params['TOKENIZER'] backend.
+        Documents can also be streamed from an iterable or generator of (docid, text) pairs, a directory of text files 
+        or an NLTK corpus reader (see corpus.iter_documents).
+    params : dict
+        search parameters, optional ones with a default:
+        'MIN_WORD_FREQ' : minimum frequency of a word before it can be the center of a graphlet
+        'WORD_SELECTION_RATIO' : fraction of the most frequent words kept in the word frequency map
+        'CONTENT_WORD_REGEX_PATTERN' : words matching this pattern (and not in 'STOPWORD_LIST') are content words
+        'STOPWORD_LIST' : words that are function words whatever their form
+        'GRAPHLET_TYPE' : 'PRUNED' for the iterative stack search, or 'MAX' for a single pass over the documents that builds 
+            one max graphlet (see extract_max_graphlets_within_single_graph) per seed word occurrence
+        'MAX_ORBIT_CAPACITY' : maximum number of orbits of a max graphlet
+        'MAX_GRAPHLET_PATH_METHOD' : path extraction method of max graphlets, see extract_graph_paths ('simple')
+        'MAX_SEARCH_ITERATIONS' : number of search iterations (stacks)
+        'PATTERN_FREQ_THRESHOLD_BY_STACK' : a map from search iteration to the frequency a pattern must exceed to be kept (5 if missing)
+        'PRUNED_STACK_SIZE' : maximum number of hypotheses kept in a stack, see get_top_scoring_graphlets
+        'PRUNING_TIE_BREAK' : order of hypotheses with equally frequent patterns, see get_top_scoring_graphlets ('ORDER')
+        'EXPANSION_STRATEGY' : orbits each hypothesis is expanded from: 'RANDOM' (one orbit), 'EXHAUSTIVE' (every orbit) or 
+            'BEAM' (the 'BEAM_WIDTH' best orbits, 2 by default), see expand_graphlet_candidates ('RANDOM')
+        'CANDIDATES_PER_EXPANSION' : graphlets grown per expanded orbit, one per most frequent content word candidate (1)
+        'RANDOM_SEED' : seed of the random choices, which makes runs reproducible for any number of workers (None)
+        'TOKENIZER' : 'NLTK', the faster 'REGEX' splitter, or 'WHITESPACE' for text that is already tokenized or tagged with 
+            one sentence per line, see text_processing.tokenize_text ('NLTK')
+        'PATTERN_COUNTING' : 'EXACT', or 'SKETCH' to count the patterns of each iteration in a Count-Min sketch of about 
+            'SKETCH_MAX_BYTES' bytes (error bounds 'SKETCH_EPSILON' and 'SKETCH_DELTA') and only record the patterns above 
+            the iteration threshold ('EXACT')
+        'PATTERN_SUPPORT' : 'OCCURRENCES', or 'DOCUMENTS' to count a pattern once per document it occurs in ('OCCURRENCES')
+        'APRIORI_PRUNING' : with document support, 'EXHAUSTIVE' expansion and sketch counting, hypotheses whose pattern 
+            support does not pass the threshold of their stack are not expanded (True)
+        'DEDUP_MAX_MEMORY_BYTES' : memory bound of the explored hypotheses, see dedup.ExploredHypothesisSet (None)
+        'GRAPH_STORE_DIR' : if set, token streams and word graphs are kept on disk and paged in through an LRU cache of 
+            'GRAPH_CACHE_SIZE' graphs (None, 1000)
+        'CHECKPOINT_DIR' : if set, the search is saved after every iteration, and a run with the same parameters and corpus 
+            resumes after the last saved iteration (None)
+        'VERBOSE' : prints messages and progress bars (True)
+        'METRICS_FILE' : if set, every instrumentation event is appended to this JSON lines file (None)
+    workers: int
+        number of worker processes used to tokenize documents, build word graphs and seed graphlets. 
+        Results are merged in docid order, so the search space does not depend on the number of workers.
+        Search iterations are also run in parallel on document shards; when params['RANDOM_SEED'] is set 
+        the patterns found are identical to a serial run with the same seed.
+    observers: list
+        SearchObserver objects notified of phase timings, search iteration metrics and progress messages (see 
+        instrumentation.Instrumentation). Messages and progress bars are printed unless params['VERBOSE'] is False, 
+        and every event is appended to the JSON lines file params['METRICS_FILE'] if it is set.
+
+    returns
+    -------
+    dict
+        a map from graphlet pattern string to its distinct (center word, graph id) occurrences, see occurrences.OccurrenceView
+    '''    
+
+    vocabulary = Vocabulary()
+    pattern_freq = {}
+    word_patterns = OccurrenceStore()
+    instrumentation = Instrumentation.from_params(params, observers)
+    try:
+        mine_documents(doc_collection, params, workers, vocabulary, None, pattern_freq, word_patterns, instrumentation)
+        ''' Pattern keys are rendered as strings for output only '''
+        with instrumentation.phase('output') as phase:
+            graphlet_patterns = word_patterns.render(vocabulary)
+            phase.metrics['patterns'] = len(graphlet_patterns)
+    finally:
+        instrumentation.close()
+    return graphlet_patterns
+
+def mine_documents(doc_collection, params, workers, vocabulary, token_freq, pattern_freq, word_patterns, instrumentation, mined_docids=(), pattern_counts_by_iteration=None):
+    ''' runs the mining pipeline on a collection of documents: tokenization 
+    and word frequencies, word graphs and seed graphlets, and the graphlet 
+    search. extract_graphlets mines a whole collection with it, and 
+    GraphletMiner one batch of documents at a time into accumulated results.
+
+    parameters
+    ----------
+    doc_collection : dict, iterable, str or CorpusReader
+        the documents, see extract_graphlets
+    params : dict
+        graphlet search parameters, see extract_graphlets
+    workers : int
+        number of worker processes
+    vocabulary : Vocabulary
+        the corpus vocabulary. The words of the documents are added to it
+    token_freq : Counter
+        token counts of the documents mined before, or None if there are none. The tokens of the documents are added 
+        to it once all documents are tokenized
+    pattern_freq : dict
+        a map from graphlet pattern key to freq, to which the pattern counts of the documents are added
+    word_patterns : OccurrenceStore
+        the store to which the pattern occurrences of the documents are added
+    instrumentation : Instrumentation
+        receives progress, phase timings and search metrics
+    mined_docids : set
+        ids of the documents mined before. A ValueError is raised if a document has one of these ids or the id of
+        another document of the collection, before any of the given structures is changed
+    pattern_counts_by_iteration : dict
+        if given, receives the pattern counts added at each search iteration, see search_graphlet_patterns
+
+    returns
+    -------
+    tuple
+        (document ids in collection order, WordFrequencyArray of the frequent words)
+    '''
+    graphlet_type = params['GRAPHLET_TYPE'].upper()
     MIN_WORD_FREQ = params['MIN_WORD_FREQ'] 
-    MAX_SEARCH_ITERATIONS = params['MAX_SEARCH_ITERATIONS']
     WORD_SELECTION_RATIO = params['WORD_SELECTION_RATIO']
     CONTENT_WORD_REGEX_PATTERN = params['CONTENT_WORD_REGEX_PATTERN']
     STOPWORD_LIST = params['STOPWORD_LIST']
+    GRAPH_STORE_DIR = params.get('GRAPH_STORE_DIR', None)
+    GRAPH_CACHE_SIZE = params.get('GRAPH_CACHE_SIZE', 1000)
+    TOKENIZER = params.get('TOKENIZER', 'NLTK')
 
-    #MIN_WORD_FREQ = 30
-    #MAX_SEARCH_ITERATIONS = 7
-    #WORD_SELECTION_RATIO = 0.1
-    search_iteration = 0
+    if graphlet_type not in ('PRUNED', 'MAX'):
+        raise ValueError('unknown graphlet type: ' + graphlet_type)
 
     ''' Data structures initializations '''
-    graph_db = {}
-    explored_hypothesis = []
-    docids = list(doc_collection.keys())
-    graphlet_search_stack = {}
-    graphlet_search_stack[search_iteration] = []
-    pattern_freq = {}
-    word_patterns = {}
-    
-    ''' Initializations steps '''
+    if GRAPH_STORE_DIR is None:
+        graph_db = {}
+        token_streams = []
+    else:
+        graph_db = DiskGraphStore(GRAPH_STORE_DIR, GRAPH_CACHE_SIZE)
+        token_streams = DocumentSpool(os.path.join(GRAPH_STORE_DIR, 'tokens.spool'))
+    docids = []
+
+    ''' Tokenizing every document once, token streams feed both the frequency map and the word graphs '''
+    instrumentation.message("Tokenizing documents...")
+    batch_token_freq = Counter()
+    with instrumentation.phase('tokenize') as phase:
+        batch_docids = set()
+        # tokens are counted by the workers that tokenize the documents
+        for (docid, token_stream) in instrumentation.progress(text_utils.iter_counted_token_streams(iter_documents(doc_collection), batch_token_freq, TOKENIZER, workers)):
+            if docid in mined_docids or docid in batch_docids:
+                if GRAPH_STORE_DIR is not None:
+                    token_streams.close()
+                    graph_db.close()
+                raise ValueError('document already mined: ' + str(docid))
+            batch_docids.add(docid)
+            docids.append(docid)
+            token_streams.append((docid, token_stream))
+        del batch_docids
+        phase.metrics['documents'] = len(docids)
+    if token_freq is None:
+        token_freq = batch_token_freq
+    else:
+        token_freq.update(batch_token_freq)
 
     ''' Creating word frequency map '''
-    print("Generating most freq tagged word map...")
-    word_freq = text_utils.get_word_frequencies(doc_collection, WORD_SELECTION_RATIO)
-    print('Number of keys in the filtered freq word map is ' + str(len(word_freq.keys())))
-    print("Done.")
-
-    ''' Initializing search stack with a list of seed graphlets with only one node at the center '''
-    print('Initializing search space with seed graphlets with one word at the center...')
-    graphlet_search_stack[0] = []
-    for i in tqdm(range(len(docids))):
-        word_graph = DocumentWordGraph(docids[i], doc_collection[docids[i]], source_type='text', stopwords=STOPWORD_LIST, content_word_pattern = CONTENT_WORD_REGEX_PATTERN)
-        graph_db[word_graph.get_id()] = word_graph
-        for word in word_graph.get_content_word_nodes():
-            if word in word_freq.keys() and word_freq[word] > MIN_WORD_FREQ:
-                graphlet_search_stack[0].append(('',Graphlet(word),word_graph.get_id()))# Adding null patterns '' as seeds
-    print('Done.')
-    ''' Performing graphlet search here ... '''
-    ''' A search stack indexed by iterations. In each iteration, graphlets are expanded into next iteration stack    '''
-    print("Starting Stack-based search for graphlet patterns...")
-    for search_iteration in range(MAX_SEARCH_ITERATIONS):
-        print("Starting search iter # {0}".format(search_iteration))
-        if search_iteration == 2:
-            x2=1
-        graphlet_search_stack[search_iteration+1] = []
-        hypotheses = graphlet_search_stack[search_iteration]
-        batch = 0
-        for h in tqdm(range(len(hypotheses))):
-            (graphlet_pattern_key, graphlet, graph_id) = hypotheses[h]
-            # retrieve graph record from db to start search             
-            graph_obj = graph_db[graph_id]     
-            #if batch % 10000 == 0:
-            #    print(str(batch) + " states searched ..")  
-            #batch += 1
-            # expand graphlet by searching for neighboring nodes via graph_obj 
-            expanded_graphlet = expand_graphlet_candidates(graphlet, graph_obj, word_freq)
-            for graphlet_item in expanded_graphlet:
-                graphlet_str_representation = graphlet_item.get_pattern_representation(graph_obj.get_content_word_nodes()) #str(graphlet_item)
-                graphlet_graph_lookup_key = graph_id + "_" + graphlet_str_representation
-                if graphlet_graph_lookup_key in explored_hypothesis:
-                    continue
-                explored_hypothesis.append(graphlet_graph_lookup_key)
-                graphlet_pattern_key = '|'.join(graphlet_str_representation.split('|')[1:])
-                pattern_freq[graphlet_pattern_key] = pattern_freq.get(graphlet_pattern_key,0) + 1
-                if graphlet_pattern_key not in word_patterns.keys(): word_patterns[graphlet_pattern_key] = []
-                word_patterns[graphlet_pattern_key].append( (graphlet_item.get_center_node(), graph_id) )
-                graphlet_search_stack[search_iteration+1].append((graphlet_pattern_key, graphlet_item, graph_id))
+    instrumentation.message("Generating most freq tagged word map...")
+    with instrumentation.phase('word_frequencies') as phase:
+        word_freq = text_utils.select_most_frequent_words(token_freq, WORD_SELECTION_RATIO)
+        instrumentation.message('Number of keys in the filtered freq word map is ' + str(len(word_freq.keys())))
+        # frequent words are interned first, then the rest of the documents' words (the words of documents mined 
+        # before are interned already); the search runs on word ids from here on
+        word_freq = WordFrequencyArray.from_items([ (vocabulary.add_word(word), freq) for (word, freq) in word_freq.items() ])
+        for word in batch_token_freq.keys():
+            vocabulary.add_word(word)
+        del token_freq, batch_token_freq
+        phase.metrics['frequent_words'] = len(word_freq)
+    instrumentation.message("Done.")
 
-        ''' Pruning search space by removing low scoring graphlets from next stack search iteration...'''
-        #print("Number of candidate patterns for next search iteration = " + str(len(graphlet_search_stack[search_iteration+1])))
-        freq_pruning_threshold = pattern_freq_threshold_by_stack.get(search_iteration,5)
-        graphlet_search_stack[search_iteration+1] = get_top_scoring_graphlets(graphlet_search_stack[search_iteration+1], pattern_freq, freq_pruning_threshold, pruned_stack_size)
-    print("Done.")
-    return word_patterns
+    seeding_context = {'vocabulary': vocabulary, 'word_freq': word_freq, 'min_word_freq': MIN_WORD_FREQ, 'stopwords': STOPWORD_LIST, 'content_word_pattern': CONTENT_WORD_REGEX_PATTERN}
+    if graphlet_type == 'MAX':
+        instrumentation.message('Extracting max graphlets within each document...')
+        try:
+            extract_max_graphlet_patterns(token_streams, seeding_context, params, workers, word_patterns, instrumentation)
+        finally:
+            if GRAPH_STORE_DIR is not None:
+                token_streams.close()
+                graph_db.close()
+        instrumentation.message("Done.")
+    else:
+        ''' Initializing search stack with a list of seed graphlets with only one node at the center '''
+        instrumentation.message('Initializing search space with seed graphlets with one word at the center...')
+        graphlet_seeds = []
+        with instrumentation.phase('graph_construction') as phase:
+            for (word_graph, seed_words) in instrumentation.progress(map_documents(build_graph_and_seeds, token_streams, workers, seeding_context), total=len(token_streams)):
+                if GRAPH_STORE_DIR is None:
+                    word_graph.vocabulary = vocabulary # graphs built in worker processes are returned without the shared vocabulary
+                graph_db[word_graph.get_id()] = word_graph
+                for word in seed_words:
+                    graphlet_seeds.append(((),Graphlet(word),word_graph.get_id()))# Adding null patterns () as seeds
+            if GRAPH_STORE_DIR is None:
+                del token_streams
+            else:
+                token_streams.close()
+                graph_db.flush()
+            phase.metrics['seeds'] = len(graphlet_seeds)
+        instrumentation.message('Done.')
+        try:
+            with instrumentation.phase('search'):
+                search_graphlet_patterns(graphlet_seeds, graph_db, docids, word_freq, vocabulary, params, workers, pattern_freq, word_patterns, pattern_counts_by_iteration, instrumentation)
+        finally:
+            if GRAPH_STORE_DIR is not None:
+                graph_db.close()
+        instrumentation.message("Done.")
+    return (docids, word_freq)
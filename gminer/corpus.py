@@ -0,0 +1,58 @@
+'''
+
+This module normalizes the different kinds of document collections accepted
+by the graphlet miner into a single stream of (docid, document) pairs.
+
+Supported sources:
+1 - dict mapping document ids to text (or to TokenStream objects)
+2 - any iterable or generator of (docid, text) pairs, consumed only once
+3 - a path to a directory of plain text files
+4 - an NLTK corpus reader, e.g. PlaintextCorpusReader, or any object with fileids() and raw(fileid) methods
+
+'''
+
+import os
+import re
+
+def iter_documents(doc_source, fileid_pattern='.*'):
+    ''' iterates over the documents of a collection without loading all of
+    them in memory (except for dict sources, which are already in memory).
+
+    parameters
+    ----------
+    doc_source : dict, iterable, str or CorpusReader
+        the document collection, see module documentation
+    fileid_pattern : str
+        regex of file names to read when doc_source is a directory path
+
+    returns
+    -------
+    generator, (docid, document) tuples
+    '''
+    if isinstance(doc_source, dict):
+        return iter(doc_source.items())
+    if isinstance(doc_source, str):
+        if not os.path.isdir(doc_source):
+            raise ValueError('document source is not a directory: ' + doc_source)
+        return _iter_directory(doc_source, fileid_pattern)
+    if hasattr(doc_source, 'fileids') and hasattr(doc_source, 'raw'):
+        return _iter_corpus_reader(doc_source)
+    return iter(doc_source)
+
+def _iter_directory(root, fileid_pattern):
+    # file ids are paths relative to root, as in PlaintextCorpusReader
+    fileid_regex = re.compile(fileid_pattern)
+    fileids = []
+    for (dir_path, dir_names, file_names) in os.walk(root):
+        dir_names.sort()
+        for file_name in file_names:
+            fileid = os.path.relpath(os.path.join(dir_path, file_name), root).replace(os.sep, '/')
+            if fileid_regex.fullmatch(fileid):
+                fileids.append(fileid)
+    for fileid in sorted(fileids):
+        with open(os.path.join(root, fileid), 'r', encoding='utf-8') as file_handler:
+            yield (fileid, file_handler.read())
+
+def _iter_corpus_reader(corpus_reader):
+    for fileid in corpus_reader.fileids():
+        yield (fileid, corpus_reader.raw(fileid))
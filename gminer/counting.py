@@ -0,0 +1,259 @@
+'''
+
+This module provides approximate, bounded-memory counting structures used
+when exact pattern frequency maps would not fit in memory.
+
+CountMinSketch (Cormode and Muthukrishnan, 2005) estimates the frequency of
+any key from a fixed array of depth x width counters. Estimates never
+under-count: estimate(key) >= true count. With width = ceil(e / epsilon) and
+depth = ceil(ln(1 / delta)), estimate(key) <= true count + epsilon * N with
+probability at least 1 - delta, where N is the total of all counts added.
+
+DocumentSupportCounter counts the distinct documents a key occurs in, rather
+than its occurrences. Occurrences are added one document at a time, so each
+key only keeps the last document it occurred in and its count.
+
+'''
+
+import math
+import sys
+
+from array import array
+
+class CountMinSketch(object):
+    ''' A Count-Min sketch of key frequencies with conservative updates.
+    Keys can be any hashable object. Integer tuples (e.g. graphlet pattern
+    keys over word ids) hash the same way in every process.
+    '''
+    def __init__(self, width, depth):
+        ''' initializes a sketch with all counters set to zero
+
+        parameters
+        ----------
+        width : int
+            number of counters per row
+        depth : int
+            number of rows, i.e. of independent hash functions
+
+        returns
+        -------
+
+        '''
+        self.width = max(1, int(width))
+        self.depth = max(1, int(depth))
+        self.counters = array('q', bytes(8 * self.width * self.depth))
+        self.total = 0
+
+    @classmethod
+    def from_error_bounds(cls, epsilon, delta, max_memory_bytes=None):
+        ''' creates a sketch for a given error bound
+
+        parameters
+        ----------
+        epsilon : float
+            over-estimation bound, as a fraction of the total count
+        delta : float
+            probability that an estimate exceeds the bound
+        max_memory_bytes : int
+            if given, the width is reduced so that the counters fit in this
+            budget, which loosens epsilon to e * depth * 8 / max_memory_bytes
+
+        returns
+        -------
+        CountMinSketch, an empty sketch
+        '''
+        depth = int(math.ceil(math.log(1.0 / delta)))
+        width = int(math.ceil(math.e / epsilon))
+        if max_memory_bytes is not None:
+            width = min(width, max_memory_bytes // (8 * depth))
+        return cls(width, depth)
+
+    def _get_indexes(self, key):
+        width = self.width
+        return [row * width + hash((row, key)) % width for row in range(self.depth)]
+
+    def add(self, key, count=1):
+        ''' adds count occurrences of key. Conservative update: only counters
+        that would otherwise fall below the new estimate are raised, which
+        tightens estimates without ever under-counting.
+
+        parameters
+        ----------
+        key : object
+            a hashable key
+        count : int
+            number of occurrences
+
+        returns
+        -------
+        int, the new estimate of key
+        '''
+        counters = self.counters
+        indexes = self._get_indexes(key)
+        estimate = min([counters[index] for index in indexes]) + count
+        for index in indexes:
+            if counters[index] < estimate:
+                counters[index] = estimate
+        self.total += count
+        return estimate
+
+    def estimate(self, key):
+        ''' returns an upper bound of the number of occurrences of key
+
+        parameters
+        ----------
+        key : object
+            a hashable key
+
+        returns
+        -------
+        int, estimated count
+        '''
+        counters = self.counters
+        return min([counters[index] for index in self._get_indexes(key)])
+
+    def merge(self, other):
+        ''' adds the counters of another sketch of the same width and depth, 
+        e.g. one filled by another worker. Every counter bounds the counts of
+        the keys it holds, so the sums still never under-count.
+
+        parameters
+        ----------
+        other : CountMinSketch
+            a sketch with the same width and depth
+
+        returns
+        -------
+
+        '''
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError('sketches of different sizes cannot be merged')
+        counters = self.counters
+        for (index, count) in enumerate(other.counters):
+            if count:
+                counters[index] += count
+        self.total += other.total
+
+    def get_error_bound(self):
+        ''' returns the additive error bound epsilon * N of the estimates,
+        which holds for each key with probability 1 - exp(-depth)
+
+        parameters
+        ----------
+
+        returns
+        -------
+        float, maximum over-estimation
+        '''
+        return math.e / self.width * self.total
+
+    def get_memory_usage(self):
+        ''' returns the bytes held by the counters
+
+        parameters
+        ----------
+
+        returns
+        -------
+        int, bytes
+        '''
+        return self.counters.itemsize * len(self.counters)
+
+    def clear(self):
+        ''' resets all counters
+
+        parameters
+        ----------
+
+        returns
+        -------
+
+        '''
+        self.counters = array('q', bytes(8 * self.width * self.depth))
+        self.total = 0
+
+class DocumentSupportCounter(object):
+    ''' Counts the support of keys: the number of distinct documents they
+    occur in. All occurrences of a document must be added before those of 
+    the next document, so each key keeps a (last document index, support)
+    pair, and adding an occurrence is a constant time operation. Documents
+    are given dense indices in the order they are added.
+    '''
+    def __init__(self):
+        ''' initializes a counter with no documents
+
+        parameters
+        ----------
+
+        returns
+        -------
+
+        '''
+        self.document_index = {}
+        self.supports = {}
+
+    def add(self, key, document_id):
+        ''' records an occurrence of key in a document
+
+        parameters
+        ----------
+        key : object
+            a hashable key
+        document_id : object
+            a hashable document id, e.g. a graph id. It is either the document of the last occurrence added or a new one
+
+        returns
+        -------
+
+        '''
+        index = self.document_index.get(document_id)
+        if index is None:
+            index = len(self.document_index)
+            self.document_index[document_id] = index
+        elif index != len(self.document_index) - 1:
+            raise ValueError('occurrences of document {0} must be added together'.format(document_id))
+        support = self.supports.get(key)
+        if support is None:
+            self.supports[key] = (index, 1)
+        elif support[0] != index:
+            self.supports[key] = (index, support[1] + 1)
+
+    def get_support(self, key):
+        ''' returns the number of documents key occurs in
+
+        parameters
+        ----------
+        key : object
+            a hashable key
+
+        returns
+        -------
+        int, support
+        '''
+        return self.supports.get(key, (None, 0))[1]
+
+    def get_counts(self, min_support=0):
+        ''' returns the support of the keys
+
+        parameters
+        ----------
+        min_support : int
+            only keys with a support above min_support are returned
+
+        returns
+        -------
+        dict, a map from key to support
+        '''
+        return dict([ (key, support) for (key, (_, support)) in self.supports.items() if support > min_support ])
+
+    def get_memory_usage(self):
+        ''' returns the bytes held by the (last document, support) pairs
+
+        parameters
+        ----------
+
+        returns
+        -------
+        int, bytes
+        '''
+        return sum([ sys.getsizeof(support) for support in self.supports.values() ])
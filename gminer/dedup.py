@@ -0,0 +1,236 @@
+'''
+
+This module provides the bookkeeping of explored hypotheses during the
+stack-based graphlet search.
+
+A hypothesis is a graphlet grown within a given document graph. The same
+graphlet is often reached by several expansion paths, and it is only counted
+once. Instead of keeping long lookup strings, every (graph id, graphlet) pair
+is reduced to a fixed-width fingerprint held in a hash set.
+
+'''
+
+import sys
+
+from array import array
+from hashlib import blake2b
+
+class ExploredHypothesisSet(object):
+    ''' A set of fingerprints of explored (graph id, graphlet) hypotheses with
+    constant time membership tests.
+
+    Fingerprints are 64-bit hashes, so two distinct hypotheses may
+    share a fingerprint; the second one is then wrongly treated as explored.
+    The expected number of such collisions among n entries is about
+    n^2 / 2^65 (well below one for less than a billion entries) and is
+    reported by get_statistics().
+
+    Memory can optionally be capped. Entries are kept in two generations:
+    when the current generation fills half of the budget, the older
+    generation is dropped. Hypotheses evicted this way may be explored and
+    counted again, so a cap trades exact deduplication for bounded memory.
+
+    A journal of the fingerprints added can be kept (see start_journal), so
+    that checkpoints save the new fingerprints only, and the set is rebuilt
+    by adding the saved fingerprints again in the same order.
+    '''
+    # approximate bytes used by one entry: a 64-bit int object plus its slot in the hash set
+    BYTES_PER_ENTRY = sys.getsizeof(2**63) + 24
+
+    def __init__(self, max_memory_bytes=None, check_collisions=False):
+        ''' initializes an empty set of explored hypotheses
+
+        parameters
+        ----------
+        max_memory_bytes : int
+            approximate upper bound of the memory used by fingerprints. No bound if None
+        check_collisions : bool
+            keeps the full keys of all fingerprints to count actual collisions.
+            Meant for testing and calibration since it defeats the memory savings
+
+        returns
+        -------
+
+        '''
+        self.max_memory_bytes = max_memory_bytes
+        self.generation_capacity = None
+        if max_memory_bytes is not None:
+            self.generation_capacity = max(1, max_memory_bytes // (2 * self.BYTES_PER_ENTRY))
+        self.current_generation = set()
+        self.older_generation = set()
+        self.check_collisions = check_collisions
+        self.fingerprint_keys = {}
+        self.graph_digests = {}
+        self.journal = None
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+        self.collisions = 0
+
+    def get_fingerprint(self, graph_id, graphlet_key):
+        ''' returns the 64-bit fingerprint of a hypothesis, a blake2b digest of
+        the graphlet key keyed by a cached digest of the graph id. Tuple keys,
+        such as Graphlet.get_canonical_key() of graphlets over word ids, are
+        hashed through their repr, which, unlike the built-in hash of strings,
+        does not depend on PYTHONHASHSEED: fingerprints are stable across 
+        processes and runs, so they can be saved in checkpoints and merged 
+        across shards.
+
+        parameters
+        ----------
+        graph_id : str
+            id of the document graph the graphlet was found in
+        graphlet_key : str or tuple
+            canonical representation of the graphlet, including its center node
+
+        returns
+        -------
+        int, fingerprint
+        '''
+        graph_digest = self.graph_digests.get(graph_id)
+        if graph_digest is None:
+            graph_digest = blake2b(str(graph_id).encode('utf-8'), digest_size=16).digest()
+            self.graph_digests[graph_id] = graph_digest
+        data = (graphlet_key if isinstance(graphlet_key, str) else repr(graphlet_key)).encode('utf-8')
+        return int.from_bytes(blake2b(data, digest_size=8, key=graph_digest).digest(), 'little')
+
+    def add(self, graph_id, graphlet_key):
+        ''' records a hypothesis as explored
+
+        parameters
+        ----------
+        graph_id : str
+            id of the document graph the graphlet was found in
+        graphlet_key : str or tuple
+            canonical representation of the graphlet, including its center node
+
+        returns
+        -------
+        bool, True if the hypothesis was not explored before
+        '''
+        fingerprint = self.get_fingerprint(graph_id, graphlet_key)
+        self.lookups += 1
+        if fingerprint in self.current_generation or fingerprint in self.older_generation:
+            self.hits += 1
+            if self.check_collisions and self.fingerprint_keys.get(fingerprint) != (graph_id, graphlet_key):
+                self.collisions += 1
+            return False
+        self._insert(fingerprint)
+        if self.check_collisions:
+            self.fingerprint_keys[fingerprint] = (graph_id, graphlet_key)
+        return True
+
+    def _insert(self, fingerprint):
+        if self.generation_capacity is not None and len(self.current_generation) >= self.generation_capacity:
+            self.evictions += len(self.older_generation)
+            self.older_generation = self.current_generation
+            self.current_generation = set()
+        self.current_generation.add(fingerprint)
+        if self.journal is not None:
+            self.journal.append(fingerprint)
+
+    def add_fingerprints(self, fingerprints):
+        ''' records the hypotheses of saved fingerprints as explored, e.g. to 
+        rebuild a set from its journals. Fingerprints added in the order they
+        were first added give the same generations as the original set.
+
+        parameters
+        ----------
+        fingerprints : iterable
+            fingerprints, see get_fingerprint and take_journal
+
+        returns
+        -------
+
+        '''
+        for fingerprint in fingerprints:
+            if fingerprint not in self.current_generation and fingerprint not in self.older_generation:
+                self._insert(fingerprint)
+
+    def start_journal(self):
+        ''' starts recording the fingerprints added to the set, see take_journal
+
+        parameters
+        ----------
+
+        returns
+        -------
+
+        '''
+        self.journal = array('Q')
+
+    def take_journal(self):
+        ''' returns the fingerprints added since the journal was started or 
+        last taken, in the order they were added, and starts a new journal
+
+        parameters
+        ----------
+
+        returns
+        -------
+        array, 64-bit fingerprints
+        '''
+        journal = self.journal
+        self.journal = array('Q')
+        return journal
+
+    def update(self, other):
+        ''' adds the fingerprints of another set, generation by generation
+
+        parameters
+        ----------
+        other : ExploredHypothesisSet
+            explored hypotheses, e.g. of another shard
+
+        returns
+        -------
+
+        '''
+        self.current_generation.update(other.current_generation)
+        self.older_generation.update(other.older_generation)
+        self.fingerprint_keys.update(other.fingerprint_keys)
+
+    def __contains__(self, hypothesis):
+        (graph_id, graphlet_key) = hypothesis
+        fingerprint = self.get_fingerprint(graph_id, graphlet_key)
+        return fingerprint in self.current_generation or fingerprint in self.older_generation
+
+    def __len__(self):
+        return len(self.current_generation) + len(self.older_generation)
+
+    def get_memory_usage(self):
+        ''' returns an estimate of the bytes held by the fingerprints
+
+        parameters
+        ----------
+
+        returns
+        -------
+        int, bytes
+        '''
+        return sys.getsizeof(self.current_generation) + sys.getsizeof(self.older_generation) + len(self) * sys.getsizeof(2**63)
+
+    def get_statistics(self):
+        ''' returns deduplication statistics
+
+        parameters
+        ----------
+
+        returns
+        -------
+        dict
+            'entries', 'lookups', 'hits' (hypotheses skipped as already explored), 'evictions',
+            'memory_bytes', 'expected_collisions' and, if collisions are checked, 'collisions'
+        '''
+        n = len(self) + self.evictions
+        statistics = {
+            'entries': len(self),
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'evictions': self.evictions,
+            'memory_bytes': self.get_memory_usage(),
+            'expected_collisions': n * (n - 1) / 2.0**65,
+        }
+        if self.check_collisions:
+            statistics['collisions'] = self.collisions
+        return statistics
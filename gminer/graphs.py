@@ -1,7 +1,9 @@
-import copy
 import re
 import networkx
 
+from array import array
+from bisect import bisect_left
+
 from nltk.tokenize import WordPunctTokenizer
 from nltk.tokenize import sent_tokenize
 from nltk import bigrams, word_tokenize, pos_tag 
@@ -25,22 +27,33 @@ class Graphlet(object):
     around that center. Links inter or intra orbits are not represented 
     explicitly here. All that is required is that a node in an orbit has a 
     source link from a node in the nearest neighbor inner orbit.     
+
+    Orbits are stored as a tuple of per-orbit node tuples, and node 
+    membership as a frozenset. Both are immutable and are shared between a
+    graphlet and its clones: adding a node replaces the touched orbit and 
+    the node set only, so cloning is a constant time operation.
+
+    Graphlets also maintain their canonical pattern key as nodes are added
+    (see get_pattern_key). Nodes added with masked=True are function or stop
+    words, which only count as <FUNC_OR_STOP_WORD> in the pattern.
     '''
+    __slots__ = ('orbits', 'nodes', 'pattern')
+
     def __init__(self, center_node):     
         ''' initializes a graphlet object with one node at the center
 
         parameters
         ----------
-        center_node : str
-            a string label of the center node, typically a dictionary word or a word_tag string
+        center_node : str or int
+            a string label of the center node, typically a dictionary word or a word_tag string, or its word id
 
         returns
         -------
         
         '''
-        self.orbit_nodes = {}
-        self.graphlet_nodes = [center_node] 
-        self.orbit_nodes[0] = [center_node]
+        self.orbits = ((center_node,),)
+        self.nodes = frozenset((center_node,))
+        self.pattern = ()
         
     def add_orbit(self):
         ''' creates a new orbit
@@ -52,51 +65,85 @@ class Graphlet(object):
         -------
         
         '''        
-        next = max(list(self.orbit_nodes.keys())) + 1
-        self.orbit_nodes[next] = []
-
-    def put_node_on_orbit(self, node_name, orbit_id):
+        self.orbits = self.orbits + ((),)
+        self.pattern = self.pattern + (((), False),)
+
+    def _extend_orbits(self, orbit_id):
+        if orbit_id >= len(self.orbits):
+            n_new_orbits = orbit_id + 1 - len(self.orbits)
+            self.orbits = self.orbits + ((),) * n_new_orbits
+            self.pattern = self.pattern + (((), False),) * n_new_orbits
+
+    def _update_orbit_pattern(self, orbit_id, content_nodes, masked):
+        # the center (orbit 0) is not part of the pattern
+        if orbit_id == 0:
+            return
+        (orbit_content, orbit_masked) = self.pattern[orbit_id - 1]
+        if len(content_nodes) > 0:
+            orbit_content = list(orbit_content)
+            for node_name in content_nodes:
+                index = bisect_left(orbit_content, node_name)
+                if index == len(orbit_content) or orbit_content[index] != node_name:
+                    orbit_content.insert(index, node_name)
+            orbit_content = tuple(orbit_content)
+        self.pattern = self.pattern[:orbit_id - 1] + ((orbit_content, orbit_masked or masked),) + self.pattern[orbit_id:]
+
+    def put_node_on_orbit(self, node_name, orbit_id, masked=False):
         ''' places a graph node with label node_name on the orbit specified by identifier orbit_id
 
         parameters
         ----------
-        node_name : str
-            a string label of the graph node, typically a dictionary word or a word_tag string
+        node_name : str or int
+            a string label of the graph node, typically a dictionary word or a word_tag string, or its word id
 
         orbit_id : int
             a number specifying an orbit in the graphlet
 
+        masked : bool
+            True if the node is a function or stop word
+
         returns
         -------
         
         '''
-        if orbit_id not in self.orbit_nodes.keys():
-            self.orbit_nodes[orbit_id] = []
-        if node_name not in self.orbit_nodes[orbit_id]:
-            self.orbit_nodes[orbit_id].append(node_name)
-        self.graphlet_nodes.append(node_name)
-
-    def put_nodelist_on_orbit(self, node_name_list, orbit_id):
+        self._extend_orbits(orbit_id)
+        orbit = self.orbits[orbit_id]
+        if node_name not in orbit:
+            self.orbits = self.orbits[:orbit_id] + (orbit + (node_name,),) + self.orbits[orbit_id + 1:]
+            self._update_orbit_pattern(orbit_id, () if masked else (node_name,), masked)
+        if node_name not in self.nodes:
+            self.nodes = self.nodes.union((node_name,))
+
+    def put_nodelist_on_orbit(self, node_name_list, orbit_id, masked=False):
         ''' places a list of graph nodes on the orbit specified by identifier orbit_id
 
         parameters
         ----------
-        node_name_list : list of str
-            a list of a string labels of the graph nodes, typically a list of word_tag string
+        node_name_list : list of str or list of int
+            a list of a string labels of the graph nodes, typically a list of word_tag string, or their word ids
 
         orbit_id : int
             a number specifying an orbit in the graphlet
 
+        masked : bool
+            True if the nodes are function or stop words
+
         returns
         -------
         
         '''
+        self._extend_orbits(orbit_id)
+        orbit = self.orbits[orbit_id]
+        orbit_members = set(orbit)
+        new_nodes = []
         for node_name in node_name_list:
-            if orbit_id not in self.orbit_nodes.keys():
-                self.orbit_nodes[orbit_id] = []
-            if node_name not in self.orbit_nodes[orbit_id]:
-                self.orbit_nodes[orbit_id].append(node_name)
-            self.graphlet_nodes.append(node_name)
+            if node_name not in orbit_members:
+                orbit_members.add(node_name)
+                new_nodes.append(node_name)
+        if len(new_nodes) > 0:
+            self.orbits = self.orbits[:orbit_id] + (orbit + tuple(new_nodes),) + self.orbits[orbit_id + 1:]
+            self.nodes = self.nodes.union(new_nodes)
+            self._update_orbit_pattern(orbit_id, () if masked else new_nodes, masked)
 
     def put_node_on_outer_orbit(self, node_name):
         ''' places a node on the outermost orbit in the graphlet
@@ -110,8 +157,7 @@ class Graphlet(object):
         -------
         
         '''
-        outer_orbit_id = max(list(self.orbit_nodes.keys()))
-        self.put_node_on_orbit(node_name, outer_orbit_id)
+        self.put_node_on_orbit(node_name, len(self.orbits) - 1)
 
     def put_nodelist_on_outer_orbit(self, node_name_list):
         ''' places a list of graph nodes on the outermost orbit in the graphlet
@@ -125,8 +171,7 @@ class Graphlet(object):
         -------
         
         '''
-        outer_orbit_id = max(list(self.orbit_nodes.keys()))
-        self.put_nodelist_on_orbit(node_name_list, outer_orbit_id)
+        self.put_nodelist_on_orbit(node_name_list, len(self.orbits) - 1)
 
     def get_nodes_on_orbit(self, orbit_id):
         ''' returns the list of nodes on the given graphlet orbit
@@ -138,10 +183,10 @@ class Graphlet(object):
 
         returns
         -------
-        list, array of nodes on the given graphlet orbit
+        tuple, array of nodes on the given graphlet orbit
         '''
-        assert(orbit_id in self.orbit_nodes.keys())
-        return self.orbit_nodes[orbit_id]
+        assert(0 <= orbit_id < len(self.orbits))
+        return self.orbits[orbit_id]
     
     def get_nodes_on_outer_orbit(self):
         ''' returns the list of nodes on the outermost graphlet orbit
@@ -151,9 +196,9 @@ class Graphlet(object):
 
         returns
         -------
-        list, array of nodes on the given graphlet's outermost orbit
+        tuple, array of nodes on the given graphlet's outermost orbit
         '''
-        return self.orbit_nodes[max(list(self.orbit_nodes.keys()))]
+        return self.orbits[-1]
 
     def get_number_of_orbits(self):
         ''' returns the number of orbits
@@ -165,19 +210,19 @@ class Graphlet(object):
         -------
         int, number of orbits
         '''
-        return len(list(self.orbit_nodes.keys()))
+        return len(self.orbits)
 
     def get_all_nodes(self):
-        ''' returns the list of every nodes on all orbits
+        ''' returns the set of every nodes on all orbits
 
         parameters
         ----------
 
         returns
         -------
-        list, array of nodes
+        frozenset, nodes
         '''
-        return self.graphlet_nodes
+        return self.nodes
 
     def get_center_node(self):
         ''' returns center node label
@@ -189,7 +234,7 @@ class Graphlet(object):
         -------
         str, node name/label
         '''
-        return self.orbit_nodes[0][0]
+        return self.orbits[0][0]
         
     def get_size(self):
         ''' returns size of graphlet. Size is the number of nodes across on all orbits
@@ -201,31 +246,75 @@ class Graphlet(object):
         -------
         int, number of all nodes a graphlet has
         '''
-        return len(self.get_all_nodes())
+        return len(self.nodes)
+
+    @property
+    def orbit_nodes(self):
+        ''' a map from orbit id to the list of nodes on the orbit '''
+        return dict([ (orbit_id, list(orbit)) for (orbit_id, orbit) in enumerate(self.orbits) ])
 
     def clone(self):
-        ''' returns a deep copy of this graphlet. This will copy all orbits and
-        all nodes.
+        ''' returns a copy of this graphlet with the same orbits and nodes.
         This method is used during expansion of state space search. For example,
         after cloning a graphlet, the new cloned object can be expanded by 
         adding a node on an orbit randomly chosen.
+        The copy shares the immutable orbit tuples and node set with this 
+        graphlet, so cloning does not copy any node.
+
+        parameters
+        ----------
+
+        returns
+        -------
+        Graphlet, a copy of this graphlet object
+        '''
+        graphlet = Graphlet.__new__(Graphlet)
+        graphlet.orbits = self.orbits
+        graphlet.nodes = self.nodes
+        graphlet.pattern = self.pattern
+        return graphlet
+
+    def get_pattern_key(self):
+        ''' returns the canonical pattern key of the graphlet. 
+        The key is a hashable tuple with one (content nodes, masked) entry per
+        orbit around the center: content nodes is the sorted tuple of distinct
+        content nodes on the orbit and masked is True if the orbit holds any
+        function or stop word. Graphlets with the same context around their 
+        center have equal keys. The key is maintained as nodes are added, and
+        render_pattern_key() gives its string form.
 
         parameters
         ----------
 
         returns
         -------
-        Graphlet, a deep copy of this graphlet object
+        tuple, pattern key
         '''
-        return copy.deepcopy(self)
+        return self.pattern
 
-    def get_pattern_representation(self, content_word_list):
+    def get_canonical_key(self):
+        ''' returns a hashable key that identifies the graphlet within a graph:
+        its center node and its pattern key
+
+        parameters
+        ----------
+
+        returns
+        -------
+        tuple, (center node, pattern key)
+        '''
+        return (self.orbits[0][0], self.pattern)
+
+    def get_pattern_representation(self, content_word_list, vocabulary=None):
         ''' returns a string representation of graphlet.
         
         parameters
         ----------
-        content_word_list : list of str
-            a list of content words.
+        content_word_list : list of str or list of int
+            a list of content words (or content word ids).
+        vocabulary : Vocabulary
+            if nodes are word ids, the vocabulary used to decode them into
+            word strings
 
         returns
         -------
@@ -246,24 +335,202 @@ class Graphlet(object):
         the nodes on orbits are ordered lexicographically in that string represenation.
 
         '''        
-        n_occuppied_orbits = len(self.orbit_nodes.keys())
+        content_word_set = set(content_word_list)
+        n_occuppied_orbits = len(self.orbits)
         orbit_to_node_map = {}
         for orbit_index in range(0,n_occuppied_orbits):
-            if orbit_index not in self.orbit_nodes.keys():
-                orbit_to_node_map[orbit_index] = ['<EMPTY_ORBIT>']
+            if len(self.orbits[orbit_index]) == 0:
+                orbit_to_node_map[orbit_index] = {'<EMPTY_ORBIT>'}
             else:
-                orbit_to_node_map[orbit_index] = []
-                for node_id in self.orbit_nodes[orbit_index]:
-                    if node_id in content_word_list:
-                        orbit_to_node_map[orbit_index].append(node_id)
+                orbit_to_node_map[orbit_index] = set()
+                for node_id in self.orbits[orbit_index]:
+                    if node_id in content_word_set:
+                        orbit_to_node_map[orbit_index].add(str(node_id) if vocabulary is None else vocabulary.get_word(node_id))
                     else:
-                        orbit_to_node_map[orbit_index].append("<FUNC_OR_STOP_WORD>")   
-                orbit_to_node_map[orbit_index].sort()
-        return '|'.join([ str(node_id) + ":" + ';'.join(list(set(orbit_to_node_map[node_id]))) for node_id in range(0,n_occuppied_orbits)])
+                        orbit_to_node_map[orbit_index].add("<FUNC_OR_STOP_WORD>")   
+        return '|'.join([ str(orbit_index) + ":" + ';'.join(sorted(orbit_to_node_map[orbit_index])) for orbit_index in range(0,n_occuppied_orbits)])
+
+def render_pattern_key(pattern_key, vocabulary=None):
+    ''' returns the string representation of a pattern key, in the format of
+    Graphlet.get_pattern_representation without the center orbit:
+    <orbit_1>:{<content_node>|<FUNC_OR_STOP_WORD>}+|<orbit_2>:...
+
+    parameters
+    ----------
+    pattern_key : tuple
+        a pattern key returned by Graphlet.get_pattern_key
+    vocabulary : Vocabulary
+        if nodes are word ids, the vocabulary used to decode them into word strings
+
+    returns
+    -------
+    str, text representation
+    '''
+    orbit_strings = []
+    for (orbit_index, (orbit_content, orbit_masked)) in enumerate(pattern_key):
+        if vocabulary is None:
+            tokens = [str(node_id) for node_id in orbit_content]
+        else:
+            tokens = [vocabulary.get_word(node_id) for node_id in orbit_content]
+        if orbit_masked:
+            tokens.append("<FUNC_OR_STOP_WORD>")
+        if len(tokens) == 0:
+            tokens.append('<EMPTY_ORBIT>')
+        orbit_strings.append(str(orbit_index + 1) + ":" + ';'.join(sorted(tokens)))
+    return '|'.join(orbit_strings)
+
+class Vocabulary(object):
+    ''' A corpus-wide interned vocabulary that maps word strings to dense 
+    integer ids. 
+    Document graphs, graphlets and frequency maps refer to words by their 
+    integer id, so the search loop hashes and compares small integers rather 
+    than word strings. Strings are only decoded back when patterns are 
+    rendered for output.
+    '''
+    def __init__(self, words=[]):
+        ''' initializes a vocabulary object
+
+        parameters
+        ----------
+        words : list of str
+            optional list of words to intern in the given order
+
+        returns
+        -------
+        
+        '''
+        self.word_to_id = {}
+        self.id_to_word = []
+        for word in words:
+            self.add_word(word)
+
+    def add_word(self, word):
+        ''' interns a word and returns its id. Words that are already in the
+        vocabulary keep their existing id.
+
+        parameters
+        ----------
+        word : str
+            a dictionary word or a word_tag string
+
+        returns
+        -------
+        int, word id
+        '''
+        word_id = self.word_to_id.get(word)
+        if word_id is None:
+            word_id = len(self.id_to_word)
+            self.word_to_id[word] = word_id
+            self.id_to_word.append(word)
+        return word_id
+
+    def get_id(self, word, default=None):
+        ''' returns the id of an interned word
+
+        parameters
+        ----------
+        word : str
+            a dictionary word or a word_tag string
+        default : object
+            value returned when the word is not in the vocabulary
+
+        returns
+        -------
+        int, word id
+        '''
+        return self.word_to_id.get(word, default)
+
+    def get_word(self, word_id):
+        ''' returns the word string of an id
+
+        parameters
+        ----------
+        word_id : int
+            a word id issued by this vocabulary
+
+        returns
+        -------
+        str, word
+        '''
+        return self.id_to_word[word_id]
+
+    def __len__(self):
+        return len(self.id_to_word)
+
+    def __contains__(self, word):
+        return word in self.word_to_id
+
+class WordFrequencyArray(object):
+    ''' A read-only map from word id to frequency, stored as an array indexed
+    by word id. Frequent words are interned first, so the array holds about 
+    8 bytes per frequent word instead of a dict entry per word, and is cheap 
+    to pickle to worker processes. Words with no frequency are absent.
+    It supports the dict methods used by the search (get, items, in, len).
+    '''
+    def __init__(self, freqs):
+        ''' initializes a frequency array
+
+        parameters
+        ----------
+        freqs : array
+            frequency of each word id, 0 for absent words
+
+        returns
+        -------
+
+        '''
+        self.freqs = freqs
+        self.n_words = len(freqs) - freqs.count(0)
 
-class DocumentWordGraph(networkx.Graph):
-    ''' An abstract data type that represents an undirected graph object that 
-    extends networkx.Graph. 
+    @classmethod
+    def from_items(cls, word_freq_items):
+        ''' builds a frequency array from (word id, freq) pairs
+
+        parameters
+        ----------
+        word_freq_items : iterable
+            (word id, freq) tuples with positive frequencies
+
+        returns
+        -------
+        WordFrequencyArray
+        '''
+        word_freq_items = list(word_freq_items)
+        freqs = array('q', bytes(8 * (max([ word for (word, _) in word_freq_items ], default=-1) + 1)))
+        for (word, freq) in word_freq_items:
+            freqs[word] = freq
+        return cls(freqs)
+
+    def get(self, word, default=None):
+        if word < len(self.freqs):
+            freq = self.freqs[word]
+            if freq > 0:
+                return freq
+        return default
+
+    def __getitem__(self, word):
+        freq = self.get(word)
+        if freq is None:
+            raise KeyError(word)
+        return freq
+
+    def __contains__(self, word):
+        return self.get(word) is not None
+
+    def __len__(self):
+        return self.n_words
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return [ word for (word, freq) in enumerate(self.freqs) if freq > 0 ]
+
+    def items(self):
+        return [ (word, freq) for (word, freq) in enumerate(self.freqs) if freq > 0 ]
+
+class DocumentWordGraph(object):
+    ''' An abstract data type that represents an undirected graph object. 
     DocumentWordGraph has nodes represented by words in a text document and 
     edges exist between adjacent words. Typically edges are drawn between 
     bigrams extracted witin a text document.
@@ -271,8 +538,14 @@ class DocumentWordGraph(networkx.Graph):
     search. The grpahlet mining algorithm leverage graph structue and list of
     content words list to prune search space tree. Content words are specified
     as regular expressions.
+
+    Nodes are integer word ids issued by a corpus-wide Vocabulary. Adjacency
+    is stored in compressed sparse row (CSR) form using compact arrays:
+    node_ids holds the sorted node ids, and the neighbors of node_ids[i] are
+    indices[indptr[i]:indptr[i+1]]. A networkx view can be created with 
+    to_networkx() where graph algorithms from networkx are needed.
     '''
-    def __init__(self, graph_instance_id, input_source, source_type='file', stopwords=[], content_word_pattern='^[A-z0-9]{3,}$'):
+    def __init__(self, graph_instance_id, input_source, source_type='file', stopwords=[], content_word_pattern='^[A-z0-9]{3,}$', vocabulary=None, tokenizer='NLTK', word_freq=None):
         ''' initializes a DocumentWordGraph object
         The graph can be constructed by passing a text passage directly or via
         a path to a file that contains the text content.
@@ -281,30 +554,92 @@ class DocumentWordGraph(networkx.Graph):
         ----------
         graph_instance_id : str
             a string identifier of the graph. This is ideally a document name
-        input_source : str
-            a string that either contains full text or path to file that contains text
+        input_source : str or TokenStream
+            a string that either contains full text or path to file that contains text, or the token stream of an already tokenized document
         source_type : str
-            values are 'file' or 'text'
+            values are 'file', 'text' or 'tokens'
         content_word_pattern : str
             a regex that specify what can be considered content word. 
             Content word pattern defines what is a content and what is otherwise stopword
             If part of speech tagging is used, this can be used to match nouns, adj, and verbs
+        vocabulary : Vocabulary
+            corpus-wide vocabulary used to intern words. A private vocabulary is created if none is given
+        tokenizer : str or function
+            tokenizer of text sources, see text_processing.tokenize_text
+        word_freq : dict
+            a map from word id to corpus freq. When given, the content word neighbors of every node are ranked by it (see get_neighbor_partition)
 
         returns
         -------
         a graph object
         '''
-        super().__init__()
         self.graph_id = graph_instance_id
+        self.vocabulary = vocabulary if vocabulary is not None else Vocabulary()
         if source_type == 'file':
             with open(input_source,'r') as file_handler:
                 text_blob = file_handler.read()
         else:
             text_blob = input_source
-        bgram = get_bigrams(text_blob) #get_bigrams(text_blob,use_pos_tagging) # needs to be pushed up to the use app (users should have control over whether to supply a tagged or raw text)
+        bgram = get_bigrams(text_blob, tokenizer) #get_bigrams(text_blob,use_pos_tagging) # needs to be pushed up to the use app (users should have control over whether to supply a tagged or raw text)
         wbgram = get_freq_weighted_bigrams(bgram)        
-        self.add_edges_from(list(wbgram.keys()))
-        self.content_word_list = [word for word in self.nodes if re.match(content_word_pattern, word) and ( len(stopwords) == 0 or not word in stopwords ) ] # self.find_nonstopword_JNV_tagged_nodes()
+        self._build_adjacency(wbgram.keys())
+        content_word_regex = re.compile(content_word_pattern)
+        stopword_set = set(stopwords)
+        self.content_word_list = array('i')
+        for node in self.node_ids:
+            word = self.vocabulary.get_word(node)
+            if content_word_regex.match(word) and word not in stopword_set:
+                self.content_word_list.append(node)
+        self._partition_adjacency(word_freq)
+
+    def _build_adjacency(self, word_pairs):
+        ''' interns the words of an edge list and packs the adjacency into
+        CSR arrays
+        '''
+        adjacency = {}
+        for (word_a, word_b) in word_pairs:
+            a = self.vocabulary.add_word(word_a)
+            b = self.vocabulary.add_word(word_b)
+            adjacency.setdefault(a, set()).add(b)
+            adjacency.setdefault(b, set()).add(a)
+        self.node_ids = array('i', sorted(adjacency.keys()))
+        self.indptr = array('i', [0])
+        self.indices = array('i')
+        for node in self.node_ids:
+            self.indices.extend(sorted(adjacency[node]))
+            self.indptr.append(len(self.indices))
+
+    def _partition_adjacency(self, word_freq=None):
+        ''' reorders the neighbors of every node in place, content words 
+        before function words, and records in content_split where the 
+        function words of each node start. Content words are in decreasing
+        order of word_freq if it is given, ties and function words in id order
+        '''
+        content_word_set = set(self.content_word_list)
+        self.content_split = array('i')
+        self.ranked_by_frequency = word_freq is not None
+        for i in range(len(self.node_ids)):
+            (start, end) = (self.indptr[i], self.indptr[i + 1])
+            neighbors = self.indices[start:end]
+            content_neighbors = array('i', [ y for y in neighbors if y in content_word_set ])
+            if word_freq is not None:
+                content_neighbors = array('i', sorted(content_neighbors, key=lambda y: (-word_freq.get(y, 0), y)))
+            self.content_split.append(start + len(content_neighbors))
+            content_neighbors.extend([ y for y in neighbors if y not in content_word_set ])
+            self.indices[start:end] = content_neighbors
+
+    def __getstate__(self):
+        # the corpus-wide vocabulary is shared by all graphs and is not 
+        # pickled along with each of them
+        state = self.__dict__.copy()
+        state['vocabulary'] = None
+        return state
+
+    def _node_index(self, node):
+        index = bisect_left(self.node_ids, node)
+        if index == len(self.node_ids) or self.node_ids[index] != node:
+            raise KeyError(node)
+        return index
 
     def get_id(self):
         ''' returns graph id
@@ -318,6 +653,18 @@ class DocumentWordGraph(networkx.Graph):
         '''        
         return self.graph_id
 
+    def get_vocabulary(self):
+        ''' returns the vocabulary that issued the node ids of this graph
+
+        parameters
+        ----------
+
+        returns
+        -------
+        Vocabulary, word to id map
+        '''
+        return self.vocabulary
+
     def get_content_word_nodes(self):
         ''' returns list of content words in a word graph
 
@@ -326,10 +673,136 @@ class DocumentWordGraph(networkx.Graph):
 
         returns
         -------
-        list, content word list
+        array, content word ids
         '''
         return self.content_word_list
 
+    def is_content_word(self, node):
+        ''' tells whether a node is a content word
+
+        parameters
+        ----------
+        node : int
+            a node id
+
+        returns
+        -------
+        bool
+        '''
+        index = bisect_left(self.content_word_list, node)
+        return index < len(self.content_word_list) and self.content_word_list[index] == node
+
+    def get_neighbor_partition(self, node):
+        ''' returns the neighbors of a node split into content words and 
+        function words. Neighbors are stored content words first, so the 
+        partition is two slices of the adjacency arrays and nothing is cached.
+        If the graph was built with word_freq, content words are ranked by
+        decreasing freq, so the best expansion candidates come first
+
+        parameters
+        ----------
+        node : int
+            a node id
+
+        returns
+        -------
+        tuple
+            (content word neighbor ids, function word neighbor ids), arrays in rank or id order
+        '''
+        index = self._node_index(node)
+        split = self.content_split[index]
+        return (self.indices[self.indptr[index]:split], self.indices[split:self.indptr[index + 1]])
+
+    @property
+    def nodes(self):
+        ''' sorted array of node ids '''
+        return self.node_ids
+
+    def neighbors(self, node):
+        ''' returns the ids of nodes adjacent to a given node
+
+        parameters
+        ----------
+        node : int
+            a node id
+
+        returns
+        -------
+        array, neighbor node ids
+        '''
+        index = self._node_index(node)
+        return self.indices[self.indptr[index]:self.indptr[index + 1]]
+
+    def degree(self, node):
+        ''' returns the number of neighbors of a node
+
+        parameters
+        ----------
+        node : int
+            a node id
+
+        returns
+        -------
+        int, node degree
+        '''
+        index = self._node_index(node)
+        return self.indptr[index + 1] - self.indptr[index]
+
+    def has_node(self, node):
+        return node in self
+
+    def number_of_nodes(self):
+        return len(self.node_ids)
+
+    def number_of_edges(self):
+        self_loops = sum(1 for i in range(len(self.node_ids)) if self.node_ids[i] in self.indices[self.indptr[i]:self.indptr[i + 1]])
+        return (len(self.indices) + self_loops) // 2
+
+    def edges(self):
+        ''' iterates over the undirected edges of the graph, each edge once
+
+        parameters
+        ----------
+
+        returns
+        -------
+        generator, (node id, node id) tuples
+        '''
+        for i in range(len(self.node_ids)):
+            a = self.node_ids[i]
+            for b in self.indices[self.indptr[i]:self.indptr[i + 1]]:
+                if a <= b:
+                    yield (a, b)
+
+    def to_networkx(self, vocabulary=None):
+        ''' returns a networkx.Graph view of this graph. 
+
+        parameters
+        ----------
+        vocabulary : Vocabulary
+            if given, nodes of the returned graph are labeled with word 
+            strings instead of word ids
+
+        returns
+        -------
+        networkx.Graph, a copy of the graph structure
+        '''
+        graph = networkx.Graph()
+        if vocabulary is None:
+            graph.add_nodes_from(self.node_ids)
+            graph.add_edges_from(self.edges())
+        else:
+            graph.add_nodes_from(vocabulary.get_word(node) for node in self.node_ids)
+            graph.add_edges_from((vocabulary.get_word(a), vocabulary.get_word(b)) for (a, b) in self.edges())
+        return graph
+
+    def __contains__(self, node):
+        index = bisect_left(self.node_ids, node)
+        return index < len(self.node_ids) and self.node_ids[index] == node
+
+    def __len__(self):
+        return len(self.node_ids)
+
 '''
 Place holder for Dependency Parsing based graphs
 '''
@@ -0,0 +1,268 @@
+'''
+
+This module provides the instrumentation surface of the graphlet miner.
+
+The pattern search reports its progress to an Instrumentation object, which
+forwards events to observers:
+1 - phase timings: on_phase_end(phase, metrics) with 'seconds' and 'rss_bytes'
+2 - per search iteration metrics: on_iteration_end(metrics)
+3 - human readable messages: on_message(text)
+
+ConsoleObserver prints messages and progress bars (the default output of
+extract_graphlets), JsonLinesObserver writes every event as one JSON object
+per line, and SearchObserver can be subclassed for custom callbacks. Without
+observers, instrumentation calls return immediately and no metric is
+computed.
+
+'''
+
+import json
+import os
+import resource
+import sys
+import time
+
+from tqdm import tqdm
+
+def get_rss_bytes():
+    ''' returns the resident set size of the current process
+
+    parameters
+    ----------
+
+    returns
+    -------
+    int, bytes. The peak resident set size on systems without /proc
+    '''
+    try:
+        with open('/proc/self/statm', 'r') as file_handler:
+            return int(file_handler.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+class SearchObserver(object):
+    ''' Base class of observers. Every method is a no-op and can be overridden. '''
+    def on_phase_start(self, phase):
+        pass
+
+    def on_phase_end(self, phase, metrics):
+        pass
+
+    def on_iteration_end(self, metrics):
+        pass
+
+    def on_message(self, message):
+        pass
+
+    def wants_progress_bars(self):
+        return False
+
+    def close(self):
+        pass
+
+class ConsoleObserver(SearchObserver):
+    ''' Prints messages to the standard output and shows progress bars '''
+    def on_message(self, message):
+        print(message)
+
+    def wants_progress_bars(self):
+        return True
+
+class JsonLinesObserver(SearchObserver):
+    ''' Appends events to a JSON lines file. Every line has an 'event' name
+    ('phase_start', 'phase_end', 'iteration_end' or 'message') and a 'time' stamp.
+    '''
+    def __init__(self, file_path):
+        ''' opens the metrics file in append mode
+
+        parameters
+        ----------
+        file_path : str
+            path of the JSON lines file
+
+        returns
+        -------
+
+        '''
+        self.file_handler = open(file_path, 'a', encoding='utf-8')
+
+    def _write(self, event, fields):
+        record = {'event': event, 'time': time.time()}
+        record.update(fields)
+        self.file_handler.write(json.dumps(record, default=str) + '\n')
+        self.file_handler.flush()
+
+    def on_phase_start(self, phase):
+        self._write('phase_start', {'phase': phase})
+
+    def on_phase_end(self, phase, metrics):
+        self._write('phase_end', dict(metrics, phase=phase))
+
+    def on_iteration_end(self, metrics):
+        self._write('iteration_end', metrics)
+
+    def on_message(self, message):
+        self._write('message', {'message': message})
+
+    def close(self):
+        self.file_handler.close()
+
+class _Phase(object):
+    # times a phase and notifies observers, see Instrumentation.phase
+    __slots__ = ('instrumentation', 'name', 'start_time', 'metrics')
+
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.metrics = {}
+
+    def __enter__(self):
+        for observer in self.instrumentation.observers:
+            observer.on_phase_start(self.name)
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        metrics = dict(self.metrics, seconds=time.perf_counter() - self.start_time, rss_bytes=get_rss_bytes())
+        for observer in self.instrumentation.observers:
+            observer.on_phase_end(self.name, metrics)
+        return False
+
+class _NullPhase(object):
+    # stands in for _Phase when there are no observers
+    __slots__ = ('metrics',)
+
+    def __init__(self):
+        self.metrics = {}
+
+    def __enter__(self):
+        self.metrics.clear()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+class Instrumentation(object):
+    ''' Dispatches search events to observers. '''
+    def __init__(self, observers=[], owned_observers=[]):
+        ''' initializes instrumentation
+
+        parameters
+        ----------
+        observers : list
+            SearchObserver objects. Instrumentation is disabled if empty
+        owned_observers : list
+            observers among them that are closed by close()
+
+        returns
+        -------
+
+        '''
+        self.observers = list(observers)
+        self.owned_observers = list(owned_observers)
+        self.enabled = len(self.observers) > 0
+        self.progress_bars = any(observer.wants_progress_bars() for observer in self.observers)
+        self.null_phase = _NullPhase()
+
+    @classmethod
+    def from_params(cls, params, observers=[]):
+        ''' builds the instrumentation of a search run: a ConsoleObserver unless
+        params['VERBOSE'] is False, a JsonLinesObserver if params['METRICS_FILE']
+        is set, and the given observers
+
+        parameters
+        ----------
+        params : dict
+            search parameters
+        observers : list
+            additional SearchObserver objects
+
+        returns
+        -------
+        Instrumentation
+        '''
+        run_observers = []
+        if params.get('VERBOSE', True):
+            run_observers.append(ConsoleObserver())
+        if params.get('METRICS_FILE', None) is not None:
+            run_observers.append(JsonLinesObserver(params['METRICS_FILE']))
+        return cls(run_observers + list(observers), run_observers)
+
+    def phase(self, name):
+        ''' returns a context manager that times a phase. Metrics can be added
+        to the 'metrics' dict of the returned object before the phase ends
+
+        parameters
+        ----------
+        name : str
+            phase name
+
+        returns
+        -------
+        context manager
+        '''
+        if not self.enabled:
+            return self.null_phase
+        return _Phase(self, name)
+
+    def iteration_end(self, metrics):
+        ''' reports the metrics of a search iteration
+
+        parameters
+        ----------
+        metrics : dict
+            iteration metrics
+
+        returns
+        -------
+
+        '''
+        for observer in self.observers:
+            observer.on_iteration_end(metrics)
+
+    def message(self, message):
+        ''' reports a human readable message
+
+        parameters
+        ----------
+        message : str
+            text
+
+        returns
+        -------
+
+        '''
+        for observer in self.observers:
+            observer.on_message(message)
+
+    def progress(self, iterable, total=None):
+        ''' wraps an iterable in a progress bar if an observer shows them
+
+        parameters
+        ----------
+        iterable : iterable
+            items being processed
+        total : int
+            number of items, if known
+
+        returns
+        -------
+        iterable
+        '''
+        if self.progress_bars:
+            return tqdm(iterable, total=total)
+        return iterable
+
+    def close(self):
+        ''' closes the observers created by from_params
+
+        parameters
+        ----------
+
+        returns
+        -------
+
+        '''
+        for observer in self.owned_observers:
+            observer.close()
@@ -0,0 +1,206 @@
+'''
+
+This module provides GraphletMiner, a persistent graphlet mining state that
+grows with new batches of documents.
+
+extract_graphlets mines a whole collection at once. A GraphletMiner mines
+one batch of documents at a time: word frequencies are updated with the
+batch, word graphs are built and searched for the new documents only, and
+pattern counts and occurrences are merged into the accumulated results.
+Tokenization, word graphs and the search cost as much as for the batch
+alone. Word frequencies are accumulated, and the frequent words and seed
+words are selected again from the whole vocabulary, so every batch also
+takes time linear in the vocabulary size (not in the number of documents
+mined before).
+
+Earlier documents are never searched again. Their results stay exact as
+long as the words and patterns they were searched with keep the same
+standing; add_documents reports the changes that would call for mining
+them again. A pattern is reported once its count, summed over batches,
+passes a threshold it did not pass before, so the counts of patterns below
+the threshold must be kept: sketch pattern counting, which drops them, is
+not supported.
+
+'''
+
+import os
+import pickle
+import re
+
+from collections import Counter
+
+from gminer.algorithms import mine_documents
+from gminer.graphs import Vocabulary, WordFrequencyArray, render_pattern_key
+from gminer.instrumentation import Instrumentation
+from gminer.occurrences import OccurrenceStore
+
+class GraphletMiner(object):
+    ''' Accumulated graphlet patterns of the documents mined so far.
+    Mining a collection in one batch gives the same patterns as
+    extract_graphlets with the same parameters.
+    '''
+    def __init__(self, params, workers=1, observers=[]):
+        ''' initializes a miner with no documents
+
+        parameters
+        ----------
+        params : dict
+            graphlet search parameters, see algorithms.extract_graphlets. A ValueError is raised if
+            params['PATTERN_COUNTING'] is 'SKETCH'. Word graphs are only kept while their
+            batch is mined; with params['GRAPH_STORE_DIR'] set, each batch replaces the store of the previous one.
+            With params['CHECKPOINT_DIR'] set, the search of the n-th batch is checkpointed in its subdirectory 
+            'batch-n', so a batch that was interrupted resumes when it is added again to the miner saved before it
+        workers : int
+            number of worker processes
+        observers : list
+            SearchObserver objects notified while mining each batch, see algorithms.extract_graphlets
+
+        returns
+        -------
+
+        '''
+        if params.get('PATTERN_COUNTING', 'EXACT').upper() == 'SKETCH':
+            raise ValueError('incremental mining needs the counts of patterns below the threshold, it cannot be used with sketch pattern counting')
+        self.params = params
+        self.workers = workers
+        self.observers = list(observers)
+        self.vocabulary = Vocabulary()
+        self.token_freq = Counter()
+        self.word_freq = WordFrequencyArray.from_items([])
+        self.seed_words = set()
+        self.docids = set()
+        self.number_of_batches = 0
+        self.pattern_freq = {}
+        self.word_patterns = OccurrenceStore()
+
+    def _get_seed_words(self, word_freq):
+        # words frequent enough to seed graphlets wherever they are content words
+        content_word_regex = re.compile(self.params['CONTENT_WORD_REGEX_PATTERN'])
+        stopword_set = set(self.params['STOPWORD_LIST'])
+        min_word_freq = self.params['MIN_WORD_FREQ']
+        return set([ word for (word, freq) in word_freq.items() if freq > min_word_freq and content_word_regex.match(self.vocabulary.get_word(word)) and self.vocabulary.get_word(word) not in stopword_set ])
+
+    def add_documents(self, doc_collection):
+        ''' mines a batch of new documents and merges their patterns
+
+        parameters
+        ----------
+        doc_collection : dict, iterable, str or CorpusReader
+            the new documents, see corpus.iter_documents. Their ids must be distinct and must not have been mined
+            before, otherwise a ValueError is raised before the miner is changed
+
+        returns
+        -------
+        dict
+            a report of the batch: 'documents' (number of new documents), 'new_seed_words' and 'dropped_seed_words'
+            (words that became, or stopped being, frequent enough to seed graphlets, which earlier documents were
+            searched without or with), 'stale_patterns' (patterns of earlier documents that were pruned from the
+            search and now pass the threshold of their search iteration) and 'requires_reexpansion', True if
+            any of these lists is not empty
+        '''
+        vocabulary = self.vocabulary
+        batch_params = self.params
+        if self.params.get('CHECKPOINT_DIR', None) is not None:
+            # every batch is a search of its own, checkpointed in a directory of its own
+            batch_params = dict(self.params, CHECKPOINT_DIR=os.path.join(self.params['CHECKPOINT_DIR'], 'batch-%d' % self.number_of_batches))
+
+        instrumentation = Instrumentation.from_params(self.params, self.observers)
+        try:
+            pattern_counts_by_iteration = {}
+            (batch_docids, word_freq) = mine_documents(doc_collection, batch_params, self.workers, vocabulary, self.token_freq, self.pattern_freq, self.word_patterns, instrumentation, self.docids, pattern_counts_by_iteration)
+            seed_words = self._get_seed_words(word_freq)
+            report = {'documents': len(batch_docids), 'new_seed_words': [], 'dropped_seed_words': [], 'stale_patterns': []}
+            if len(self.docids) > 0:
+                report['new_seed_words'] = sorted([ vocabulary.get_word(word) for word in seed_words - self.seed_words ])
+                report['dropped_seed_words'] = sorted([ vocabulary.get_word(word) for word in self.seed_words - seed_words ])
+            report['stale_patterns'] = self._get_stale_patterns(pattern_counts_by_iteration)
+            self.docids.update(batch_docids)
+            self.number_of_batches += 1
+            self.word_freq = word_freq
+            self.seed_words = seed_words
+            report['requires_reexpansion'] = len(report['new_seed_words']) > 0 or len(report['dropped_seed_words']) > 0 or len(report['stale_patterns']) > 0
+            instrumentation.message("Done.")
+        finally:
+            instrumentation.close()
+        return report
+
+    def _get_stale_patterns(self, pattern_counts_by_iteration):
+        # a pattern of earlier documents went stale if it was at or below the pruning threshold of a search
+        # iteration before the batch and is above it now: its earlier hypotheses were pruned at that iteration
+        thresholds = self.params['PATTERN_FREQ_THRESHOLD_BY_STACK']
+        batch_counts = {}
+        for pattern_counts in pattern_counts_by_iteration.values():
+            for (graphlet_pattern_key, count) in pattern_counts.items():
+                batch_counts[graphlet_pattern_key] = batch_counts.get(graphlet_pattern_key, 0) + count
+        stale_patterns = set()
+        for (search_iteration, pattern_counts) in pattern_counts_by_iteration.items():
+            threshold = thresholds.get(search_iteration, 5)
+            for graphlet_pattern_key in pattern_counts.keys():
+                freq = self.pattern_freq[graphlet_pattern_key]
+                previous_freq = freq - batch_counts[graphlet_pattern_key]
+                if 0 < previous_freq <= threshold < freq:
+                    stale_patterns.add(graphlet_pattern_key)
+        return sorted([ render_pattern_key(graphlet_pattern_key, self.vocabulary) for graphlet_pattern_key in stale_patterns ])
+
+    def get_word_patterns(self):
+        ''' returns the patterns found so far, as returned by extract_graphlets
+
+        parameters
+        ----------
+
+        returns
+        -------
+        dict, a map from graphlet pattern string to its distinct (center word, graph id) occurrences, see occurrences.OccurrenceView
+        '''
+        return self.word_patterns.render(self.vocabulary)
+
+    def get_number_of_documents(self):
+        return len(self.docids)
+
+    def __getstate__(self):
+        # observers hold open files and callbacks of the current process, they are not part of the saved state
+        state = dict(self.__dict__)
+        del state['observers']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.observers = []
+
+    def save(self, file_path):
+        ''' writes the miner state to a file
+
+        parameters
+        ----------
+        file_path : str
+            path of the state file
+
+        returns
+        -------
+
+        '''
+        with open(file_path, 'wb') as file_handler:
+            pickle.dump(self, file_handler, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, file_path, workers=1, observers=[]):
+        ''' reads a miner state written by save()
+
+        parameters
+        ----------
+        file_path : str
+            path of the state file
+        workers : int
+            number of worker processes of the loaded miner
+        observers : list
+            SearchObserver objects of the loaded miner
+
+        returns
+        -------
+        GraphletMiner, the miner
+        '''
+        with open(file_path, 'rb') as file_handler:
+            miner = pickle.load(file_handler)
+        miner.workers = workers
+        miner.observers = list(observers)
+        return miner
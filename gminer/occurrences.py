@@ -0,0 +1,253 @@
+'''
+
+This module provides the storage of pattern occurrences found by the
+graphlet search.
+
+An occurrence of a pattern is a (center word, document) pair. The search
+finds the same occurrence many times, once per expansion path, so
+occurrences are deduplicated as they are stored. Center words are word ids
+of the corpus Vocabulary and documents are interned into dense ids, so each
+occurrence is a pair of int32 values, packed into one 64 bit integer of a
+compact array. Strings are only decoded when occurrences are read through
+an OccurrenceView.
+
+'''
+
+import sys
+
+from array import array
+from bisect import bisect_left
+
+from gminer.graphs import Vocabulary, render_pattern_key
+
+class PatternOccurrences(object):
+    ''' The distinct (center word id, document id) occurrences of one pattern.
+    New occurrences are appended to an array of packed pairs, which is sorted
+    and deduplicated whenever it has doubled in size since it was last
+    deduplicated, and before it is read. Memory stays within twice that of
+    the distinct occurrences, and occurrences are read in sorted order.
+    '''
+    __slots__ = ('pairs', 'n_distinct')
+
+    # minimum number of pairs before duplicates are removed
+    MIN_COMPACTION_SIZE = 16
+
+    def __init__(self):
+        self.pairs = array('q')
+        self.n_distinct = 0
+
+    def add(self, center_id, document_id):
+        ''' records an occurrence
+
+        parameters
+        ----------
+        center_id : int
+            word id of the center word
+        document_id : int
+            interned document id
+
+        returns
+        -------
+
+        '''
+        self.pairs.append((center_id << 32) | document_id)
+        if len(self.pairs) >= 2 * max(self.n_distinct, self.MIN_COMPACTION_SIZE):
+            self.compact()
+
+    def compact(self):
+        ''' sorts the occurrences and removes duplicates
+
+        parameters
+        ----------
+
+        returns
+        -------
+
+        '''
+        if len(self.pairs) > self.n_distinct:
+            self.pairs = array('q', sorted(set(self.pairs)))
+            self.n_distinct = len(self.pairs)
+
+    def __len__(self):
+        self.compact()
+        return self.n_distinct
+
+    def __iter__(self):
+        self.compact()
+        for pair in self.pairs:
+            yield (pair >> 32, pair & 0xffffffff)
+
+    def __getitem__(self, index):
+        self.compact()
+        pair = self.pairs[index]
+        return (pair >> 32, pair & 0xffffffff)
+
+    def __contains__(self, occurrence):
+        self.compact()
+        (center_id, document_id) = occurrence
+        pair = (center_id << 32) | document_id
+        index = bisect_left(self.pairs, pair)
+        return index < len(self.pairs) and self.pairs[index] == pair
+
+    def __getstate__(self):
+        self.compact()
+        return (self.pairs, self.n_distinct)
+
+    def __setstate__(self, state):
+        (self.pairs, self.n_distinct) = state
+
+class OccurrenceView(object):
+    ''' A read-only sequence of the (center word, graph id) occurrences of a
+    pattern, decoded from ids when they are read. Occurrences are distinct,
+    so the view can be used as is where a deduplicated list is expected.
+    '''
+    __slots__ = ('occurrences', 'vocabulary', 'documents')
+
+    def __init__(self, occurrences, vocabulary, documents):
+        ''' initializes a view
+
+        parameters
+        ----------
+        occurrences : PatternOccurrences
+            the occurrences of the pattern
+        vocabulary : Vocabulary
+            the vocabulary of the center word ids
+        documents : Vocabulary
+            the interned graph ids
+
+        returns
+        -------
+
+        '''
+        self.occurrences = occurrences
+        self.vocabulary = vocabulary
+        self.documents = documents
+
+    def __len__(self):
+        return len(self.occurrences)
+
+    def __iter__(self):
+        get_word = self.vocabulary.get_word
+        get_document = self.documents.get_word
+        for (center_id, document_id) in self.occurrences:
+            yield (get_word(center_id), get_document(document_id))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [ self[i] for i in range(*index.indices(len(self))) ]
+        (center_id, document_id) = self.occurrences[index]
+        return (self.vocabulary.get_word(center_id), self.documents.get_word(document_id))
+
+    def __contains__(self, occurrence):
+        (center_word, graph_id) = occurrence
+        center_id = self.vocabulary.get_id(center_word)
+        document_id = self.documents.get_id(graph_id)
+        if center_id is None or document_id is None:
+            return False
+        return (center_id, document_id) in self.occurrences
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(list(self))
+
+class OccurrenceStore(object):
+    ''' A map from graphlet pattern key to PatternOccurrences, with the
+    interned ids of the documents (graph ids) they refer to. It supports the
+    dict methods used to read results (keys, items, in, len, []).
+    '''
+    def __init__(self):
+        ''' initializes an empty store
+
+        parameters
+        ----------
+
+        returns
+        -------
+
+        '''
+        self.documents = Vocabulary()
+        self.patterns = {}
+
+    def add(self, graphlet_pattern_key, center_id, graph_id):
+        ''' records an occurrence of a pattern
+
+        parameters
+        ----------
+        graphlet_pattern_key : tuple
+            a pattern key, see Graphlet.get_pattern_key
+        center_id : int
+            word id of the center word
+        graph_id : str
+            id of the graph (document) of the occurrence
+
+        returns
+        -------
+
+        '''
+        occurrences = self.patterns.get(graphlet_pattern_key)
+        if occurrences is None:
+            occurrences = PatternOccurrences()
+            self.patterns[graphlet_pattern_key] = occurrences
+        occurrences.add(center_id, self.documents.add_word(graph_id))
+
+    def get_view(self, graphlet_pattern_key, vocabulary):
+        ''' returns the occurrences of a pattern as (center word, graph id) strings
+
+        parameters
+        ----------
+        graphlet_pattern_key : tuple
+            a pattern key in the store
+        vocabulary : Vocabulary
+            the vocabulary of the center word ids
+
+        returns
+        -------
+        OccurrenceView
+        '''
+        return OccurrenceView(self.patterns[graphlet_pattern_key], vocabulary, self.documents)
+
+    def render(self, vocabulary):
+        ''' returns the patterns as strings, with their occurrences
+
+        parameters
+        ----------
+        vocabulary : Vocabulary
+            the vocabulary of the pattern and center word ids
+
+        returns
+        -------
+        dict, a map from graphlet pattern string (see graphs.render_pattern_key) to OccurrenceView
+        '''
+        return dict([ (render_pattern_key(graphlet_pattern_key, vocabulary), OccurrenceView(occurrences, vocabulary, self.documents)) for (graphlet_pattern_key, occurrences) in self.patterns.items() ])
+
+    def get_memory_usage(self):
+        ''' returns the approximate bytes held by the occurrence arrays
+
+        parameters
+        ----------
+
+        returns
+        -------
+        int, bytes
+        '''
+        return sum([ sys.getsizeof(occurrences.pairs) for occurrences in self.patterns.values() ])
+
+    def keys(self):
+        return self.patterns.keys()
+
+    def items(self):
+        return self.patterns.items()
+
+    def __getitem__(self, graphlet_pattern_key):
+        return self.patterns[graphlet_pattern_key]
+
+    def __contains__(self, graphlet_pattern_key):
+        return graphlet_pattern_key in self.patterns
+
+    def __len__(self):
+        return len(self.patterns)
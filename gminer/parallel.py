@@ -0,0 +1,243 @@
+'''
+
+This module provides process pool helpers used to spread per-document work
+(tokenization, word graph construction, seeding) over several CPU cores, and
+a pool of long lived shard workers used to expand search stacks in parallel.
+
+Work functions are module level functions with the signature 
+function(item, context). The context holds read-only data shared by all 
+items (e.g. the corpus vocabulary); it is sent once to each worker process
+rather than once per item.
+
+'''
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Pipe, Process
+
+_worker_context = None
+
+def _set_worker_context(context):
+    global _worker_context
+    _worker_context = context
+
+def _apply_chunk_with_worker_context(function, chunk):
+    return [function(item, _worker_context) for item in chunk]
+
+def _reduce_chunk_with_worker_context(function, chunk):
+    return [function(chunk, _worker_context)]
+
+def get_chunk_size(n_items, workers):
+    ''' returns the number of items sent to a worker process per task. A few
+    tasks per worker keep workers busy without paying per-item IPC costs.
+
+    parameters
+    ----------
+    n_items : int
+        number of work items
+    workers : int
+        number of worker processes
+
+    returns
+    -------
+    int, chunk size
+    '''
+    return max(1, min(n_items // (workers * 4), MAX_CHUNK_SIZE))
+
+MAX_CHUNK_SIZE = 256
+
+def iter_chunks(items, chunk_size):
+    ''' splits an iterable into lists of at most chunk_size items
+
+    parameters
+    ----------
+    items : iterable
+        work items
+    chunk_size : int
+        maximum number of items per chunk
+
+    returns
+    -------
+    generator, lists of items
+    '''
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+def map_documents(function, items, workers=1, context=None):
+    ''' applies function(item, context) to every item and yields the results 
+    in the same order as the items, so merging is deterministic regardless of
+    the number of workers.
+    Items may be a generator: they are consumed in chunks and only a few 
+    chunks per worker are in flight at any time, so memory does not grow 
+    with the size of the input.
+
+    parameters
+    ----------
+    function : callable
+        a module level function (picklable by reference)
+    items : iterable
+        work items, typically (docid, document) tuples
+    workers : int
+        number of worker processes. Items are processed in the calling 
+        process when workers <= 1
+    context : object
+        read-only data passed to every call of function
+
+    returns
+    -------
+    generator, function results in item order
+    '''
+    if workers is None or workers <= 1:
+        for item in items:
+            yield function(item, context)
+        return
+    for result in _map_pool_chunks(_apply_chunk_with_worker_context, function, items, workers, context):
+        yield result
+
+def map_chunks(function, items, workers=1, context=None):
+    ''' applies function(chunk, context) to lists of consecutive items and 
+    yields one result per chunk, in item order. Chunks are those map_documents
+    sends to a worker process, so a worker can reduce its chunk (e.g. sum 
+    counts) and send back a single result rather than one per item.
+
+    parameters
+    ----------
+    function : callable
+        a module level function (picklable by reference) that takes a list of items
+    items : iterable
+        work items, typically (docid, document) tuples
+    workers : int
+        number of worker processes. Chunks are processed in the calling 
+        process when workers <= 1
+    context : object
+        read-only data passed to every call of function
+
+    returns
+    -------
+    generator, function results in chunk order
+    '''
+    if workers is None or workers <= 1:
+        for chunk in iter_chunks(items, MAX_CHUNK_SIZE):
+            yield function(chunk, context)
+        return
+    for result in _map_pool_chunks(_reduce_chunk_with_worker_context, function, items, workers, context):
+        yield result
+
+def _map_pool_chunks(apply_chunk, function, items, workers, context):
+    chunk_size = get_chunk_size(len(items), workers) if hasattr(items, '__len__') else MAX_CHUNK_SIZE // 4
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_set_worker_context, initargs=(context,)) as executor:
+        for chunk in iter_chunks(items, chunk_size):
+            pending.append(executor.submit(apply_chunk, function, chunk))
+            if len(pending) >= 2 * workers:
+                for result in pending.popleft().result():
+                    yield result
+        while len(pending) > 0:
+            for result in pending.popleft().result():
+                yield result
+
+def _shard_worker_loop(connection, handler, shard_state):
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        try:
+            connection.send((True, handler(shard_state, message)))
+        except Exception as exception:
+            connection.send((False, exception))
+    connection.close()
+
+class ShardPool(object):
+    ''' A fixed set of worker processes where each process owns one shard of
+    the corpus state (e.g. the word graphs of a subset of documents) for its 
+    whole lifetime. Unlike map_documents, work is routed to the process that 
+    owns the data, and the shard state persists between calls, so large 
+    objects are transferred once rather than on every search iteration.
+    '''
+    def __init__(self, shard_states, handler):
+        ''' starts one worker process per shard
+
+        parameters
+        ----------
+        shard_states : list
+            one state object per shard. The state is handed to the worker 
+            process at start up (inherited without copying where the fork 
+            start method is available)
+        handler : callable
+            a module level function handler(shard_state, message) that runs 
+            in the worker process and returns a picklable result. It may 
+            update the shard state between calls
+
+        returns
+        -------
+        
+        '''
+        self.connections = []
+        self.processes = []
+        for shard_state in shard_states:
+            parent_connection, child_connection = Pipe()
+            process = Process(target=_shard_worker_loop, args=(child_connection, handler, shard_state), daemon=True)
+            process.start()
+            child_connection.close()
+            self.connections.append(parent_connection)
+            self.processes.append(process)
+
+    def get_number_of_shards(self):
+        return len(self.processes)
+
+    def map(self, messages):
+        ''' sends one message to every shard and returns the results in shard
+        order. Shards process their messages concurrently.
+
+        parameters
+        ----------
+        messages : list
+            one message per shard
+
+        returns
+        -------
+        list, handler results in shard order
+        '''
+        assert(len(messages) == len(self.connections))
+        for (connection, message) in zip(self.connections, messages):
+            connection.send(message)
+        results = []
+        for connection in self.connections:
+            (succeeded, result) = connection.recv()
+            if not succeeded:
+                raise result
+            results.append(result)
+        return results
+
+    def close(self):
+        ''' stops all worker processes
+
+        parameters
+        ----------
+
+        returns
+        -------
+        
+        '''
+        for connection in self.connections:
+            try:
+                connection.send(None)
+                connection.close()
+            except (OSError, BrokenPipeError):
+                pass
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
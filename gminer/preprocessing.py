@@ -0,0 +1,160 @@
+'''
+
+This module provides document preprocessing that runs before graphlet
+mining, starting with part of speech tagging.
+
+Tagged documents are TokenStream objects whose tokens are lower-cased words
+joined to their tag ('word_TAG'), so the same word with two different tags is
+represented by two distinct nodes of the word graph. They can be passed to
+extract_graphlets as they are, and are not tokenized again.
+
+Tagging is the slowest step of preprocessing. Documents are tagged across a
+pool of worker processes, and with a cache directory every tagged document
+is saved under a hash of its text and of the tagger version, so runs over
+the same documents (e.g. parameter sweeps) skip tagging entirely.
+
+'''
+
+from hashlib import blake2b
+
+import nltk
+
+from nltk.tag import PerceptronTagger
+from nltk.tokenize import sent_tokenize, word_tokenize
+from gminer.corpus import iter_documents
+from gminer.parallel import map_documents
+from gminer.storage import DocumentCache
+from gminer.text_processing import TokenStream
+
+# to be increased whenever pos_tag_text output changes, which invalidates cached documents
+PREPROCESSING_VERSION = 1
+
+# the tagger model is loaded once per process
+_tagger = None
+
+def _get_tagger():
+    global _tagger
+    if _tagger is None:
+        _tagger = PerceptronTagger()
+    return _tagger
+
+# cache directories are opened once per process
+_document_caches = {}
+
+def _get_document_cache(cache_dir):
+    cache = _document_caches.get(cache_dir)
+    if cache is None:
+        cache = DocumentCache(cache_dir)
+        _document_caches[cache_dir] = cache
+    return cache
+
+def get_tagger_version():
+    ''' identifies the tagger output, see pos_tag_text
+
+    parameters
+    ----------
+
+    returns
+    -------
+    str, tagger version
+    '''
+    return 'nltk-{0}-perceptron-{1}'.format(nltk.__version__, PREPROCESSING_VERSION)
+
+def pos_tag_text(text):
+    ''' tags a text document with parts of speech. Underscores of the text are
+    replaced with dashes, so that the tag is always after the last underscore of a token
+
+    parameters
+    ----------
+    text : str
+        text of a document
+
+    returns
+    -------
+    TokenStream, sentences of 'word_TAG' tokens
+    '''
+    tagger = _get_tagger()
+    sentences = []
+    # sent tokenize is used to avoid having bigrams between words in two different sentences
+    for line in sent_tokenize(text.replace('_','-')):
+        tag_seq = tagger.tag(word_tokenize(line))
+        sentences.append([word.lower() + '_' + tag for (word, tag) in tag_seq])
+    return TokenStream(sentences)
+
+def get_document_key(text, tagger_version):
+    ''' returns the cache key of a tagged document
+
+    parameters
+    ----------
+    text : str
+        text of a document
+    tagger_version : str
+        see get_tagger_version
+
+    returns
+    -------
+    str, hex digest
+    '''
+    return blake2b((tagger_version + '\n' + text).encode('utf-8'), digest_size=20).hexdigest()
+
+def pos_tag_document_item(doc_item, context):
+    ''' tags a (docid, text) pair, reading and filling the cache, see map_documents
+
+    parameters
+    ----------
+    doc_item : tuple
+        (docid, text)
+    context : dict
+        'cache_dir' (None for no cache) and 'tagger_version'
+
+    returns
+    -------
+    tuple, (docid, TokenStream)
+    '''
+    (docid, text) = doc_item
+    if context['cache_dir'] is None:
+        return (docid, pos_tag_text(text))
+    cache = _get_document_cache(context['cache_dir'])
+    key = get_document_key(text, context['tagger_version'])
+    token_stream = cache.get(key)
+    if token_stream is None:
+        token_stream = pos_tag_text(text)
+        cache.put(key, token_stream)
+    return (docid, token_stream)
+
+def iter_pos_tagged_documents(doc_source, workers=1, cache_dir=None):
+    ''' tags the documents of a collection with parts of speech, in collection order
+
+    parameters
+    ----------
+    doc_source : dict, iterable, str or CorpusReader
+        the document collection, see corpus.iter_documents
+    workers : int
+        number of worker processes used for tagging
+    cache_dir : str
+        if given, tagged documents are read from and saved to this directory, see storage.DocumentCache
+
+    returns
+    -------
+    generator, (docid, TokenStream) tuples
+    '''
+    context = {'cache_dir': cache_dir, 'tagger_version': get_tagger_version()}
+    return map_documents(pos_tag_document_item, iter_documents(doc_source), workers, context)
+
+def pos_tag_collection(doc_source, workers=1, cache_dir=None):
+    ''' tags every document of a collection with parts of speech
+
+    parameters
+    ----------
+    doc_source : dict, iterable, str or CorpusReader
+        the document collection, see corpus.iter_documents
+    workers : int
+        number of worker processes used for tagging
+    cache_dir : str
+        if given, tagged documents are read from and saved to this directory, see storage.DocumentCache
+
+    returns
+    -------
+    dict, a map from document id to TokenStream of 'word_TAG' tokens
+    '''
+    return dict(iter_pos_tagged_documents(doc_source, workers, cache_dir))
@@ -0,0 +1,406 @@
+'''
+
+This module provides on-disk storage used when a corpus does not fit in memory.
+
+DocumentSpool spills tokenized documents to a file between the tokenization
+pass and the graph construction pass. DiskGraphStore keeps the word graph of
+every document in a memory-mapped file and pages graphs in by graph id, with
+a small LRU cache of recently used graphs. Search stacks are ordered by
+document, so consecutive hypotheses mostly hit the cache. SearchCheckpoint
+saves the state of the graphlet search after each iteration so that an
+interrupted run can be resumed. DocumentCache keeps the results of expensive
+per-document preprocessing, such as part of speech tagging, between runs.
+
+'''
+
+import mmap
+import os
+import pickle
+
+from collections import OrderedDict
+
+class DocumentSpool(object):
+    ''' An append-only file of pickled (docid, document) records that can be
+    read back sequentially, any number of times.
+    '''
+    def __init__(self, file_path):
+        ''' creates an empty spool file, truncating any existing one
+
+        parameters
+        ----------
+        file_path : str
+            path of the spool file
+
+        returns
+        -------
+
+        '''
+        self.file_path = file_path
+        self.file_handler = open(file_path, 'wb')
+        self.n_records = 0
+
+    def append(self, record):
+        ''' writes a record at the end of the spool
+
+        parameters
+        ----------
+        record : object
+            a picklable record, typically a (docid, TokenStream) tuple
+
+        returns
+        -------
+
+        '''
+        pickle.dump(record, self.file_handler, protocol=pickle.HIGHEST_PROTOCOL)
+        self.n_records += 1
+
+    def __iter__(self):
+        self.file_handler.flush()
+        with open(self.file_path, 'rb') as file_handler:
+            for _ in range(self.n_records):
+                yield pickle.load(file_handler)
+
+    def __len__(self):
+        return self.n_records
+
+    def close(self, delete=True):
+        ''' closes the spool file
+
+        parameters
+        ----------
+        delete : bool
+            removes the spool file from disk
+
+        returns
+        -------
+
+        '''
+        self.file_handler.close()
+        if delete and os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+class DiskGraphStore(object):
+    ''' A dict-like, disk-backed store of DocumentWordGraph objects keyed by
+    graph id.
+    Graphs are appended to a single data file and read back through a
+    read-only memory map, so the operating system pages graph data in and
+    out as needed. Unpickled graphs are kept in an LRU cache of at most
+    cache_size graphs. The store can be pickled to worker processes, each of
+    which maps the data file independently.
+    '''
+    DATA_FILE_NAME = 'graphs.bin'
+    INDEX_FILE_NAME = 'graphs.idx'
+
+    def __init__(self, store_dir, cache_size=1000, mode='w'):
+        ''' opens a graph store
+
+        parameters
+        ----------
+        store_dir : str
+            directory of the store files. It is created if needed
+        cache_size : int
+            maximum number of unpickled graphs kept in memory
+        mode : str
+            'w' creates a new empty store, 'r' opens an existing one read-only
+
+        returns
+        -------
+
+        '''
+        self.store_dir = store_dir
+        self.cache_size = cache_size
+        self.data_path = os.path.join(store_dir, self.DATA_FILE_NAME)
+        self.index_path = os.path.join(store_dir, self.INDEX_FILE_NAME)
+        self.cache = OrderedDict()
+        self.data_file = None
+        self.data_map = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        if mode == 'w':
+            os.makedirs(store_dir, exist_ok=True)
+            self.index = OrderedDict()
+            self.data_size = 0
+            self.writer = open(self.data_path, 'wb')
+        else:
+            with open(self.index_path, 'rb') as file_handler:
+                self.index = pickle.load(file_handler)
+            self.data_size = os.path.getsize(self.data_path)
+            self.writer = None
+
+    def __setitem__(self, graph_id, graph):
+        assert(self.writer is not None)
+        data = pickle.dumps(graph, protocol=pickle.HIGHEST_PROTOCOL)
+        self.writer.write(data)
+        self.index[graph_id] = (self.data_size, len(data))
+        self.data_size += len(data)
+        self.cache.pop(graph_id, None)
+
+    def __getitem__(self, graph_id):
+        graph = self.cache.get(graph_id)
+        if graph is not None:
+            self.cache.move_to_end(graph_id)
+            self.cache_hits += 1
+            return graph
+        self.cache_misses += 1
+        (offset, length) = self.index[graph_id]
+        graph = pickle.loads(self._get_data_map(offset + length)[offset:offset + length])
+        self.cache[graph_id] = graph
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return graph
+
+    def _get_data_map(self, min_size):
+        if self.data_map is None or len(self.data_map) < min_size:
+            if self.writer is not None:
+                self.writer.flush()
+            self._close_data_map()
+            self.data_file = open(self.data_path, 'rb')
+            self.data_map = mmap.mmap(self.data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.data_map
+
+    def _close_data_map(self):
+        if self.data_map is not None:
+            self.data_map.close()
+            self.data_map = None
+        if self.data_file is not None:
+            self.data_file.close()
+            self.data_file = None
+
+    def __contains__(self, graph_id):
+        return graph_id in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def keys(self):
+        return self.index.keys()
+
+    def flush(self):
+        ''' writes pending graphs and the index to disk, after which the store
+        can be opened read-only by other processes
+
+        parameters
+        ----------
+
+        returns
+        -------
+
+        '''
+        if self.writer is not None:
+            self.writer.flush()
+        with open(self.index_path, 'wb') as file_handler:
+            pickle.dump(self.index, file_handler, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def close(self):
+        ''' flushes and closes the store files
+
+        parameters
+        ----------
+
+        returns
+        -------
+
+        '''
+        if self.writer is not None:
+            self.flush()
+            self.writer.close()
+            self.writer = None
+        self._close_data_map()
+        self.cache.clear()
+
+    def __getstate__(self):
+        # worker processes get a read-only view with their own memory map and cache
+        if self.writer is not None:
+            self.flush()
+        state = self.__dict__.copy()
+        state.update({'writer': None, 'data_file': None, 'data_map': None, 'cache': OrderedDict()})
+        return state
+
+class SearchCheckpoint(object):
+    ''' An on-disk checkpoint of an iterative search, made of two files.
+    The log file is append-only and gets one record per completed iteration
+    (the increments of accumulated results). The state file holds the
+    current search state only, and is rewritten after each iteration by
+    streaming records to a temporary file that atomically replaces it. The
+    state header records the log size, so log records written after the last
+    state are discarded on load.
+    '''
+    STATE_FILE_NAME = 'search.state'
+    LOG_FILE_NAME = 'search.log'
+
+    def __init__(self, checkpoint_dir, fingerprint):
+        ''' opens a checkpoint directory
+
+        parameters
+        ----------
+        checkpoint_dir : str
+            directory of the checkpoint files. It is created if needed
+        fingerprint : str
+            identifies the run configuration. Checkpoints with another fingerprint are ignored by load()
+
+        returns
+        -------
+
+        '''
+        self.checkpoint_dir = checkpoint_dir
+        self.fingerprint = fingerprint
+        self.state_path = os.path.join(checkpoint_dir, self.STATE_FILE_NAME)
+        self.log_path = os.path.join(checkpoint_dir, self.LOG_FILE_NAME)
+        self.log_size = 0
+        self.pending_log_size = 0
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    def load(self):
+        ''' reads the last saved checkpoint
+
+        parameters
+        ----------
+
+        returns
+        -------
+        tuple
+            (header dict, list of log records, list of state records), or None if there is no checkpoint 
+            with the same fingerprint, in which case the checkpoint is reset
+        '''
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'rb') as file_handler:
+                header = pickle.load(file_handler)
+                if header['fingerprint'] == self.fingerprint:
+                    state_records = []
+                    while file_handler.peek(1):
+                        state_records.append(pickle.load(file_handler))
+                    log_records = []
+                    with open(self.log_path, 'r+b') as log_handler:
+                        log_handler.truncate(header['log_size'])
+                        while log_handler.tell() < header['log_size']:
+                            log_records.append(pickle.load(log_handler))
+                    self.log_size = self.pending_log_size = header['log_size']
+                    return (header, log_records, state_records)
+        self.reset()
+        return None
+
+    def reset(self):
+        ''' removes any saved checkpoint
+
+        parameters
+        ----------
+
+        returns
+        -------
+
+        '''
+        for file_path in [self.state_path, self.log_path]:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        self.log_size = self.pending_log_size = 0
+
+    def append_log(self, record):
+        ''' appends a record to the log. It becomes part of the checkpoint when the next state is saved
+
+        parameters
+        ----------
+        record : object
+            a picklable record
+
+        returns
+        -------
+
+        '''
+        with open(self.log_path, 'r+b' if os.path.exists(self.log_path) else 'wb') as file_handler:
+            file_handler.seek(self.pending_log_size)
+            file_handler.truncate()
+            pickle.dump(record, file_handler, protocol=pickle.HIGHEST_PROTOCOL)
+            file_handler.flush()
+            os.fsync(file_handler.fileno())
+            self.pending_log_size = file_handler.tell()
+
+    def save_state(self, header, records):
+        ''' replaces the saved state, which commits the records appended to the log so far
+
+        parameters
+        ----------
+        header : dict
+            small picklable data about the state, returned first by load()
+        records : iterable
+            picklable records, streamed to disk one at a time
+
+        returns
+        -------
+
+        '''
+        temp_path = self.state_path + '.tmp'
+        with open(temp_path, 'wb') as file_handler:
+            pickle.dump(dict(header, fingerprint=self.fingerprint, log_size=self.pending_log_size), file_handler, protocol=pickle.HIGHEST_PROTOCOL)
+            for record in records:
+                pickle.dump(record, file_handler, protocol=pickle.HIGHEST_PROTOCOL)
+            file_handler.flush()
+            os.fsync(file_handler.fileno())
+        os.replace(temp_path, self.state_path)
+        self.log_size = self.pending_log_size
+
+class DocumentCache(object):
+    ''' A directory of pickled values addressed by hex digest keys, typically
+    hashes of document contents. Values are written to a temporary file that
+    atomically replaces the cache entry, so several processes can fill the
+    same cache and an interrupted write never leaves a partial entry.
+    '''
+    def __init__(self, cache_dir):
+        ''' opens a cache directory
+
+        parameters
+        ----------
+        cache_dir : str
+            directory of the cache entries. It is created if needed
+
+        returns
+        -------
+
+        '''
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _get_path(self, key):
+        # entries are spread over 256 sub-directories to keep directories small
+        return os.path.join(self.cache_dir, key[:2], key + '.pkl')
+
+    def get(self, key):
+        ''' reads a cache entry
+
+        parameters
+        ----------
+        key : str
+            hex digest key
+
+        returns
+        -------
+        object, the cached value or None if there is no entry for key
+        '''
+        try:
+            with open(self._get_path(key), 'rb') as file_handler:
+                return pickle.load(file_handler)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, value):
+        ''' writes a cache entry, replacing any entry with the same key
+
+        parameters
+        ----------
+        key : str
+            hex digest key
+        value : object
+            a picklable value
+
+        returns
+        -------
+
+        '''
+        file_path = self._get_path(key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        temp_path = file_path + '.' + str(os.getpid()) + '.tmp'
+        with open(temp_path, 'wb') as file_handler:
+            pickle.dump(value, file_handler, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, file_path)
+
+    def __contains__(self, key):
+        return os.path.exists(self._get_path(key))
@@ -1,14 +1,182 @@
+import re
+
+from collections import Counter
 from nltk.tokenize import WordPunctTokenizer
 from nltk.tokenize import sent_tokenize
 from nltk import bigrams, word_tokenize, pos_tag 
+from gminer.parallel import map_chunks, map_documents
+
+class TokenStream(object):
+    ''' A tokenized document represented as a list of sentences, where each 
+    sentence is a list of tokens. 
+    Tokenization is the most expensive part of building the search space, so 
+    every document is tokenized once into a TokenStream that is then reused by
+    word frequency counting and by bigram extraction for word graphs.
+    '''
+    def __init__(self, sentences):
+        ''' initializes a token stream
+
+        parameters
+        ----------
+        sentences : list of list of str
+            token sequences, one per sentence. Bigrams never cross sentences
+
+        returns
+        -------
+        
+        '''
+        self.sentences = sentences
+
+    def tokens(self):
+        ''' iterates over all tokens of the document in order
+
+        parameters
+        ----------
+
+        returns
+        -------
+        generator, tokens
+        '''
+        for sentence in self.sentences:
+            for token in sentence:
+                yield token
+
+    def bigrams(self):
+        ''' iterates over bigrams within each sentence of the document
+
+        parameters
+        ----------
+
+        returns
+        -------
+        generator, (token, token) tuples
+        '''
+        for sentence in self.sentences:
+            for bigram in bigrams(sentence):
+                yield bigram
+
+    def __iter__(self):
+        return iter(self.sentences)
+
+    def __len__(self):
+        return len(self.sentences)
 
-def get_bigrams(input_data): #, use_pos_tagging):
-    bigrams_list = []
+def tokenize_text_nltk(input_data):
+    ''' NLTK tokenizer: Punkt sentences and Treebank word tokens '''
     line_seq = sent_tokenize(input_data) #sent_tokenize(input_data.replace('_','-'))
-    for line in line_seq:
-        token_seq = word_tokenize(line)
-        bigrams_list.extend(bigrams([w for w in token_seq]))
-    return bigrams_list
+    return TokenStream([word_tokenize(line) for line in line_seq])
+
+# sentences end at line breaks and after sentence ending punctuation followed by a space
+REGEX_SENTENCE_PATTERN = re.compile(r'\n|(?<=[.!?])\s+')
+# words, with inner hyphens, apostrophes and periods, or single punctuation marks
+REGEX_TOKEN_PATTERN = re.compile(r"\w+(?:[-'.]\w+)*|[^\w\s]")
+
+def tokenize_text_regex(input_data):
+    ''' REGEX tokenizer: a precompiled regex splitter, several times faster than NLTK on raw text '''
+    sentences = []
+    for line in REGEX_SENTENCE_PATTERN.split(input_data):
+        token_seq = REGEX_TOKEN_PATTERN.findall(line)
+        if len(token_seq) > 0:
+            sentences.append(token_seq)
+    return TokenStream(sentences)
+
+def tokenize_text_whitespace(input_data):
+    ''' WHITESPACE tokenizer: one sentence per line and whitespace separated tokens, 
+    for text that is already tokenized, e.g. part of speech tagged text with one 'word_TAG' sentence per line '''
+    sentences = []
+    for line in input_data.splitlines():
+        token_seq = line.split()
+        if len(token_seq) > 0:
+            sentences.append(token_seq)
+    return TokenStream(sentences)
+
+TOKENIZERS = {
+    'NLTK': tokenize_text_nltk,
+    'REGEX': tokenize_text_regex,
+    'WHITESPACE': tokenize_text_whitespace,
+}
+
+def tokenize_text(input_data, tokenizer='NLTK'):
+    ''' tokenizes a text document into a TokenStream
+
+    parameters
+    ----------
+    input_data : str
+        text of a document
+    tokenizer : str or function
+        'NLTK' (Punkt sentences and Treebank word tokens, the reference tokenization), 'REGEX' (a fast precompiled 
+        regex splitter) or 'WHITESPACE' (lines and whitespace, for tokenized or tagged text), see TOKENIZERS. 
+        A function with the signature of tokenize_text_nltk can also be given
+
+    returns
+    -------
+    TokenStream, sentences of tokens
+    '''
+    if not isinstance(tokenizer, str):
+        return tokenizer(input_data)
+    if tokenizer.upper() not in TOKENIZERS:
+        raise ValueError('unknown tokenizer: ' + tokenizer)
+    return TOKENIZERS[tokenizer.upper()](input_data)
+
+def tokenize_collection(doc_collection, workers=1, tokenizer='NLTK'):
+    ''' tokenizes every document of a collection exactly once. Documents that
+    are already TokenStream objects are kept as is.
+
+    parameters
+    ----------
+    doc_collection : dict
+        a map from document id to document text
+    workers : int
+        number of worker processes used for tokenization. Documents are sent to the workers in batches
+    tokenizer : str or function
+        see tokenize_text
+
+    returns
+    -------
+    dict, a map from document id to TokenStream
+    '''
+    items = list(doc_collection.items())
+    if all(isinstance(input_data, TokenStream) for (id, input_data) in items):
+        return dict(items)
+    return dict(map_documents(tokenize_document_item, items, workers, tokenizer))
+
+def tokenize_document_item(doc_item, context=None):
+    ''' tokenizes a (docid, document) pair, see map_documents
+
+    parameters
+    ----------
+    doc_item : tuple
+        (docid, text or TokenStream)
+    context : str or function
+        tokenizer, see tokenize_text. 'NLTK' if None
+
+    returns
+    -------
+    tuple, (docid, TokenStream)
+    '''
+    (id, input_data) = doc_item
+    return (id, as_token_stream(input_data, 'NLTK' if context is None else context))
+
+def as_token_stream(input_data, tokenizer='NLTK'):
+    ''' returns input data as a TokenStream, tokenizing raw text if needed
+
+    parameters
+    ----------
+    input_data : str or TokenStream
+        text of a document or its token stream
+    tokenizer : str or function
+        tokenizer of raw text, see tokenize_text
+
+    returns
+    -------
+    TokenStream, sentences of tokens
+    '''
+    if isinstance(input_data, TokenStream):
+        return input_data
+    return tokenize_text(input_data, tokenizer)
+
+def get_bigrams(input_data, tokenizer='NLTK'): #, use_pos_tagging):
+    return list(as_token_stream(input_data, tokenizer).bigrams())
     
 def get_freq_weighted_bigrams(bigram_list):
     weigthed_bigrams = {}
@@ -19,19 +187,174 @@ def get_freq_weighted_bigrams(bigram_list):
             weigthed_bigrams[bigramseq] += 1
     return weigthed_bigrams
 
-def get_word_frequencies(doc_collection, retention_ratio): # need to decouple pos tagging from here
-    word_freq_map = {}
-    
-    for id, input_data in doc_collection.items():
-        line_seq = sent_tokenize(input_data) #sent_tokenize(input_data.replace('_','-'))   
-        for line in line_seq:
-            token_seq = word_tokenize(line) 
-            for token in token_seq:
-                if token not in word_freq_map.keys():
-                    word_freq_map[token] = 0
-                word_freq_map[token] += 1
-
-    sorted_word_freq_list = list(reversed(sorted(word_freq_map.items(), key=lambda kv: kv[1])))
-    n = len(sorted_word_freq_list)
-
-    return dict(sorted_word_freq_list[:int(n * retention_ratio)])
+def update_token_frequencies(word_freq_map, input_data, tokenizer='NLTK'):
+    ''' adds the token counts of a document to a frequency map. Tokens are 
+    counted by Counter, in C, and new tokens are added in order of first occurrence
+
+    parameters
+    ----------
+    word_freq_map : Counter or dict
+        a map from token to freq
+    input_data : str or TokenStream
+        text of a document or its token stream
+    tokenizer : str or function
+        tokenizer of raw text, see tokenize_text
+
+    returns
+    -------
+    dict, word_freq_map
+    '''
+    tokens = as_token_stream(input_data, tokenizer).tokens()
+    if isinstance(word_freq_map, Counter):
+        word_freq_map.update(tokens)
+    else:
+        for (token, count) in Counter(tokens).items():
+            word_freq_map[token] = word_freq_map.get(token, 0) + count
+    return word_freq_map
+
+def count_chunk_tokens(doc_items, context=None):
+    ''' counts the tokens of a chunk of (docid, document) pairs, see map_chunks
+
+    parameters
+    ----------
+    doc_items : list
+        (docid, text or TokenStream) tuples
+    context : str or function
+        tokenizer, see tokenize_text. 'NLTK' if None
+
+    returns
+    -------
+    Counter, a map from token to freq
+    '''
+    word_freq_map = Counter()
+    for (id, input_data) in doc_items:
+        update_token_frequencies(word_freq_map, input_data, 'NLTK' if context is None else context)
+    return word_freq_map
+
+def tokenize_and_count_chunk(doc_items, context=None):
+    ''' tokenizes a chunk of (docid, document) pairs and counts their tokens, see map_chunks
+
+    parameters
+    ----------
+    doc_items : list
+        (docid, text or TokenStream) tuples
+    context : str or function
+        tokenizer, see tokenize_text. 'NLTK' if None
+
+    returns
+    -------
+    tuple, ([(docid, TokenStream)], Counter) the token streams of the chunk and a map from token to freq
+    '''
+    token_streams = [ tokenize_document_item(doc_item, context) for doc_item in doc_items ]
+    word_freq_map = Counter()
+    for (id, token_stream) in token_streams:
+        word_freq_map.update(token_stream.tokens())
+    return (token_streams, word_freq_map)
+
+def iter_counted_token_streams(doc_items, word_freq_map, tokenizer='NLTK', workers=1):
+    ''' tokenizes documents and counts their tokens in a single pass. With 
+    several workers, each chunk of documents is tokenized and counted in a 
+    worker process, and only the partial counts of the chunks are added up 
+    in the calling process, as in count_token_frequencies
+
+    parameters
+    ----------
+    doc_items : iterable
+        (docid, text or TokenStream) tuples
+    word_freq_map : Counter
+        a map from token to freq, to which the tokens of the documents are added in order of first occurrence
+    tokenizer : str or function
+        tokenizer of raw text, see tokenize_text
+    workers : int
+        number of worker processes
+
+    returns
+    -------
+    generator, (docid, TokenStream) tuples in document order. The tokens of a document are counted before it is yielded
+    '''
+    if workers is None or workers <= 1:
+        for doc_item in doc_items:
+            (id, token_stream) = tokenize_document_item(doc_item, tokenizer)
+            word_freq_map.update(token_stream.tokens())
+            yield (id, token_stream)
+        return
+    for (token_streams, chunk_freq_map) in map_chunks(tokenize_and_count_chunk, doc_items, workers, tokenizer):
+        word_freq_map.update(chunk_freq_map)
+        for doc_item in token_streams:
+            yield doc_item
+
+def count_token_frequencies(doc_collection, tokenizer='NLTK', workers=1):
+    ''' counts the tokens of a collection. With several workers, each chunk 
+    of documents is tokenized and counted in a worker process and the partial 
+    counts are merged in chunk order, so tokens keep their order of first occurrence.
+    See iter_counted_token_streams to keep the token streams as well
+
+    parameters
+    ----------
+    doc_collection : dict
+        a map from document id to document text or TokenStream
+    tokenizer : str or function
+        tokenizer of raw text, see tokenize_text
+    workers : int
+        number of worker processes
+
+    returns
+    -------
+    Counter, a map from token to freq
+    '''
+    items = list(doc_collection.items())
+    if workers is None or workers <= 1:
+        return count_chunk_tokens(items, tokenizer)
+    word_freq_map = Counter()
+    for chunk_freq_map in map_chunks(count_chunk_tokens, items, workers, tokenizer):
+        word_freq_map.update(chunk_freq_map)
+    return word_freq_map
+
+def select_most_frequent_words(word_freq_map, retention_ratio):
+    ''' selects the most frequent fraction of words. Words are ranked by 
+    decreasing frequency, and words of equal frequency by reverse order of 
+    insertion in word_freq_map. 
+    Frequencies are small integers, so the selection is a counting selection 
+    in linear time: the number of words of each frequency gives the lowest 
+    selected frequency, and a single pass collects the selected words by 
+    frequency. The vocabulary is never sorted.
+
+    parameters
+    ----------
+    word_freq_map : dict
+        a map from word to freq
+    retention_ratio : float
+        fraction of the words to select
+
+    returns
+    -------
+    dict, a map from selected word to freq, most frequent first
+    '''
+    n_selected = int(len(word_freq_map) * retention_ratio)
+    if n_selected <= 0:
+        return {}
+    # the lowest selected frequency, and how many of the words with that frequency are selected
+    words_by_freq = Counter(word_freq_map.values())
+    n_above = 0
+    for min_freq in sorted(words_by_freq.keys(), reverse=True):
+        if n_above + words_by_freq[min_freq] >= n_selected:
+            break
+        n_above += words_by_freq[min_freq]
+    n_ties = n_selected - n_above
+    selected_words_by_freq = {}
+    for (word, freq) in reversed(word_freq_map.items()):
+        if freq < min_freq:
+            continue
+        if freq == min_freq:
+            if n_ties == 0:
+                continue
+            n_ties -= 1
+        selected_words_by_freq.setdefault(freq, []).append(word)
+    selected_word_freq = {}
+    for freq in sorted(selected_words_by_freq.keys(), reverse=True):
+        for word in selected_words_by_freq[freq]:
+            selected_word_freq[word] = freq
+    return selected_word_freq
+
+def get_word_frequencies(doc_collection, retention_ratio, tokenizer='NLTK', workers=1): # need to decouple pos tagging from here
+    return select_most_frequent_words(count_token_frequencies(doc_collection, tokenizer, workers), retention_ratio)
@@ -7,6 +7,7 @@ def create_dot_file(graphlet_pattern_support_map, output_file_path):
     orbits separated by '/'
     occupants separated by '|'
     orbitId and content separated by ':'
+    graphlet_pattern_support_map maps each pattern to its distinct occurrences, as returned by extract_graphlets
     '''
     dg = Digraph( node_attr={'shape': 'record'})
     dg.attr(compound='true')
@@ -15,7 +16,7 @@ def create_dot_file(graphlet_pattern_support_map, output_file_path):
     index = 0
     for k in graphlet_pattern_support_map.keys():
         graphlet = k # graphlet_pattern_support_map[index]
-        support = list(set(graphlet_pattern_support_map[k]))[:3]
+        support = graphlet_pattern_support_map[k][:3]
         with dg.subgraph(name='graphlet{0}'.format(index)) as s:
             s.attr(rank='same')
             orbits = graphlet.split('/')
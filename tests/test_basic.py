@@ -1,9 +1,29 @@
 # -*- coding: utf-8 -*-
 
+import os
+import pickle
+import subprocess
 import sys
+import tempfile
 import unittest
+
+from collections import Counter
 #sys.path.insert(0, "E:\Projects\Research\graphlet-miner")
-from gminer.graphs import DocumentWordGraph, Graphlet
+from gminer.graphs import DocumentWordGraph, Graphlet, Vocabulary, WordFrequencyArray, render_pattern_key
+from gminer.algorithms import filter_candidate_neighbors_by_word_freq, select_ranked_candidate_neighbors, merge_shard_expansions, count_frequent_patterns, get_top_scoring_graphlets, extract_graph_paths, extract_max_graphlets_within_single_graph, expand_graphlet_candidates, extract_graphlets
+from gminer.counting import CountMinSketch, DocumentSupportCounter
+from gminer.dedup import ExploredHypothesisSet
+from gminer.instrumentation import SearchObserver
+from gminer.miner import GraphletMiner
+from gminer.occurrences import OccurrenceStore
+from gminer.preprocessing import get_document_key, get_tagger_version, pos_tag_collection
+from gminer.storage import DiskGraphStore, DocumentCache, DocumentSpool, SearchCheckpoint
+from gminer.text_processing import TokenStream, tokenize_text, tokenize_collection, get_word_frequencies, count_token_frequencies, iter_counted_token_streams, select_most_frequent_words
+
+# search parameters shared by the extract_graphlets tests, which override only the keys they exercise
+SEARCH_PARAMS = {'MAX_ORBIT_CAPACITY': 10, 'GRAPHLET_TYPE': 'PRUNED', 'PATTERN_FREQ_THRESHOLD_BY_STACK': {0: 1, 1: 1},
+    'MAX_SEARCH_ITERATIONS': 2, 'PRUNED_STACK_SIZE': 100, 'MIN_WORD_FREQ': 0, 'WORD_SELECTION_RATIO': 1.0,
+    'CONTENT_WORD_REGEX_PATTERN': '^[a-z]{3,}$', 'STOPWORD_LIST': [], 'RANDOM_SEED': 1, 'VERBOSE': False}
 
 
 
@@ -58,6 +78,464 @@ class BasicTestSuite(unittest.TestCase):
         all_nodes = g.get_all_nodes()
         self.assertIs(True,'center' in all_nodes and 'a' in all_nodes and 'b' in all_nodes and 'c' in all_nodes  and len(all_nodes) == 4)
 
+    def test_graphlet_clone_is_independent(self):
+        g = Graphlet('center')
+        g.add_orbit()
+        g.put_nodelist_on_orbit(['a','b','a'], 1)
+        c = g.clone()
+        c.add_orbit()
+        c.put_node_on_orbit('d', 2)
+        c.put_node_on_orbit('e', 1)
+        self.assertEqual(2, g.get_number_of_orbits())
+        self.assertEqual(('a','b'), g.get_nodes_on_orbit(1))
+        self.assertEqual(('a','b','e'), c.get_nodes_on_orbit(1))
+        self.assertEqual({'center','a','b'}, g.get_all_nodes())
+        self.assertEqual(5, c.get_size())
+        self.assertIs(g.get_nodes_on_orbit(0), c.get_nodes_on_orbit(0))
+
+    def test_graphlet_pattern_key_matches_representation(self):
+        g = Graphlet('center')
+        g.add_orbit()
+        g.put_node_on_orbit('sat', 1)
+        g.put_nodelist_on_orbit(['on','the'], 1, masked=True)
+        g.add_orbit()
+        g.put_node_on_orbit('mat', 2)
+        g.put_node_on_orbit('cat', 2)
+        h = Graphlet('other')
+        h.add_orbit()
+        h.put_nodelist_on_orbit(['the'], 1, masked=True)
+        h.put_node_on_orbit('sat', 1)
+        h.add_orbit()
+        h.put_nodelist_on_orbit(['cat','mat'], 2)
+        self.assertEqual(g.get_pattern_key(), h.get_pattern_key())
+        representation = g.get_pattern_representation(['center','sat','mat','cat'])
+        self.assertEqual('|'.join(representation.split('|')[1:]), render_pattern_key(g.get_pattern_key()))
+        self.assertEqual('1:<FUNC_OR_STOP_WORD>;sat|2:cat;mat', render_pattern_key(g.get_pattern_key()))
+
+    def test_vocabulary_interning(self):
+        v = Vocabulary(['alpha','beta'])
+        self.assertEqual(0, v.add_word('alpha'))
+        self.assertEqual(2, v.add_word('gamma'))
+        self.assertEqual('beta', v.get_word(v.get_id('beta')))
+        self.assertIsNone(v.get_id('delta'))
+        self.assertEqual(3, len(v))
+
+    def test_document_word_graph_csr_adjacency(self):
+        v = Vocabulary()
+        g = DocumentWordGraph('doc', 'the cat sat on the mat.', source_type='text', stopwords=['the','on'], vocabulary=v)
+        the_neighbors = set([v.get_word(n) for n in g.neighbors(v.get_id('the'))])
+        self.assertEqual({'cat','on','mat'}, the_neighbors)
+        self.assertEqual({'cat','sat','mat'}, set([v.get_word(n) for n in g.get_content_word_nodes()]))
+        self.assertEqual(g.number_of_edges(), g.to_networkx(v).number_of_edges())
+        self.assertTrue(g.to_networkx(v).has_edge('sat','on'))
+
+    def test_document_word_graph_neighbor_partitions(self):
+        v = Vocabulary()
+        g = DocumentWordGraph('doc', 'the cat sat on the mat.', source_type='text', stopwords=['the','on'], vocabulary=v)
+        (content_neighbors, function_neighbors) = g.get_neighbor_partition(v.get_id('the'))
+        self.assertEqual({'cat','mat'}, set([v.get_word(n) for n in content_neighbors]))
+        self.assertEqual(['on'], [v.get_word(n) for n in function_neighbors])
+        # content words come first in the adjacency of every node
+        self.assertEqual(list(content_neighbors) + list(function_neighbors), list(g.neighbors(v.get_id('the'))))
+        self.assertTrue(g.is_content_word(v.get_id('sat')))
+        self.assertFalse(g.is_content_word(v.get_id('on')))
+        self.assertEqual(g.get_neighbor_partition(v.get_id('the')), pickle.loads(pickle.dumps(g)).get_neighbor_partition(v.get_id('the')))
+
+    def test_token_stream_shared_by_frequencies_and_graph(self):
+        text = 'the cat sat on the mat. the dog sat.'
+        stream = tokenize_text(text)
+        self.assertEqual(get_word_frequencies({'doc':text}, 1.0), get_word_frequencies({'doc':stream}, 1.0))
+        v = Vocabulary()
+        g = DocumentWordGraph('doc', stream, source_type='tokens', vocabulary=v)
+        self.assertNotIn(v.get_id('the'), g.neighbors(v.get_id('.')))
+        self.assertEqual(g.number_of_edges(), DocumentWordGraph('doc', text, source_type='text', vocabulary=v).number_of_edges())
+
+    def test_tokenizer_backends(self):
+        text = "The cat's mat is red. It sat on the mat!"
+        self.assertEqual(tokenize_text(text).sentences, tokenize_text(text, 'nltk').sentences)
+        self.assertEqual([['The', "cat's", 'mat', 'is', 'red', '.'], ['It', 'sat', 'on', 'the', 'mat', '!']], tokenize_text(text, 'REGEX').sentences)
+        tagged_text = 'the_DT cat_NN sat_VBD\nit_PRP slept_VBD ._.'
+        self.assertEqual([['the_DT', 'cat_NN', 'sat_VBD'], ['it_PRP', 'slept_VBD', '._.']], tokenize_text(tagged_text, 'WHITESPACE').sentences)
+        graph = DocumentWordGraph('doc1', tagged_text, source_type='text', tokenizer='WHITESPACE')
+        # bigrams never cross lines
+        self.assertEqual(4, graph.number_of_edges())
+        self.assertRaises(ValueError, tokenize_text, text, 'unknown')
+
+    def test_word_frequencies_map_reduce_and_selection(self):
+        documents = dict([ ('doc%d' % i, TokenStream([['w%d' % (i % 7), 'w%d' % (i % 3), 'common']])) for i in range(40) ])
+        word_freq_map = count_token_frequencies(documents)
+        self.assertEqual(list(word_freq_map.items()), list(count_token_frequencies(documents, workers=2).items()))
+        # tokenization and counting in a single pass
+        for workers in [1, 2]:
+            token_freq = Counter()
+            token_streams = list(iter_counted_token_streams(iter(documents.items()), token_freq, workers=workers))
+            self.assertEqual(list(documents.keys()), [ docid for (docid, _) in token_streams ])
+            self.assertEqual(list(word_freq_map.items()), list(token_freq.items()))
+        # most frequent first, ties in reverse order of first occurrence
+        self.assertEqual([('common', 40), ('w0', 20), ('w2', 19), ('w1', 19)], list(select_most_frequent_words(word_freq_map, 0.5).items()))
+        word_freq = WordFrequencyArray.from_items([(3, 5), (0, 2)])
+        self.assertEqual((2, 5, 0), (len(word_freq), word_freq.get(3, 0), word_freq.get(1, 0)))
+        self.assertEqual([(0, 2), (3, 5)], word_freq.items())
+        self.assertNotIn(10, word_freq)
+
+    def test_parallel_tokenization_keeps_docid_order(self):
+        docs = dict([ ('doc%d' % i, 'word%d follows the word. another sentence.' % i) for i in range(20) ])
+        serial = tokenize_collection(docs)
+        parallel = tokenize_collection(docs, workers=2)
+        self.assertEqual(list(serial.keys()), list(parallel.keys()))
+        self.assertEqual([s.sentences for s in serial.values()], [s.sentences for s in parallel.values()])
+
+    def test_merge_shard_expansions_restores_stack_order(self):
+        shard_a = ([(0,'p','g0','d0'), (3,'q','g3','d2')], {'p':1, 'q':1})
+        shard_b = ([(1,'p','g1','d1'), (2,'p','g2','d1')], {'p':2})
+        expansions, pattern_counts = merge_shard_expansions([shard_a, shard_b])
+        self.assertEqual([0,1,2,3], [e[0] for e in expansions])
+        self.assertEqual({'p':3, 'q':1}, pattern_counts)
+
+    def test_explored_hypothesis_set(self):
+        explored = ExploredHypothesisSet(check_collisions=True)
+        self.assertTrue(explored.add('doc1', '0:cat|1:sat'))
+        self.assertFalse(explored.add('doc1', '0:cat|1:sat'))
+        self.assertTrue(explored.add('doc2', '0:cat|1:sat'))
+        self.assertIn(('doc2', '0:cat|1:sat'), explored)
+        statistics = explored.get_statistics()
+        self.assertEqual((2, 1, 0), (statistics['entries'], statistics['hits'], statistics['collisions']))
+
+    def test_explored_hypothesis_fingerprints_are_stable_across_processes(self):
+        code = "from gminer.dedup import ExploredHypothesisSet; print(ExploredHypothesisSet().get_fingerprint('doc1', ('cat', (((1, 2), False),), 'sat')))"
+        fingerprints = set()
+        for hash_seed in ['1', '2']:
+            output = subprocess.check_output([sys.executable, '-c', code], env=dict(os.environ, PYTHONHASHSEED=hash_seed))
+            fingerprints.add(int(output))
+        self.assertEqual(set([ExploredHypothesisSet().get_fingerprint('doc1', ('cat', (((1, 2), False),), 'sat'))]), fingerprints)
+
+    def test_explored_hypothesis_set_memory_cap(self):
+        explored = ExploredHypothesisSet(max_memory_bytes=20 * ExploredHypothesisSet.BYTES_PER_ENTRY)
+        for i in range(1000):
+            explored.add('doc', str(i))
+        self.assertLessEqual(len(explored), 20)
+        self.assertEqual(1000, len(explored) + explored.get_statistics()['evictions'])
+
+    def test_explored_hypothesis_set_rebuilt_from_journals(self):
+        explored = ExploredHypothesisSet(max_memory_bytes=20 * ExploredHypothesisSet.BYTES_PER_ENTRY)
+        explored.start_journal()
+        journals = []
+        for i in range(100):
+            explored.add('doc', str(i % 70))
+            if i % 30 == 29:
+                journals.append(explored.take_journal())
+        journals.append(explored.take_journal())
+        rebuilt = ExploredHypothesisSet(max_memory_bytes=20 * ExploredHypothesisSet.BYTES_PER_ENTRY)
+        for journal in journals:
+            rebuilt.add_fingerprints(journal)
+        self.assertEqual((explored.current_generation, explored.older_generation), (rebuilt.current_generation, rebuilt.older_generation))
+
+    def test_disk_graph_store_pages_graphs_by_id(self):
+        v = Vocabulary()
+        graphs = [ DocumentWordGraph('doc%d' % i, 'word%d follows the word.' % i, source_type='text', vocabulary=v) for i in range(5) ]
+        with tempfile.TemporaryDirectory() as store_dir:
+            store = DiskGraphStore(store_dir, cache_size=2)
+            for g in graphs:
+                store[g.get_id()] = g
+            store.flush()
+            for g in graphs + graphs:
+                self.assertEqual(list(g.edges()), list(store[g.get_id()].edges()))
+            self.assertLessEqual(len(store.cache), 2)
+            store.close()
+            reopened = DiskGraphStore(store_dir, mode='r')
+            self.assertEqual(['doc%d' % i for i in range(5)], list(reopened.keys()))
+            self.assertEqual(list(graphs[3].get_content_word_nodes()), list(reopened['doc3'].get_content_word_nodes()))
+            reopened.close()
+
+    def test_document_spool_replays_records(self):
+        with tempfile.TemporaryDirectory() as spool_dir:
+            spool = DocumentSpool(spool_dir + '/tokens.spool')
+            spool.append(('doc1', TokenStream([['a','b','.'],['c']])))
+            spool.append(('doc2', TokenStream([['d','e']])))
+            self.assertEqual(2, len(spool))
+            self.assertEqual([['a','b','.'],['c']], list(spool)[0][1].sentences)
+            self.assertEqual(['doc1','doc2'], [docid for (docid, _) in spool])
+            spool.close()
+
+    def test_count_min_sketch_never_undercounts(self):
+        sketch = CountMinSketch(width=8, depth=3)
+        counts = dict([ ((i,), i % 5 + 1) for i in range(40) ])
+        for (key, count) in counts.items():
+            for _ in range(count):
+                sketch.add(key)
+        self.assertEqual(sum(counts.values()), sketch.total)
+        for (key, count) in counts.items():
+            self.assertGreaterEqual(sketch.estimate(key), count)
+        self.assertEqual(8 * 3 * 8, sketch.get_memory_usage())
+
+    def test_count_frequent_patterns_is_exact_above_threshold(self):
+        keys = [(1,)] * 6 + [(2,)] * 3 + [(i,) for i in range(10, 30)]
+        expansions = [ (h, key, None, 'doc') for (h, key) in enumerate(keys) ]
+        # the sketch is filled as expansions are found, here by two workers
+        (sketch, worker_sketch) = (CountMinSketch(width=4, depth=2), CountMinSketch(width=4, depth=2))
+        for (h, key, _, _) in expansions:
+            (sketch if h % 2 else worker_sketch).add(key)
+        sketch.merge(worker_sketch)
+        self.assertEqual(len(keys), sketch.total)
+        pattern_counts = count_frequent_patterns(expansions, sketch, 2)
+        self.assertEqual({(1,): 6, (2,): 3}, pattern_counts)
+        self.assertRaises(ValueError, sketch.merge, CountMinSketch(width=8, depth=2))
+
+    def test_top_scoring_graphlets_keeps_most_frequent_in_stack_order(self):
+        small, large = Graphlet(1), Graphlet(1)
+        large.put_node_on_orbit(2, 1)
+        hypotheses = [((1,), small, 'a'), ((2,), small, 'b'), ((3,), small, 'c'), ((2,), large, 'd'), ((4,), small, 'e')]
+        pattern_freq = {(1,): 3, (2,): 7, (3,): 9, (4,): 1}
+        kept = get_top_scoring_graphlets(hypotheses, pattern_freq, 2, 2)
+        self.assertEqual(['b', 'c'], [graph_id for (_, _, graph_id) in kept])
+        kept = get_top_scoring_graphlets(hypotheses, pattern_freq, 2, 2, tie_break='SIZE')
+        self.assertEqual(['c', 'd'], [graph_id for (_, _, graph_id) in kept])
+        self.assertEqual(4, len(get_top_scoring_graphlets(hypotheses, pattern_freq, 2, 10)))
+
+    def test_extract_graph_paths_is_depth_bounded_within_components(self):
+        v = Vocabulary()
+        g = DocumentWordGraph('doc', TokenStream([['a','b','c','d'],['x','y']]), source_type='tokens', vocabulary=v)
+        a, c, d, x, y = [ v.get_id(w) for w in ['a','c','d','x','y'] ]
+        paths = extract_graph_paths(g, [a, c, d, x, y], max_depth=4)
+        self.assertIn((a, c, 3), paths)
+        self.assertNotIn((a, d, 4), paths)
+        self.assertIn((x, y, 2), paths)
+        self.assertFalse([ p for p in paths if set(p[:2]) & set([a, c, d]) and set(p[:2]) & set([x, y]) ])
+        self.assertEqual(paths, extract_graph_paths(g, [a, c, d, x, y], method='batched', max_depth=4))
+
+    def test_max_graphlets_put_reachable_content_words_on_distance_orbits(self):
+        v = Vocabulary()
+        g = DocumentWordGraph('doc', TokenStream([['cat','sat','on','mat'],['dog','barked']]), source_type='tokens', stopwords=['on'], vocabulary=v)
+        graphlets = extract_max_graphlets_within_single_graph(g, 3, center_nodes=[v.get_id('cat')])
+        self.assertEqual(1, len(graphlets))
+        self.assertEqual('1:sat', render_pattern_key(graphlets[0].get_pattern_key(), v))
+        graphlets = extract_max_graphlets_within_single_graph(g, 4, method='batched')
+        patterns = dict([ (v.get_word(graphlet.get_center_node()), render_pattern_key(graphlet.get_pattern_key(), v)) for graphlet in graphlets ])
+        self.assertEqual('1:sat|2:<EMPTY_ORBIT>|3:mat', patterns['cat'])
+        self.assertEqual('1:barked', patterns['dog'])
+
+    def test_expansion_strategies(self):
+        v = Vocabulary()
+        g = DocumentWordGraph('doc', TokenStream([['apple','banana','cherry','date']]), source_type='tokens', vocabulary=v)
+        apple, banana, cherry, date = [ v.get_id(w) for w in ['apple','banana','cherry','date'] ]
+        graphlet = Graphlet(banana)
+        graphlet.put_node_on_orbit(cherry, 1)
+        word_freq = {apple: 1, date: 9}
+        expanded = expand_graphlet_candidates(graphlet, g, word_freq, strategy='EXHAUSTIVE')
+        self.assertEqual([set([apple]), set([date])], [ e.get_all_nodes() - graphlet.get_all_nodes() for e in expanded ])
+        expanded = expand_graphlet_candidates(graphlet, g, word_freq, strategy='BEAM', beam_width=1)
+        self.assertEqual(1, len(expanded))
+        self.assertIn(date, expanded[0].get_all_nodes())
+
+    def test_candidate_ranking(self):
+        # most frequent first, ties in id order
+        word_freq = {1: 5, 2: 7, 3: 5, 4: 1}
+        self.assertEqual([2, 1, 3], filter_candidate_neighbors_by_word_freq([1, 3, 2, 1, 4], word_freq, 3))
+        self.assertEqual([2], filter_candidate_neighbors_by_word_freq([1, 3, 2, 1, 4], word_freq, 1))
+        self.assertEqual([2, 3], select_ranked_candidate_neighbors([[2, 1, 4], [2, 3]], set([1]), word_freq, 2))
+        v = Vocabulary()
+        g = DocumentWordGraph('doc', TokenStream([['apple','banana','cherry'],['banana','date']]), source_type='tokens', vocabulary=v)
+        apple, banana, cherry, date = [ v.get_id(w) for w in ['apple','banana','cherry','date'] ]
+        word_freq = {apple: 1, cherry: 3, date: 2}
+        expanded = expand_graphlet_candidates(Graphlet(banana), g, word_freq, candidates_per_expansion=2)
+        self.assertEqual([set([cherry]), set([date])], [ e.get_all_nodes() - set([banana]) for e in expanded ])
+        # graphs built with the frequencies store content neighbors ranked, and select the same candidates
+        ranked_graph = DocumentWordGraph('doc', TokenStream([['apple','banana','cherry'],['banana','date']]), source_type='tokens', vocabulary=v, word_freq=word_freq)
+        self.assertEqual([cherry, date, apple], list(ranked_graph.get_neighbor_partition(banana)[0]))
+        ranked_expanded = expand_graphlet_candidates(Graphlet(banana), ranked_graph, word_freq, candidates_per_expansion=2)
+        self.assertEqual([ e.get_pattern_key() for e in expanded ], [ e.get_pattern_key() for e in ranked_expanded ])
+
+    def test_search_checkpoint_discards_uncommitted_log_records(self):
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            checkpoint = SearchCheckpoint(checkpoint_dir, 'run-a')
+            self.assertIsNone(checkpoint.load())
+            checkpoint.append_log(('iter', 0))
+            checkpoint.save_state({'search_iteration': 0}, iter([[1, 2], [3]]))
+            checkpoint.append_log(('iter', 1))
+            (header, log_records, state_records) = SearchCheckpoint(checkpoint_dir, 'run-a').load()
+            self.assertEqual(0, header['search_iteration'])
+            self.assertEqual([('iter', 0)], log_records)
+            self.assertEqual([[1, 2], [3]], state_records)
+            self.assertIsNone(SearchCheckpoint(checkpoint_dir, 'run-b').load())
+
+    def test_pos_tagging_reads_cached_documents(self):
+        text = 'The cat sat on the mat.'
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # a cached document is returned as is, without running the tagger
+            tagged = TokenStream([['the_DT','cat_NN','sat_VBD']])
+            DocumentCache(cache_dir).put(get_document_key(text, get_tagger_version()), tagged)
+            tagged_collection = pos_tag_collection({'doc1': text}, cache_dir=cache_dir)
+            self.assertEqual([['the_DT','cat_NN','sat_VBD']], tagged_collection['doc1'].sentences)
+            self.assertNotEqual(get_document_key(text, get_tagger_version()), get_document_key(text + ' ', get_tagger_version()))
+            self.assertNotIn(get_document_key(text, 'another tagger'), DocumentCache(cache_dir))
+
+    def test_graphlet_miner_adds_document_batches(self):
+        params = dict(SEARCH_PARAMS, PATTERN_FREQ_THRESHOLD_BY_STACK={0: 2, 1: 2}, MIN_WORD_FREQ=1, STOPWORD_LIST=['the'])
+        documents = dict([ ('doc%d' % i, TokenStream([['cat','sat','the','mat'],['dog','sat']])) for i in range(4) ])
+        miner = GraphletMiner(params)
+        report = miner.add_documents(dict([ (docid, documents[docid]) for docid in ['doc0','doc1'] ]))
+        self.assertEqual(2, report['documents'])
+        self.assertFalse(report['requires_reexpansion'])
+        report = miner.add_documents(dict([ (docid, documents[docid]) for docid in ['doc2','doc3'] ]))
+        self.assertEqual(4, miner.get_number_of_documents())
+        self.assertTrue(report['stale_patterns'])
+        graph_ids = set([ graph_id for occurrences in miner.get_word_patterns().values() for (_, graph_id) in occurrences ])
+        self.assertEqual(set(documents.keys()), graph_ids)
+        # batches with known or repeated ids are rejected before the miner is changed
+        token_freq = dict(miner.token_freq)
+        self.assertRaises(ValueError, miner.add_documents, [('doc4', documents['doc0']), ('doc0', documents['doc0'])])
+        self.assertRaises(ValueError, miner.add_documents, [('doc4', documents['doc0']), ('doc4', documents['doc1'])])
+        self.assertEqual((token_freq, 4), (dict(miner.token_freq), miner.get_number_of_documents()))
+        # every batch is checkpointed on its own
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            checkpointed_miner = GraphletMiner(dict(params, CHECKPOINT_DIR=checkpoint_dir))
+            for docids in [['doc0','doc1'], ['doc2','doc3']]:
+                checkpointed_miner.add_documents(dict([ (docid, documents[docid]) for docid in docids ]))
+            self.assertEqual(miner.get_word_patterns(), checkpointed_miner.get_word_patterns())
+            self.assertEqual(['batch-0', 'batch-1'], sorted(os.listdir(checkpoint_dir)))
+
+    def test_graphlet_miner_flags_patterns_split_across_batches(self):
+        params = dict(SEARCH_PARAMS, PATTERN_FREQ_THRESHOLD_BY_STACK={0: 1, 1: 1, 2: 1}, MAX_SEARCH_ITERATIONS=3, EXPANSION_STRATEGY='EXHAUSTIVE')
+        # every pattern occurs once per document, so none passes the thresholds within a single batch
+        documents = {'doc0': TokenStream([['cat','sat','mat']]), 'doc1': TokenStream([['cat','sat','mat']])}
+        graphlet_patterns = extract_graphlets(documents, params)
+        miner = GraphletMiner(params)
+        for docid in ['doc0', 'doc1']:
+            report = miner.add_documents({docid: documents[docid]})
+        self.assertTrue(report['requires_reexpansion'])
+        def get_orbit_words(graphlet_pattern):
+            return [ set(orbit.split(':')[1].split(';')) for orbit in graphlet_pattern.split('|') ]
+        def is_extension(graphlet_pattern, stale_pattern):
+            orbit_words = get_orbit_words(graphlet_pattern)
+            return all([ i < len(orbit_words) and words <= orbit_words[i] for (i, words) in enumerate(get_orbit_words(stale_pattern)) ])
+        # the occurrences missed in earlier documents are those of stale patterns and of their extensions
+        missed_patterns = [ graphlet_pattern for (graphlet_pattern, occurrences) in graphlet_patterns.items() if miner.get_word_patterns().get(graphlet_pattern) != occurrences ]
+        self.assertGreater(len(missed_patterns), 0)
+        for graphlet_pattern in missed_patterns:
+            self.assertTrue(any([ is_extension(graphlet_pattern, stale_pattern) for stale_pattern in report['stale_patterns'] ]))
+        # sketch counting drops the counts that stale patterns are found with
+        self.assertRaises(ValueError, GraphletMiner, dict(params, PATTERN_COUNTING='SKETCH'))
+
+    def test_search_observer_receives_iteration_metrics(self):
+        class RecordingObserver(SearchObserver):
+            def __init__(self):
+                self.phases = []
+                self.iterations = []
+            def on_phase_end(self, phase, metrics):
+                self.phases.append(phase)
+            def on_iteration_end(self, metrics):
+                self.iterations.append(metrics)
+        params = dict(SEARCH_PARAMS, MIN_WORD_FREQ=1, STOPWORD_LIST=['the'])
+        documents = dict([ ('doc%d' % i, TokenStream([['cat','sat','the','mat'],['dog','sat']])) for i in range(3) ])
+        observer = RecordingObserver()
+        graphlet_patterns = extract_graphlets(documents, params, observers=[observer])
+        self.assertEqual(['tokenize', 'word_frequencies', 'graph_construction'], observer.phases[:3])
+        self.assertEqual(['search', 'output'], observer.phases[-2:])
+        self.assertEqual([0, 1], [ metrics['iteration'] for metrics in observer.iterations ])
+        for metrics in observer.iterations:
+            self.assertEqual(metrics['candidates'], metrics['expansions'] + metrics['dedup_hits'])
+            self.assertEqual(metrics['expansions'], metrics['pruned'] + metrics['stack_size'])
+        self.assertEqual(len(graphlet_patterns), observer.iterations[-1]['total_patterns'])
+
+    def test_document_support(self):
+        support_counter = DocumentSupportCounter()
+        for (key, document_id) in [('a', 'doc0'), ('a', 'doc0'), ('a', 'doc1'), ('b', 'doc1')]:
+            support_counter.add(key, document_id)
+        self.assertEqual(2, support_counter.get_support('a'))
+        self.assertEqual({'a': 2, 'b': 1}, support_counter.get_counts())
+        self.assertEqual({'a': 2}, support_counter.get_counts(min_support=1))
+        # documents are counted one at a time
+        self.assertRaises(ValueError, support_counter.add, 'b', 'doc0')
+        params = dict(SEARCH_PARAMS, PATTERN_FREQ_THRESHOLD_BY_STACK={0: 2, 1: 2}, PATTERN_COUNTING='SKETCH')
+        # 'sat' is next to four centers, but in two documents only
+        documents = {'doc0': TokenStream([['cat','sat'],['dog','sat'],['rat','sat']]), 'doc1': TokenStream([['cat','sat']])}
+        self.assertIn('1:sat', extract_graphlets(documents, params))
+        self.assertNotIn('1:sat', extract_graphlets(documents, dict(params, PATTERN_SUPPORT='DOCUMENTS')))
+
+    def test_apriori_pruning_keeps_output(self):
+        class SkipObserver(SearchObserver):
+            def __init__(self):
+                self.skipped = 0
+            def on_iteration_end(self, metrics):
+                self.skipped += metrics['skipped']
+        params = dict(SEARCH_PARAMS, PATTERN_FREQ_THRESHOLD_BY_STACK={0: 1, 1: 3, 2: 3}, MAX_SEARCH_ITERATIONS=3, PRUNED_STACK_SIZE=1000,
+            PATTERN_SUPPORT='DOCUMENTS', EXPANSION_STRATEGY='EXHAUSTIVE')
+        words = ['cat','dog','rat','sat','ran','mat','hat']
+        documents = dict([ ('doc%d' % i, TokenStream([[words[i % 7], words[(i * 3) % 7], words[(i * 5 + 1) % 7]], [words[(i + 2) % 7], 'sat']])) for i in range(12) ])
+        observer = SkipObserver()
+        pruned_patterns = extract_graphlets(documents, dict(params, PATTERN_COUNTING='SKETCH'), observers=[observer])
+        self.assertGreater(observer.skipped, 0)
+        self.assertEqual(extract_graphlets(documents, dict(params, PATTERN_COUNTING='SKETCH', APRIORI_PRUNING=False)), pruned_patterns)
+        # hypotheses are only skipped when every orbit is expanded
+        observer = SkipObserver()
+        extract_graphlets(documents, dict(params, PATTERN_COUNTING='SKETCH', EXPANSION_STRATEGY='RANDOM'), observers=[observer])
+        self.assertEqual(0, observer.skipped)
+
+    def test_parallel_search_matches_serial_search(self):
+        params = dict(SEARCH_PARAMS, MAX_ORBIT_CAPACITY=4, PATTERN_FREQ_THRESHOLD_BY_STACK={0: 1, 1: 1, 2: 1}, MAX_SEARCH_ITERATIONS=3, PRUNED_STACK_SIZE=30)
+        words = ['cat','dog','rat','sat','ran','mat','hat','red','big','old','new','hot']
+        documents = dict([ ('doc%d' % i, TokenStream([ [ words[(i * j * 7 + j * 5 + i) % 12] for j in range(k, k + 8) ] for k in (0, 8) ])) for i in range(12) ])
+        for strategy_params in [{}, {'EXPANSION_STRATEGY': 'EXHAUSTIVE'}, {'GRAPHLET_TYPE': 'MAX'}]:
+            serial_patterns = extract_graphlets(documents, dict(params, **strategy_params))
+            self.assertGreater(len(serial_patterns), 0)
+            for workers in [2, 3]:
+                parallel_patterns = extract_graphlets(documents, dict(params, **strategy_params), workers=workers)
+                self.assertEqual(list(serial_patterns.items()), list(parallel_patterns.items()))
+
+    def test_search_resumes_from_checkpoint_after_interrupted_iteration(self):
+        class Interruption(Exception):
+            pass
+        class InterruptingObserver(SearchObserver):
+            # interrupts the search when the expansion of an iteration starts
+            def __init__(self, interrupted_iteration):
+                self.expansions = 0
+                self.interrupted_iteration = interrupted_iteration
+            def on_phase_start(self, phase):
+                if phase == 'expansion':
+                    if self.expansions == self.interrupted_iteration:
+                        raise Interruption()
+                    self.expansions += 1
+        class RecordingObserver(SearchObserver):
+            def __init__(self):
+                self.phases = []
+                self.iterations = []
+            def on_phase_end(self, phase, metrics):
+                self.phases.append(phase)
+            def on_iteration_end(self, metrics):
+                self.iterations.append(metrics['iteration'])
+        params = dict(SEARCH_PARAMS, PATTERN_FREQ_THRESHOLD_BY_STACK={0: 1, 1: 1, 2: 1, 3: 1}, MAX_SEARCH_ITERATIONS=4, PRUNED_STACK_SIZE=30,
+            EXPANSION_STRATEGY='EXHAUSTIVE', DEDUP_MAX_MEMORY_BYTES=200 * ExploredHypothesisSet.BYTES_PER_ENTRY)
+        words = ['cat','dog','rat','sat','ran','mat','hat','red','big','old','new','hot']
+        # patterns are still found in the iterations after the interruption
+        documents = dict([ ('doc%d' % i, TokenStream([ [ words[(i * j * 7 + j * 5 + i) % 12] for j in range(k, k + 8) ] for k in (0, 8) ])) for i in range(12) ])
+        fresh_patterns = extract_graphlets(documents, params)
+        # resumed with the number of workers of the interrupted run, and with another one
+        for (interrupted_workers, resumed_workers) in [(1, 1), (2, 2), (2, 1)]:
+            with tempfile.TemporaryDirectory() as checkpoint_dir:
+                checkpoint_params = dict(params, CHECKPOINT_DIR=checkpoint_dir)
+                self.assertRaises(Interruption, extract_graphlets, documents, checkpoint_params, interrupted_workers, [InterruptingObserver(2)])
+                observer = RecordingObserver()
+                resumed_patterns = extract_graphlets(documents, checkpoint_params, resumed_workers, [observer])
+                self.assertIn('checkpoint_restore', observer.phases)
+                self.assertEqual([2, 3], observer.iterations)
+                self.assertEqual(list(fresh_patterns.items()), list(resumed_patterns.items()))
+
+    def test_occurrence_store_deduplicates_occurrences(self):
+        v = Vocabulary(['cat', 'dog'])
+        (pattern_key, other_pattern_key) = ((((1,), False),), (((0,), True),))
+        store = OccurrenceStore()
+        for i in range(40):
+            store.add(pattern_key, i % 2, 'doc%d' % (i % 3))
+        store.add(other_pattern_key, v.get_id('dog'), 'doc9')
+        self.assertEqual(6, len(store[pattern_key]))
+        patterns = store.render(v)
+        view = store.get_view(pattern_key, v)
+        self.assertEqual(sorted(set(view)), sorted(view))
+        self.assertIn(('dog', 'doc2'), view)
+        self.assertNotIn(('dog', 'doc9'), view)
+        self.assertEqual([('cat', 'doc0'), ('cat', 'doc1')], view[:2])
+        self.assertEqual([('dog', 'doc9')], list(patterns['1:<FUNC_OR_STOP_WORD>;cat']))
+        self.assertEqual(list(view), list(pickle.loads(pickle.dumps(store)).get_view(pattern_key, v)))
 
 if __name__ == '__main__':
     unittest.main()